@@ -171,14 +171,9 @@ def create_test_data():
     print("ПРОВЕРКА УНИКАЛЬНОСТИ АУДИТОРИЙ:")
     print("="*50)
     
-    used_classrooms = set()
-    for teacher in Teacher.objects.all():
-        if teacher.workplace:
-            if teacher.workplace.id in used_classrooms:
-                print(f"ОШИБКА: Аудитория {teacher.workplace.room_number} повторяется!")
-            else:
-                used_classrooms.add(teacher.workplace.id)
-                print(f"✓ Преподаватель {teacher.full_name()} → Аудитория {teacher.workplace.room_number}")
+    # Повтор аудитории невозможен: Teacher.workplace уникален в базе
+    for teacher in Teacher.objects.filter(workplace__isnull=False).select_related('workplace'):
+        print(f"✓ Преподаватель {teacher.full_name()} → Аудитория {teacher.workplace.room_number}")
     
     # Статистика
     print("\n" + "="*50)
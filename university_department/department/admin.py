@@ -1,18 +1,116 @@
-from django.contrib import admin
-from .models import Classroom, Discipline, AdditionalWorkType, Teacher, TeacherAdditionalWork
+from django import forms
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from . import assignments, audit, caching, changes, directory, timetable
+from .forms import PhotoField
+from .models import (
+    ArchivedAdditionalWork, AuditEntry, Classroom, Discipline, AdditionalWorkType, Teacher,
+    TeacherAdditionalWork,
+)
+from .paginators import CachedCountPaginator, bump_count_version
+
+FILTER_CHOICES_TIMEOUT = 300
+
+
+class FastChangeListMixin:
+    """Кешированные количества строк вместо COUNT(*) на каждой странице"""
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class HasWorkplaceFilter(admin.SimpleListFilter):
+    """Фильтр по наличию рабочего места без перечисления всех аудиторий"""
+    title = 'рабочее место'
+    parameter_name = 'has_workplace'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Есть'), ('no', 'Нет'))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(workplace__isnull=False)
+        if self.value() == 'no':
+            return queryset.filter(workplace__isnull=True)
+        return queryset
+
+
+class CachedValuesFilter(admin.SimpleListFilter):
+    """Фильтр по значениям поля, список которых кешируется"""
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        key = f'admin_filter:{model_admin.model._meta.label_lower}:{self.field_name}'
+        values = cache.get(key)
+        if values is None:
+            values = list(
+                model_admin.model.objects.order_by(self.field_name)
+                .values_list(self.field_name, flat=True)
+                .distinct()
+            )
+            cache.set(key, values, FILTER_CHOICES_TIMEOUT)
+        return [(value, value) for value in values if value]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_name: self.value()})
+        return queryset
+
+
+class PositionFilter(CachedValuesFilter):
+    title = 'должность'
+    parameter_name = 'position'
+    field_name = 'position'
+
+
+class RateForm(forms.Form):
+    rate = forms.FloatField(
+        label='Ставка',
+        validators=[MinValueValidator(0.1), MaxValueValidator(1.0)],
+    )
+
+
+class DisciplinesForm(forms.Form):
+    disciplines = forms.ModelMultipleChoiceField(
+        label='Дисциплины',
+        queryset=Discipline.objects.all(),
+        widget=forms.SelectMultiple(attrs={'size': 10}),
+    )
+
+
+def action_form_response(modeladmin, request, queryset, form, title, action):
+    """Промежуточная страница с формой параметров действия"""
+    return TemplateResponse(request, 'admin/department/action_form.html', {
+        **modeladmin.admin_site.each_context(request),
+        'title': title,
+        'form': form,
+        'action': action,
+        'count': queryset.count(),
+        'select_across': request.POST.get('select_across') == '1',
+        'selected': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+        'opts': modeladmin.model._meta,
+        'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+    })
+
 
 class TeacherAdditionalWorkInline(admin.TabularInline):
     model = TeacherAdditionalWork
     extra = 1
+    autocomplete_fields = ('work_type',)
 
 @admin.register(Classroom)
-class ClassroomAdmin(admin.ModelAdmin):
+class ClassroomAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('room_number', 'capacity')
     search_fields = ('room_number', 'description')
     ordering = ('room_number',)
 
 @admin.register(Discipline)
-class DisciplineAdmin(admin.ModelAdmin):
+class DisciplineAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'semester', 'hours')
     list_filter = ('semester',)
     search_fields = ('name',)
@@ -24,12 +122,15 @@ class AdditionalWorkTypeAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description')
 
 @admin.register(Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'middle_name', 'position', 'employment_type', 'rate', 'workplace')
-    list_filter = ('employment_type', 'position', 'workplace')
+    list_select_related = ('workplace',)
+    list_filter = ('employment_type', PositionFilter, HasWorkplaceFilter)
     search_fields = ('last_name', 'first_name', 'middle_name', 'position', 'email')
-    filter_horizontal = ('disciplines',)
+    autocomplete_fields = ('workplace', 'disciplines')
     inlines = [TeacherAdditionalWorkInline]
+    formfield_overrides = {models.ImageField: {'form_class': PhotoField}}
+    actions = ['set_rate', 'assign_disciplines']
     fieldsets = (
         ('Личные данные', {
             'fields': ('last_name', 'first_name', 'middle_name', 'photo')
@@ -51,9 +152,99 @@ class TeacherAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description='Изменить ставку')
+    def set_rate(self, request, queryset):
+        form = RateForm(request.POST if 'apply' in request.POST else None)
+        if not form.is_valid():
+            return action_form_response(self, request, queryset, form, 'Изменение ставки', 'set_rate')
+        rate = form.cleaned_data['rate']
+        employment_type = Teacher.FULL_TIME if rate >= 1.0 else Teacher.PART_TIME
+        teacher_ids = list(queryset.values_list('pk', flat=True))
+        # Одним UPDATE для всех выбранных преподавателей
+        with transaction.atomic():
+            # Прежние значения — до UPDATE и по pk: после него строки могут
+            # выпасть из отфильтрованного queryset (например, по employment_type)
+            teachers = list(Teacher.objects.filter(pk__in=teacher_ids).only(
+                'last_name', 'first_name', 'middle_name', 'rate', 'employment_type'
+            ))
+            updated = Teacher.objects.filter(pk__in=teacher_ids).update(
+                rate=rate, employment_type=employment_type, updated_at=timezone.now()
+            )
+            changes.record(Teacher, *teacher_ids)
+            for teacher in teachers:
+                diff = {
+                    field: [old, new]
+                    for field, old, new in (
+                        ('rate', teacher.rate, rate),
+                        ('employment_type', teacher.employment_type, employment_type),
+                    )
+                    if old != new
+                }
+                if diff:
+                    audit.record(teacher, AuditEntry.UPDATE, diff)
+            timetable.schedule_teacher_resolve(*teacher_ids)
+            directory.schedule_refresh(*teacher_ids)
+        bump_count_version(Teacher)
+        caching.invalidate(Teacher, *teacher_ids)
+        self.message_user(request, f'Ставка изменена у {updated} преподавателей.', messages.SUCCESS)
+
+    @admin.action(description='Назначить дисциплины')
+    def assign_disciplines(self, request, queryset):
+        form = DisciplinesForm(request.POST if 'apply' in request.POST else None)
+        if not form.is_valid():
+            return action_form_response(
+                self, request, queryset, form, 'Назначение дисциплин', 'assign_disciplines'
+            )
+        discipline_ids = [d.pk for d in form.cleaned_data['disciplines']]
+        teacher_ids = list(queryset.values_list('pk', flat=True))
+        # Одна пакетная вставка; уже существующие связи пропускаются
+        added, _ = assignments.apply_changes(
+            {(teacher_id, discipline_id) for teacher_id in teacher_ids for discipline_id in discipline_ids},
+            set(),
+        )
+        self.message_user(
+            request,
+            f'Дисциплины назначены {len(teacher_ids)} преподавателям, новых назначений: {added}.',
+            messages.SUCCESS,
+        )
+
 @admin.register(TeacherAdditionalWork)
-class TeacherAdditionalWorkAdmin(admin.ModelAdmin):
+class TeacherAdditionalWorkAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('teacher', 'work_type', 'start_date', 'end_date')
+    list_select_related = ('teacher', 'work_type')
     list_filter = ('work_type', 'start_date')
     search_fields = ('teacher__last_name', 'teacher__first_name', 'description')
-    ordering = ('-start_date',)
\ No newline at end of file
+    autocomplete_fields = ('teacher', 'work_type')
+    ordering = ('-start_date',)
+    actions = ['end_today']
+
+    @admin.action(description='Завершить сегодняшней датой')
+    def end_today(self, request, queryset):
+        today = timezone.localdate()
+        active = queryset.filter(end_date__isnull=True)
+        work_ids = list(active.values_list('pk', flat=True))
+        with transaction.atomic():
+            audit.record_many(active.select_related('teacher', 'work_type'), AuditEntry.UPDATE, {
+                'end_date': [None, today],
+            })
+            updated = active.update(end_date=today, updated_at=timezone.now())
+            changes.record(TeacherAdditionalWork, *work_ids)
+        bump_count_version(TeacherAdditionalWork)
+        caching.invalidate(TeacherAdditionalWork, *work_ids)
+        self.message_user(request, f'Завершено работ: {updated}.', messages.SUCCESS)
+
+
+@admin.register(ArchivedAdditionalWork)
+class ArchivedAdditionalWorkAdmin(FastChangeListMixin, admin.ModelAdmin):
+    """Архив только для просмотра: записи создает archive.py"""
+    list_display = ('teacher', 'work_type', 'start_date', 'end_date', 'archived_at')
+    list_select_related = ('teacher', 'work_type')
+    list_filter = ('work_type', 'end_date')
+    search_fields = ('teacher__last_name', 'teacher__first_name', 'description')
+    ordering = ('-end_date',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,136 @@
+"""Архив завершенной дополнительной работы.
+
+Назначения с прошедшей датой окончания переносятся из
+TeacherAdditionalWork в ArchivedAdditionalWork пакетами, каждый пакет —
+в отдельной транзакции (команда archive_additional_work, запускается по
+расписанию). В рабочей таблице остаются только действующие назначения, с
+которыми работают списки, админка и карточки преподавателей; после
+переноса тот же вид работы можно назначить преподавателю снова.
+
+Перенос выполняется в обход сигналов, поэтому журнал, версии
+количеств, кеш объектов и справочник обновляются здесь же. Полная
+история (действующие и архивные назначения) — функция history().
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import BooleanField, F, Value
+from django.utils import timezone
+
+from . import audit, caching, changes, directory
+from .models import ArchivedAdditionalWork, AuditEntry, TeacherAdditionalWork
+from .paginators import bump_count_version
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,
+    'KEEP_DAYS': 0,    # сколько дней после окончания назначение остается в рабочей таблице
+}
+
+HISTORY_FIELDS = ['teacher_id', 'work_type_id', 'work_type__name', 'start_date', 'end_date', 'description']
+
+
+def option(name):
+    return getattr(settings, 'ARCHIVE', {}).get(name, DEFAULTS[name])
+
+
+def cutoff(keep_days=None):
+    """Назначения, закончившиеся раньше этой даты, переносятся в архив"""
+    if keep_days is None:
+        keep_days = option('KEEP_DAYS')
+    return timezone.localdate() - timedelta(days=keep_days)
+
+
+def archivable(before=None):
+    return TeacherAdditionalWork.objects.filter(end_date__lt=before or cutoff())
+
+
+def _delete(work_ids):
+    """DELETE назначений по первичным ключам без сигналов.
+
+    Обычный delete() отправил бы сигналы, и журнал, кеш и лента
+    обновлялись бы второй раз. Зависимых объектов у назначений нет, поэтому
+    достаточно одного запроса на пакет.
+    """
+    connection = connections[router.db_for_write(TeacherAdditionalWork)]
+    table = connection.ops.quote_name(TeacherAdditionalWork._meta.db_table)
+    column = connection.ops.quote_name(TeacherAdditionalWork._meta.pk.column)
+    batch_size = connection.ops.bulk_batch_size([TeacherAdditionalWork._meta.pk], work_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(work_ids), batch_size):
+            chunk = work_ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', chunk)
+
+
+def _move(queryset):
+    """Переносит назначения в архив; вызывается внутри транзакции"""
+    works = list(queryset.select_related('teacher', 'work_type').order_by('pk'))
+    if not works:
+        return 0
+    now = timezone.now()
+    ArchivedAdditionalWork.objects.bulk_create([
+        ArchivedAdditionalWork(
+            original_id=work.pk,
+            teacher_id=work.teacher_id,
+            work_type_id=work.work_type_id,
+            start_date=work.start_date,
+            end_date=work.end_date,
+            description=work.description,
+            archived_at=now,
+        )
+        for work in works
+    ])
+    audit.record_many(works, AuditEntry.DELETE, {'archived': [None, now]})
+    work_ids = [work.pk for work in works]
+    _delete(work_ids)
+    bump_count_version(TeacherAdditionalWork)
+    bump_count_version(ArchivedAdditionalWork)
+    caching.invalidate(TeacherAdditionalWork, *work_ids)
+    # Для внешних систем назначение удалено из рабочей таблицы
+    changes.record(TeacherAdditionalWork, *work_ids, deleted=True)
+    directory.schedule_refresh(*{work.teacher_id for work in works})
+    return len(works)
+
+
+def archive(before=None, batch_size=None):
+    """Переносит все завершенные назначения пакетами; возвращает их число"""
+    before = before or cutoff()
+    batch_size = batch_size or option('BATCH_SIZE')
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(archivable(before).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            total += _move(TeacherAdditionalWork.objects.filter(pk__in=batch, end_date__lt=before))
+    return total
+
+
+def release(teacher_id, work_type_id):
+    """Архивирует завершенное назначение, мешающее назначить работу снова"""
+    if not (str(teacher_id).isdigit() and str(work_type_id).isdigit()):
+        return 0
+    with transaction.atomic():
+        return _move(archivable(timezone.localdate()).filter(teacher_id=teacher_id, work_type_id=work_type_id))
+
+
+def history(teacher=None, work_type=None):
+    """Действующие и архивные назначения одним запросом, новые сначала.
+
+    Строки — словари с полями HISTORY_FIELDS, work_id (ID назначения) и
+    archived.
+    """
+    live = TeacherAdditionalWork.objects.all()
+    archived = ArchivedAdditionalWork.objects.all()
+    if teacher is not None:
+        live, archived = live.filter(teacher=teacher), archived.filter(teacher=teacher)
+    if work_type is not None:
+        live, archived = live.filter(work_type=work_type), archived.filter(work_type=work_type)
+    live = live.annotate(
+        work_id=F('pk'), archived=Value(False, output_field=BooleanField())
+    ).values(*HISTORY_FIELDS, 'work_id', 'archived').order_by()
+    archived = archived.annotate(
+        work_id=F('original_id'), archived=Value(True, output_field=BooleanField())
+    ).values(*HISTORY_FIELDS, 'work_id', 'archived').order_by()
+    return live.union(archived, all=True).order_by('-start_date', '-work_id')
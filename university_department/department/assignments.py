@@ -0,0 +1,89 @@
+"""Пакетное изменение назначений преподавателей на дисциплины.
+
+Изменения приходят списком пар «преподаватель — дисциплина» и
+применяются к промежуточной таблице Teacher.disciplines одним DELETE и
+одной пакетной вставкой в общей транзакции. Пары сравниваются с
+существующими строками, поэтому уже назначенное и отсутствующее ничего
+не меняют и не попадают в журнал.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import audit, directory, timetable
+from . import changes as change_feed
+from .models import AuditEntry, Discipline, Teacher
+from .paginators import bump_count_version
+
+Assignment = Teacher.disciplines.through
+
+
+def parse_pairs(values):
+    """Пары (teacher_id, discipline_id) из строк вида "12:5" """
+    pairs = set()
+    for value in values:
+        teacher_id, sep, discipline_id = value.partition(':')
+        if sep and teacher_id.isdigit() and discipline_id.isdigit():
+            pairs.add((int(teacher_id), int(discipline_id)))
+    return pairs
+
+
+def _existing(pairs):
+    """Оставляет только пары с существующими преподавателями и дисциплинами"""
+    teacher_ids = set(Teacher.objects.filter(
+        pk__in={t for t, _ in pairs}).values_list('pk', flat=True))
+    discipline_ids = set(Discipline.objects.filter(
+        pk__in={d for _, d in pairs}).values_list('pk', flat=True))
+    return {(t, d) for t, d in pairs if t in teacher_ids and d in discipline_ids}
+
+
+def apply_changes(added, removed):
+    """Применяет добавленные и удаленные назначения, возвращает число реально вставленных и удаленных"""
+    # Пара, отмеченная и добавленной и удаленной, не меняется
+    conflicting = added & removed
+    added = _existing(added - conflicting)
+    removed = removed - conflicting
+    if not added and not removed:
+        return 0, 0
+
+    requested = added | removed
+    with transaction.atomic():
+        # Существующие строки среди затронутых: уже назначенное не вставляется,
+        # отсутствующее не удаляется, а журнал и лента видят только реальные изменения
+        present = {
+            (teacher_id, discipline_id): pk
+            for pk, teacher_id, discipline_id in Assignment.objects.filter(
+                teacher_id__in={t for t, _ in requested},
+                discipline_id__in={d for _, d in requested},
+            ).values_list('pk', 'teacher_id', 'discipline_id')
+            if (teacher_id, discipline_id) in requested
+        }
+        added = added - present.keys()
+        removed = removed & present.keys()
+        if not added and not removed:
+            return 0, 0
+
+        if removed:
+            Assignment.objects.filter(pk__in=[present[pair] for pair in removed]).delete()
+        Assignment.objects.bulk_create(
+            [Assignment(teacher_id=t, discipline_id=d) for t, d in sorted(added)],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+        # Сигналы m2m_changed при пакетных операциях не отправляются
+        changes = defaultdict(lambda: {'added': [], 'removed': []})
+        for teacher_id, discipline_id in sorted(added):
+            changes[teacher_id]['added'].append(discipline_id)
+        for teacher_id, discipline_id in sorted(removed):
+            changes[teacher_id]['removed'].append(discipline_id)
+        for teacher in Teacher.objects.filter(pk__in=changes):
+            diff = {key: ids for key, ids in changes[teacher.pk].items() if ids}
+            audit.record(teacher, AuditEntry.M2M, {'disciplines': diff})
+        timetable.schedule_teacher_resolve(*changes)
+        directory.schedule_refresh(*changes)
+        change_feed.touch(Teacher, *changes)
+
+    bump_count_version(Teacher)
+    bump_count_version(Discipline)
+    return len(added), len(removed)
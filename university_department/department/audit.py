@@ -0,0 +1,264 @@
+"""Журнал изменений.
+
+Изменения моделей кафедры фиксируются сигналами (см. signals.py) в виде
+построчных различий полей и складываются в ограниченную очередь в памяти
+процесса. Фоновый поток записывает их пачками через bulk_create, поэтому
+запрос на изменение не ждет отдельного INSERT в журнал. При переполнении
+очереди запись выполняется в текущем потоке, при завершении процесса
+поток дописывает взятую пачку и очередь сбрасывается в базу.
+
+Фоновый поток пишет в SQLite параллельно с потоками запросов, поэтому
+транзакции основной базы начинаются с BEGIN IMMEDIATE и ждут блокировку
+(DATABASES['default']['OPTIONS'] в settings.py): отложенная транзакция,
+которая сначала читает, а потом пишет, при занятой блокировке сразу
+получила бы database is locked.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import FileField, prefetch_related_objects
+from django.utils import timezone
+
+from .models import AuditEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ASYNC': True,             # запись фоновым потоком
+    'BATCH_SIZE': 200,         # записей в одном bulk_create
+    'FLUSH_INTERVAL': 1.0,     # максимальная задержка записи, с
+    'QUEUE_SIZE': 10000,       # размер очереди
+}
+
+CLOSE_TIMEOUT = 30    # сколько ждать записи пачки при завершении процесса, с
+
+
+def option(name):
+    return getattr(settings, 'AUDIT', {}).get(name, DEFAULTS[name])
+
+
+# Текущий пользователь запроса (заполняется AuditMiddleware)
+_local = threading.local()
+
+
+def set_current_user(user):
+    _local.user = user
+
+
+def get_current_user():
+    user = getattr(_local, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    return None
+
+
+class AuditMiddleware:
+    """Запоминает пользователя запроса для журнала изменений"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        set_current_user(getattr(request, 'user', None))
+        try:
+            return self.get_response(request)
+        finally:
+            set_current_user(None)
+
+
+class AuditBuffer:
+    """Очередь записей журнала с пакетной записью в фоне"""
+
+    def __init__(self):
+        self.queue = None
+        self.worker = None
+        self.lock = threading.Lock()
+        # Пачка пишется под write_lock: flush() дожидается пачки, уже взятой потоком
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+
+    def _ensure_worker(self):
+        with self.lock:
+            if self.queue is None:
+                self.queue = queue.Queue(maxsize=option('QUEUE_SIZE'))
+            if self.worker is None or not self.worker.is_alive():
+                self.stopping.clear()
+                self.worker = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self.worker.start()
+
+    def put(self, entry):
+        if not option('ASYNC'):
+            self._write([entry])
+            return
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            # Очередь переполнена: пишем накопленное в текущем потоке
+            self.flush()
+            self.queue.put(entry)
+        self.wake.set()
+
+    def _drain(self, limit=None):
+        entries = []
+        while limit is None or len(entries) < limit:
+            try:
+                entries.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def _write(self, entries):
+        if not entries:
+            return
+        try:
+            _describe(entries)
+            AuditEntry.objects.bulk_create(entries, batch_size=option('BATCH_SIZE'))
+        except Exception:
+            logger.exception('Не удалось записать %s записей журнала', len(entries))
+
+    def flush(self):
+        """Записывает все накопленные записи, в том числе пачку, которую пишет фоновый поток"""
+        if self.queue is None:
+            return
+        with self.write_lock:
+            while True:
+                entries = self._drain(option('BATCH_SIZE'))
+                if not entries:
+                    break
+                self._write(entries)
+
+    def close(self):
+        """Останавливает фоновый поток и записывает остаток очереди (при завершении процесса)"""
+        worker = self.worker
+        if worker is not None and worker.is_alive():
+            self.stopping.set()
+            self.wake.set()
+            worker.join(CLOSE_TIMEOUT)
+        self.flush()
+
+    def _run(self):
+        batch_size = option('BATCH_SIZE')
+        interval = option('FLUSH_INTERVAL')
+        while not self.stopping.is_set():
+            self.wake.wait(interval)
+            self.wake.clear()
+            with self.write_lock:
+                entries = self._drain(batch_size)
+                if entries:
+                    close_old_connections()
+                    self._write(entries)
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.close)
+
+
+def flush():
+    buffer.flush()
+
+
+# Снимки и различия полей
+
+def _value(field, value):
+    if isinstance(field, FileField):
+        return getattr(value, 'name', value) or ''
+    return value
+
+
+def _is_timestamp(field):
+    return getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+
+
+def snapshot(instance):
+    """Значения полей экземпляра без обращения к отложенным полям и без автоматических отметок времени"""
+    data = instance.__dict__
+    return {
+        field.attname: _value(field, data[field.attname])
+        for field in instance._meta.concrete_fields
+        if field.attname in data and not _is_timestamp(field)
+    }
+
+
+# Представление объекта: str() может обращаться к внешним ключам
+# (TeacherAdditionalWork — к преподавателю и виду работы). Если они не
+# загружены, представление строится при записи пачки: связанные строки
+# загружаются одним запросом на поле для всей пачки и не в потоке запроса.
+
+def _unloaded_relations(instance):
+    return [
+        field.name for field in instance._meta.concrete_fields
+        if field.many_to_one and getattr(instance, field.attname) is not None and not field.is_cached(instance)
+    ]
+
+
+def _describe(entries):
+    pending = defaultdict(list)
+    for entry in entries:
+        instance = entry.__dict__.pop('_instance', None)
+        if instance is not None:
+            pending[type(instance)].append((entry, instance))
+    for items in pending.values():
+        instances = [instance for _, instance in items]
+        relations = sorted({name for instance in instances for name in _unloaded_relations(instance)})
+        prefetch_related_objects(instances, *relations)
+        for entry, instance in items:
+            # Связанная строка могла быть удалена вместе с объектом
+            missing = any(
+                getattr(instance, field.attname) is not None and field.get_cached_value(instance) is None
+                for field in instance._meta.concrete_fields if field.many_to_one
+            )
+            description = f'{instance._meta.verbose_name} #{entry.object_id}' if missing else str(instance)
+            entry.object_repr = description[:200]
+
+
+def diff(old, new):
+    """Изменившиеся поля в виде {поле: [было, стало]}"""
+    return {
+        name: [old[name], value]
+        for name, value in new.items()
+        if name in old and old[name] != value
+    }
+
+
+def record(instance, action, changes):
+    """Ставит запись в очередь после фиксации транзакции"""
+    if not option('ENABLED'):
+        return
+    user = get_current_user()
+    entry = AuditEntry(
+        model_name=instance._meta.model_name,
+        object_id=instance.pk,
+        object_repr='' if _unloaded_relations(instance) else str(instance)[:200],
+        action=action,
+        changes=changes,
+        user_id=user.pk if user else None,
+        username=user.get_username() if user else '',
+        timestamp=timezone.now(),
+    )
+    if not entry.object_repr:
+        entry._instance = instance
+    # Изменения из отмененной транзакции в журнал не попадают
+    transaction.on_commit(lambda: buffer.put(entry))
+
+
+def record_many(queryset, action, changes):
+    """Записи для массовых операций, выполняемых в обход сигналов"""
+    if not option('ENABLED'):
+        return
+    for instance in queryset:
+        record(instance, action, changes)
+
+
+def history(model_name, object_id):
+    """История изменений объекта, начиная с последних"""
+    flush()
+    return AuditEntry.objects.filter(model_name=model_name, object_id=object_id)
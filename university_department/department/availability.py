@@ -0,0 +1,93 @@
+"""Индекс свободных аудиторий.
+
+Таблица ClassroomAvailability хранит по одной строке на аудиторию и
+обновляется сигналами при изменении рабочего места преподавателя и при
+создании/удалении аудиторий. Поиск свободной аудитории идет по индексу
+(is_free, capacity) без анти-соединения с таблицей преподавателей.
+"""
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Classroom, ClassroomAvailability, Teacher
+
+
+def free_classrooms(min_capacity=None, max_capacity=None):
+    """Свободные аудитории, упорядоченные по вместимости"""
+    queryset = Classroom.objects.filter(availability__is_free=True)
+    if min_capacity:
+        queryset = queryset.filter(availability__capacity__gte=min_capacity)
+    if max_capacity:
+        queryset = queryset.filter(availability__capacity__lte=max_capacity)
+    return queryset.order_by('availability__capacity', 'room_number')
+
+
+def suggest_free_classroom(min_capacity=1, max_capacity=None):
+    """Наименьшая свободная аудитория вместимостью от min_capacity до max_capacity"""
+    return free_classrooms(min_capacity, max_capacity).first()
+
+
+def is_free(classroom):
+    """Свободна ли аудитория (по индексу)"""
+    return ClassroomAvailability.objects.filter(
+        classroom=classroom, is_free=True
+    ).exists()
+
+
+def free_count_by_band():
+    """Количество свободных аудиторий по диапазонам вместимости"""
+    counts = dict.fromkeys(ClassroomAvailability.CAPACITY_BANDS, 0)
+    rows = (
+        ClassroomAvailability.objects.filter(is_free=True)
+        .values_list('capacity_band')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    for band, count in rows:
+        counts[band] = count
+    return counts
+
+
+def index_classroom(classroom, created=False):
+    """Добавляет аудиторию в индекс или обновляет ее вместимость"""
+    values = {
+        'capacity': classroom.capacity,
+        'capacity_band': ClassroomAvailability.band_for(classroom.capacity),
+    }
+    if created:
+        # Новая аудитория еще не может быть чьим-то рабочим местом
+        values['is_free'] = True
+        ClassroomAvailability.objects.update_or_create(classroom=classroom, defaults=values)
+        return
+    updated = ClassroomAvailability.objects.filter(classroom=classroom).update(**values)
+    if not updated:
+        values['is_free'] = not Teacher.objects.filter(workplace=classroom).exists()
+        ClassroomAvailability.objects.create(classroom=classroom, **values)
+
+
+def mark_occupied(classroom_id, occupied):
+    """Отмечает аудиторию занятой или свободной"""
+    if classroom_id is None:
+        return
+    ClassroomAvailability.objects.filter(classroom_id=classroom_id).update(is_free=not occupied)
+
+
+@transaction.atomic
+def rebuild_index():
+    """Полностью перестраивает индекс по текущим данным"""
+    occupied = set(
+        Teacher.objects.filter(workplace__isnull=False).values_list('workplace_id', flat=True)
+    )
+    ClassroomAvailability.objects.all().delete()
+    ClassroomAvailability.objects.bulk_create(
+        [
+            ClassroomAvailability(
+                classroom_id=pk,
+                capacity=capacity,
+                capacity_band=ClassroomAvailability.band_for(capacity),
+                is_free=pk not in occupied,
+            )
+            for pk, capacity in Classroom.objects.values_list('pk', 'capacity').iterator()
+        ],
+        batch_size=500,
+    )
+    return ClassroomAvailability.objects.count()
@@ -0,0 +1,172 @@
+"""Двухуровневый кеш объектов моделей кафедры.
+
+Первый уровень — ограниченный LRU в памяти процесса, второй — общий
+бэкенд из CACHES (файловый или locmem локально, Redis в продакшене).
+get_object() читает объект по первичному ключу сначала из LRU, затем из
+общего кеша и только потом из базы.
+
+Ключ объекта содержит версию, которая хранится в общем кеше и заново
+генерируется сигналами при сохранении и удалении (см. signals.py). После
+изменения в одном процессе остальные перестают находить старые ключи,
+поэтому явная очистка LRU других процессов не нужна.
+
+Версии тоже запоминаются в памяти процесса на VERSION_TIMEOUT секунд,
+иначе каждое обращение к LRU начиналось бы с чтения версии из общего
+кеша. Процесс, изменивший объект, видит новую версию сразу, остальные —
+не позже чем через VERSION_TIMEOUT: столько они могут отдавать прежний
+объект из своего LRU.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',      # общий кеш из CACHES
+    'TIMEOUT': 300,          # время жизни объекта в общем кеше, с
+    'LOCAL_SIZE': 1000,      # объектов в LRU процесса
+    'LOCAL_TIMEOUT': 60,     # время жизни объекта в LRU, с
+    'VERSION_TIMEOUT': 5,    # время жизни версии в памяти процесса (запаздывание для других процессов), с
+}
+
+
+def option(name):
+    return getattr(settings, 'OBJECT_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class LocalLRU:
+    """Потокобезопасный LRU с ограничением числа элементов и времени жизни"""
+
+    def __init__(self, timeout='LOCAL_TIMEOUT'):
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.timeout = timeout    # имя параметра со временем жизни
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + option(self.timeout), value)
+            self.data.move_to_end(key)
+            while len(self.data) > option('LOCAL_SIZE'):
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local = LocalLRU()
+versions = LocalLRU('VERSION_TIMEOUT')
+
+# Счетчики попаданий: local, shared, miss
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    for name in ('local', 'shared', 'miss'):
+        result.setdefault(name, 0)
+    total = sum(result.values())
+    result['hit_ratio'] = (result['local'] + result['shared']) / total if total else 0.0
+    return result
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def shared():
+    return caches[option('ALIAS')]
+
+
+def _version_key(model, pk):
+    return f'object_version:{model._meta.label_lower}:{pk}'
+
+
+def _version(model, pk):
+    key = _version_key(model, pk)
+    version = versions.get(key)
+    if version is None:
+        # Случайная версия не повторяется после вытеснения ключа из кеша
+        version = shared().get_or_set(key, lambda: uuid.uuid4().hex[:12], None)
+        versions.set(key, version)
+    return version
+
+
+def invalidate(model, *pks):
+    """Делает устаревшими закешированные объекты с указанными ключами"""
+    if pks:
+        new = {_version_key(model, pk): uuid.uuid4().hex[:12] for pk in pks}
+        shared().set_many(new, None)
+        for key, version in new.items():
+            versions.set(key, version)
+
+
+def get_object(model, pk):
+    """Объект по первичному ключу или None"""
+    if not option('ENABLED'):
+        return model.objects.filter(pk=pk).first()
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except Exception:
+        return None
+    key = f'object:{model._meta.label_lower}:{pk}:{_version(model, pk)}'
+
+    # В LRU хранится pickle, чтобы каждый запрос получал свою копию объекта
+    data = local.get(key)
+    if data is not None:
+        _count('local')
+        return pickle.loads(data)
+
+    obj = shared().get(key)
+    if obj is not None:
+        _count('shared')
+    else:
+        _count('miss')
+        # Объект попадет в общий кеш под текущей версией — читаем с основной базы, не с реплики
+        obj = model.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).first()
+        if obj is None:
+            return None
+        shared().set(key, obj, option('TIMEOUT'))
+    local.set(key, pickle.dumps(obj))
+    return obj
+
+
+def get_object_or_404(model, pk):
+    obj = get_object(model, pk)
+    if obj is None:
+        raise Http404(f'{model._meta.object_name} matching query does not exist.')
+    return obj
+
+
+class CachedObjectMixin:
+    """DetailView, получающий объект через двухуровневый кеш"""
+
+    def get_object(self, queryset=None):
+        return get_object_or_404(self.model, self.kwargs[self.pk_url_kwarg])
@@ -0,0 +1,132 @@
+"""Лента изменений для синхронизации внешних систем.
+
+Каждое сохранение или удаление отслеживаемого объекта заменяет его
+запись ChangeRecord новой (id растет монотонно: в SQLite первичный ключ
+AUTOINCREMENT, записи пишутся в той же транзакции, что и изменение).
+Удаление оставляет запись с deleted=True — надгробие. Клиент передает
+непрозрачный курсор из предыдущего ответа и получает объекты, изменившиеся
+после него, выборкой по первичному ключу (id > позиции), пачками.
+
+Массовые операции в обход сигналов (admin, assignments.py, archive.py)
+вызывают touch()/record() сами.
+"""
+import base64
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AdditionalWorkType, ChangeRecord, Classroom, Discipline, Teacher, TeacherAdditionalWork
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,
+    'MAX_BATCH_SIZE': 5000,
+}
+
+TRACKED = {
+    model._meta.model_name: model
+    for model in (Classroom, Discipline, AdditionalWorkType, Teacher, TeacherAdditionalWork)
+}
+
+Assignment = Teacher.disciplines.through
+
+
+def option(name):
+    return getattr(settings, 'CHANGE_FEED', {}).get(name, DEFAULTS[name])
+
+
+def record(model, *object_ids, deleted=False):
+    """Записывает изменение объектов в ленту (в текущей транзакции)"""
+    object_ids = sorted(set(pk for pk in object_ids if pk is not None))
+    if not object_ids:
+        return
+    name = model._meta.model_name
+    now = timezone.now()
+    with transaction.atomic():
+        ChangeRecord.objects.filter(model_name=name, object_id__in=object_ids).delete()
+        ChangeRecord.objects.bulk_create(
+            [ChangeRecord(model_name=name, object_id=pk, deleted=deleted, changed_at=now) for pk in object_ids],
+            batch_size=option('BATCH_SIZE'),
+        )
+
+
+def touch(model, *object_ids):
+    """Обновляет updated_at и ленту для изменений без save()"""
+    object_ids = [pk for pk in object_ids if pk is not None]
+    if object_ids:
+        model.objects.filter(pk__in=object_ids).update(updated_at=timezone.now())
+        record(model, *object_ids)
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(f'v1:{position}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Позиция в ленте; пустой курсор — начало. ValueError, если курсор испорчен"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Неверный курсор')
+    version, _, position = raw.partition(':')
+    if version != 'v1' or not position.isdigit():
+        raise ValueError('Неверный курсор')
+    return int(position)
+
+
+def _load(records):
+    """Текущие данные объектов: {(модель, id): словарь полей}"""
+    ids = defaultdict(list)
+    for change in records:
+        if not change.deleted:
+            ids[change.model_name].append(change.object_id)
+    data = {}
+    for name, object_ids in ids.items():
+        for row in TRACKED[name].objects.filter(pk__in=object_ids).values():
+            data[name, row['id']] = row
+    teacher_ids = [pk for name, pk in data if name == 'teacher']
+    if teacher_ids:
+        for row in (data['teacher', pk] for pk in teacher_ids):
+            row['disciplines'] = []
+        for teacher_id, discipline_id in (
+            Assignment.objects.filter(teacher_id__in=teacher_ids)
+            .order_by('discipline_id').values_list('teacher_id', 'discipline_id')
+        ):
+            data['teacher', teacher_id]['disciplines'].append(discipline_id)
+    return data
+
+
+def changes_since(cursor='', limit=None, models=None):
+    """Изменения после курсора: {'changes': [...], 'cursor': ..., 'has_more': ...}"""
+    position = decode_cursor(cursor)
+    limit = min(limit or option('BATCH_SIZE'), option('MAX_BATCH_SIZE'))
+    queryset = ChangeRecord.objects.filter(pk__gt=position).order_by('pk')
+    if models:
+        unknown = set(models) - set(TRACKED)
+        if unknown:
+            raise ValueError(f"Неизвестные модели: {', '.join(sorted(unknown))}")
+        queryset = queryset.filter(model_name__in=models)
+    records = list(queryset[:limit + 1])
+    has_more = len(records) > limit
+    records = records[:limit]
+    data = _load(records)
+
+    changes = []
+    for change in records:
+        row = data.get((change.model_name, change.object_id))
+        changes.append({
+            'model': change.model_name,
+            'id': change.object_id,
+            # Объект мог быть удален после записи изменения
+            'deleted': change.deleted or row is None,
+            'changed_at': change.changed_at,
+            'data': row,
+        })
+    return {
+        'changes': changes,
+        'cursor': encode_cursor(records[-1].pk if records else position),
+        'has_more': has_more,
+    }
@@ -0,0 +1,151 @@
+"""Справочник преподавателей — денормализованная модель чтения.
+
+TeacherDirectoryEntry хранит по одной строке на преподавателя: ФИО,
+должность, номер аудитории, списки дисциплин и дополнительных работ,
+их количество и текст для поиска. Список, поиск и выгрузка читают только
+эту таблицу. Строки пересчитываются после фиксации транзакции по
+сигналам исходных моделей (см. signals.py); полная перестройка —
+команда rebuild_directory.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import fuzzy
+from .models import Teacher, TeacherAdditionalWork, TeacherDirectoryEntry
+from .paginators import bump_count_version
+
+BATCH_SIZE = 500
+
+Assignment = Teacher.disciplines.through
+
+UPDATE_FIELDS = [
+    'last_name', 'first_name', 'middle_name', 'email', 'phone', 'position',
+    'academic_degree', 'employment_type', 'rate', 'photo', 'workplace_id',
+    'room_number', 'disciplines', 'discipline_count', 'work_types',
+    'work_type_count', 'search_text', 'updated_at',
+]
+
+
+def normalize(text):
+    """Текст для поиска: нижний регистр (SQLite не приводит кириллицу), ё -> е"""
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def filtered(params, fuzzy_search=False):
+    """Записи справочника с фильтрами списка преподавателей.
+
+    При fuzzy_search поиск идет по триграммному индексу (опечатки в
+    ФИО), а записи упорядочены по похожести.
+    """
+    queryset = TeacherDirectoryEntry.objects.order_by('last_name', 'first_name')
+    employment_type = params.get('employment_type')
+    if employment_type:
+        queryset = queryset.filter(employment_type=employment_type)
+    search_query = normalize(params.get('search', ''))
+    if search_query and fuzzy_search:
+        queryset = fuzzy.filter_ranked(queryset, Teacher, search_query, field='teacher_id')
+    elif search_query:
+        queryset = queryset.filter(search_text__contains=search_query)
+    return queryset
+
+
+CSV_HEADER = [
+    'Фамилия', 'Имя', 'Отчество', 'Должность', 'Ученая степень', 'Ставка',
+    'Email', 'Телефон', 'Аудитория', 'Дисциплины', 'Дополнительная работа',
+]
+
+
+def csv_rows(entries):
+    """Строки выгрузки справочника (читаются частями)"""
+    for entry in entries.iterator(chunk_size=BATCH_SIZE):
+        yield [
+            entry.last_name, entry.first_name, entry.middle_name, entry.position,
+            entry.academic_degree, entry.rate, entry.email, entry.phone, entry.room_number,
+            ', '.join(entry.discipline_list), entry.work_types.replace('\n', ', '),
+        ]
+
+
+def build_entries(teacher_ids):
+    """Строки справочника для указанных преподавателей (три запроса)"""
+    teachers = Teacher.objects.filter(pk__in=teacher_ids).select_related('workplace')
+    disciplines = defaultdict(list)
+    for teacher_id, name in (
+        Assignment.objects.filter(teacher_id__in=teacher_ids)
+        .order_by('discipline__semester', 'discipline__name')
+        .values_list('teacher_id', 'discipline__name')
+    ):
+        disciplines[teacher_id].append(name)
+    work_types = defaultdict(list)
+    for teacher_id, name in (
+        TeacherAdditionalWork.objects.filter(teacher_id__in=teacher_ids)
+        .order_by('work_type__name')
+        .values_list('teacher_id', 'work_type__name')
+    ):
+        work_types[teacher_id].append(name)
+
+    entries = []
+    for teacher in teachers:
+        names = disciplines[teacher.pk]
+        works = work_types[teacher.pk]
+        room_number = teacher.workplace.room_number if teacher.workplace else ''
+        entries.append(TeacherDirectoryEntry(
+            teacher_id=teacher.pk,
+            last_name=teacher.last_name,
+            first_name=teacher.first_name,
+            middle_name=teacher.middle_name,
+            email=teacher.email,
+            phone=teacher.phone,
+            position=teacher.position,
+            academic_degree=teacher.academic_degree,
+            employment_type=teacher.employment_type,
+            rate=teacher.rate,
+            photo=teacher.photo.name or '',
+            workplace_id=teacher.workplace_id,
+            room_number=room_number,
+            disciplines='\n'.join(names),
+            discipline_count=len(names),
+            work_types='\n'.join(works),
+            work_type_count=len(works),
+            search_text=normalize(' '.join([
+                teacher.last_name, teacher.first_name, teacher.middle_name,
+                teacher.position, teacher.academic_degree,
+            ])),
+        ))
+    return entries
+
+
+def refresh(*teacher_ids):
+    """Пересчитывает строки справочника указанных преподавателей"""
+    teacher_ids = sorted(set(pk for pk in teacher_ids if pk is not None))
+    for start in range(0, len(teacher_ids), BATCH_SIZE):
+        batch = teacher_ids[start:start + BATCH_SIZE]
+        entries = build_entries(batch)
+        with transaction.atomic():
+            TeacherDirectoryEntry.objects.bulk_create(
+                entries,
+                update_conflicts=True,
+                unique_fields=['teacher'],
+                update_fields=UPDATE_FIELDS,
+            )
+            existing = {entry.teacher_id for entry in entries}
+            missing = [pk for pk in batch if pk not in existing]
+            if missing:
+                TeacherDirectoryEntry.objects.filter(teacher_id__in=missing).delete()
+    if teacher_ids:
+        bump_count_version(TeacherDirectoryEntry)
+
+
+def schedule_refresh(*teacher_ids):
+    """Пересчет после фиксации текущей транзакции"""
+    teacher_ids = [pk for pk in teacher_ids if pk is not None]
+    if teacher_ids:
+        transaction.on_commit(lambda: refresh(*teacher_ids))
+
+
+def rebuild():
+    """Полная перестройка справочника"""
+    TeacherDirectoryEntry.objects.exclude(teacher_id__in=Teacher.objects.values('pk')).delete()
+    teacher_ids = list(Teacher.objects.order_by('pk').values_list('pk', flat=True))
+    refresh(*teacher_ids)
+    return len(teacher_ids)
@@ -0,0 +1,141 @@
+"""Фасетный поиск преподавателей.
+
+Фильтр по каждому измерению применяется как подзапрос pk__in, поэтому
+фильтры не добавляют соединений во внешний запрос. Количества для всех
+измерений считаются одним запросом: группировки по каждому измерению
+(с учетом остальных активных фильтров) объединяются через UNION ALL.
+Результат кешируется с учетом версий моделей (см. paginators.py).
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import CharField, Count, F, Q, Value
+from django.db.models.functions import Cast
+
+from . import replica
+from .models import Discipline, Teacher, TeacherAdditionalWork
+from .paginators import get_count_version
+
+FACETS_TIMEOUT = 60
+
+Assignment = Teacher.disciplines.through
+
+
+class Facet:
+    """Измерение фильтрации: параметр запроса, фильтр и выражения группировки"""
+
+    def __init__(self, name, title, lookup, value, label=None, numeric=False):
+        self.name = name
+        self.title = title
+        self.lookup = lookup
+        self.value = value
+        self.label = label or value
+        self.numeric = numeric
+
+    def parse(self, raw):
+        if not raw:
+            return None
+        if self.numeric:
+            return int(raw) if raw.isdigit() else None
+        return raw
+
+    def q(self, value):
+        return self.lookup(value)
+
+
+FACETS = [
+    Facet('position', 'Должность', lambda v: Q(position=v), 'position'),
+    Facet('academic_degree', 'Ученая степень', lambda v: Q(academic_degree=v), 'academic_degree'),
+    Facet(
+        'discipline', 'Дисциплина',
+        lambda v: Q(pk__in=Assignment.objects.filter(discipline_id=v).values('teacher_id')),
+        'disciplines__id', 'disciplines__name', numeric=True,
+    ),
+    Facet(
+        'semester', 'Семестр',
+        lambda v: Q(pk__in=Assignment.objects.filter(discipline__semester=v).values('teacher_id')),
+        'disciplines__semester', numeric=True,
+    ),
+    Facet(
+        'work_type', 'Дополнительная работа',
+        lambda v: Q(pk__in=TeacherAdditionalWork.objects.filter(work_type_id=v).values('teacher_id')),
+        'teacheradditionalwork__work_type_id', 'teacheradditionalwork__work_type__name', numeric=True,
+    ),
+]
+
+
+def selected_from(params):
+    """Выбранные значения фасетов из GET-параметров"""
+    selected = {}
+    for facet in FACETS:
+        value = facet.parse(params.get(facet.name, ''))
+        if value is not None:
+            selected[facet.name] = value
+    return selected
+
+
+def apply(queryset, selected, exclude=None):
+    for facet in FACETS:
+        if facet.name in selected and facet.name != exclude:
+            queryset = queryset.filter(facet.q(selected[facet.name]))
+    return queryset
+
+
+def _grouped(queryset, facet, selected):
+    return (
+        apply(queryset, selected, exclude=facet.name)
+        .filter(**{f'{facet.value}__isnull': False})
+        .exclude(**{facet.value: ''} if not facet.numeric else {})
+        .annotate(
+            facet=Value(facet.name, output_field=CharField()),
+            facet_value=Cast(F(facet.value), CharField()),
+            facet_label=Cast(F(facet.label), CharField()),
+        )
+        .values('facet', 'facet_value', 'facet_label')
+        .annotate(total=Count('pk', distinct=True))
+        .order_by()
+    )
+
+
+def _compute(queryset, selected):
+    parts = [_grouped(queryset, facet, selected) for facet in FACETS]
+    rows = parts[0].union(*parts[1:], all=True)
+    counts = {facet.name: [] for facet in FACETS}
+    for row in rows:
+        counts[row['facet']].append((row['facet_value'], row['facet_label'], row['total']))
+    return counts
+
+
+def facet_counts(queryset, selected):
+    """Значения фасетов с количествами: {имя: [(значение, подпись, число, выбрано)]}"""
+    try:
+        sql = str(queryset.query)
+    except Exception:
+        sql = None
+    counts = None
+    if sql is not None:
+        versions = ':'.join(
+            str(get_count_version(model)) for model in (Teacher, Discipline, TeacherAdditionalWork)
+        )
+        digest = hashlib.md5(f'{sql}|{sorted(selected.items())}'.encode()).hexdigest()
+        key = f'facets:{versions}{replica.stamp()}:{digest}'
+        counts = cache.get(key)
+    if counts is None:
+        counts = _compute(queryset, selected)
+        if sql is not None:
+            cache.set(key, counts, FACETS_TIMEOUT)
+
+    result = []
+    for facet in FACETS:
+        current = selected.get(facet.name)
+        values = counts[facet.name]
+        if facet.numeric and facet.value == facet.label:
+            values.sort(key=lambda item: int(item[0]))
+        else:
+            values.sort(key=lambda item: (-item[2], item[1]))
+        items = [(value, label, total, str(current) == value) for value, label, total in values]
+        if current is not None and not any(item[3] for item in items):
+            # Выбранное значение без совпадений все равно показываем
+            items.insert(0, (str(current), str(current), 0, True))
+        result.append((facet, items))
+    return result
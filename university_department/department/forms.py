@@ -1,7 +1,54 @@
 from django import forms
-from .models import Teacher, Classroom, Discipline, AdditionalWorkType, TeacherAdditionalWork
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+from .models import Teacher, Classroom, Discipline, AdditionalWorkType, TeacherAdditionalWork, TimetableRun
+from . import availability, metrics, storage
 
-class TeacherForm(forms.ModelForm):
+MAX_ID = 2 ** 63 - 1    # наибольший INTEGER в SQLite
+
+
+class PhotoField(forms.ImageField):
+    """Поле фотографии с проверкой размера файла и числа пикселей.
+
+    Размер изображения читается из заголовка, поэтому слишком большие
+    картинки отклоняются до полного декодирования в Pillow.
+    """
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+        limit = storage.max_upload_size()
+        if getattr(data, 'limit_exceeded', False) or getattr(data, 'size', 0) > limit:
+            raise forms.ValidationError(
+                f'Размер файла превышает {filesizeformat(limit)}.', code='file_too_large'
+            )
+        try:
+            with Image.open(data) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = None
+        except Exception:
+            # Некорректный файл отклонит стандартная проверка ImageField
+            width = height = 0
+        finally:
+            data.seek(0)
+        if width is None or width * height > storage.max_pixels():
+            raise forms.ValidationError(
+                'Слишком большое разрешение изображения.', code='too_many_pixels'
+            )
+        return super().to_python(data)
+
+
+class ValidationMetricsMixin:
+    """Неудачные проверки формы учитываются в метриках (см. metrics.py)"""
+
+    def full_clean(self):
+        super().full_clean()
+        if self.is_bound and self._errors:
+            metrics.form_invalid(self)
+
+
+class TeacherForm(ValidationMetricsMixin, forms.ModelForm):
     # Поля для аудитории (всегда создаем новую или редактируем существующую)
     room_number = forms.CharField(
         max_length=10, 
@@ -31,6 +78,7 @@ class TeacherForm(forms.ModelForm):
             'position', 'academic_degree', 'employment_date', 'employment_type',
             'rate', 'disciplines', 'notes', 'photo'
         ]
+        field_classes = {'photo': PhotoField}
         widgets = {
             'employment_date': forms.DateInput(attrs={'type': 'date'}),
             'notes': forms.Textarea(attrs={'rows': 3}),
@@ -57,6 +105,7 @@ class TeacherForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.free_classroom = None
         
         # Если редактируем существующего преподавателя
         if self.instance.pk and self.instance.workplace:
@@ -64,6 +113,19 @@ class TeacherForm(forms.ModelForm):
             self.fields['room_number'].initial = self.instance.workplace.room_number
             self.fields['capacity'].initial = self.instance.workplace.capacity
             self.fields['classroom_description'].initial = self.instance.workplace.description
+        elif not self.is_bound:
+            # Предлагаем свободную аудиторию из индекса, подходящую под кабинет
+            capacity = self.fields['capacity']
+            suggested = availability.suggest_free_classroom(capacity.min_value, capacity.max_value)
+            if suggested:
+                self.fields['room_number'].initial = suggested.room_number
+                self.fields['capacity'].initial = suggested.capacity
+                self.fields['classroom_description'].initial = suggested.description
+                self.fields['room_number'].help_text = (
+                    f'Предложена свободная аудитория {suggested.room_number}. '
+                    'Можно указать номер другой свободной или новой аудитории. '
+                    'Вместимость и описание свободной аудитории не меняются'
+                )
     
     def clean(self):
         cleaned_data = super().clean()
@@ -77,6 +139,16 @@ class TeacherForm(forms.ModelForm):
                 room_number=room_number
             ).first()
             
+            # Свободную аудиторию можно занять, если она подходит под кабинет
+            if existing_classroom and availability.is_free(existing_classroom):
+                if existing_classroom.capacity > self.fields['capacity'].max_value:
+                    raise forms.ValidationError(
+                        f"Аудитория '{room_number}' рассчитана на {existing_classroom.capacity} мест "
+                        f"и не может быть кабинетом преподавателя."
+                    )
+                self.free_classroom = existing_classroom
+                return cleaned_data
+            
             # Если редактируем существующего преподавателя
             if self.instance.pk and self.instance.workplace:
                 # Проверяем, что другой аудитории с таким номером нет
@@ -103,8 +175,11 @@ class TeacherForm(forms.ModelForm):
         capacity = self.cleaned_data['capacity']
         description = self.cleaned_data.get('classroom_description', '')
         
+        if self.free_classroom:
+            # Занимаем свободную аудиторию как есть: ее данные принадлежат аудитории
+            teacher.workplace = self.free_classroom
         # Если редактируем существующего преподавателя
-        if self.instance.pk and self.instance.workplace:
+        elif self.instance.pk and self.instance.workplace:
             # Обновляем существующую аудиторию
             classroom = self.instance.workplace
             classroom.room_number = room_number
@@ -126,7 +201,7 @@ class TeacherForm(forms.ModelForm):
         
         return teacher
 
-class ClassroomForm(forms.ModelForm):
+class ClassroomForm(ValidationMetricsMixin, forms.ModelForm):
     class Meta:
         model = Classroom
         fields = ['room_number', 'capacity', 'description']
@@ -164,7 +239,7 @@ class ClassroomForm(forms.ModelForm):
         
         return room_number
 
-class DisciplineForm(forms.ModelForm):
+class DisciplineForm(ValidationMetricsMixin, forms.ModelForm):
     class Meta:
         model = Discipline
         fields = ['name', 'semester', 'hours', 'description']
@@ -207,7 +282,7 @@ class DisciplineForm(forms.ModelForm):
         return cleaned_data
     
 
-class AdditionalWorkTypeForm(forms.ModelForm):
+class AdditionalWorkTypeForm(ValidationMetricsMixin, forms.ModelForm):
     class Meta:
         model = AdditionalWorkType
         fields = ['name', 'description', 'hours_per_week']
@@ -220,7 +295,7 @@ class AdditionalWorkTypeForm(forms.ModelForm):
             'hours_per_week': 'Часов в неделю',
         }
 
-class TeacherAdditionalWorkForm(forms.ModelForm):
+class TeacherAdditionalWorkForm(ValidationMetricsMixin, forms.ModelForm):
     class Meta:
         model = TeacherAdditionalWork
         fields = ['teacher', 'work_type', 'start_date', 'end_date', 'description']
@@ -237,7 +312,7 @@ class TeacherAdditionalWorkForm(forms.ModelForm):
             'description': 'Описание',
         }
 
-class AdditionalWorkTypeForm(forms.ModelForm):
+class AdditionalWorkTypeForm(ValidationMetricsMixin, forms.ModelForm):
     class Meta:
         model = AdditionalWorkType
         fields = ['name', 'description', 'hours_per_week']
@@ -275,7 +350,7 @@ class AdditionalWorkTypeForm(forms.ModelForm):
         
         return name
 
-class TeacherAdditionalWorkForm(forms.ModelForm):
+class TeacherAdditionalWorkForm(ValidationMetricsMixin, forms.ModelForm):
     class Meta:
         model = TeacherAdditionalWork
         fields = ['teacher', 'work_type', 'start_date', 'end_date', 'description']
@@ -290,4 +365,30 @@ class TeacherAdditionalWorkForm(forms.ModelForm):
             'start_date': 'Дата начала',
             'end_date': 'Дата окончания',
             'description': 'Описание',
-        }
\ No newline at end of file
+        }
+
+class TimetableRunForm(ValidationMetricsMixin, forms.ModelForm):
+    # Расчет занимает фоновый поток на все время лимита
+    time_budget = forms.FloatField(
+        min_value=1,
+        max_value=600,
+        label='Лимит времени расчета, с',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+
+    class Meta:
+        model = TimetableRun
+        fields = ['term', 'time_budget']
+        widgets = {
+            'term': forms.Select(attrs={'class': 'form-select'}),
+        }
+        labels = {
+            'term': 'Семестр',
+        }
+
+
+class TimetableFilterForm(forms.Form):
+    """Параметры просмотра расписания из адреса; неверные значения не учитываются"""
+    run = forms.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    teacher = forms.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    classroom = forms.IntegerField(required=False, min_value=1, max_value=MAX_ID)
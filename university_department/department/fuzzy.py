@@ -0,0 +1,159 @@
+"""Нечеткий поиск по именам преподавателей и названиям дисциплин.
+
+Имя нормализуется (нижний регистр, ё -> е, только буквы и цифры) и
+раскладывается на триграммы по словам, как в pg_trgm: слово дополняется
+двумя пробелами слева и одним справа. Индекс — таблица вхождений
+SearchTrigram (вид объекта, триграмма) -> документ; обновляется
+сигналами при сохранении и удалении (см. signals.py), полная
+перестройка — команда rebuild_search_index.
+
+Поиск выбирает из индекса ограниченное число кандидатов с наибольшим
+числом общих с запросом триграмм (один запрос с группировкой) и
+упорядочивает их по доле совпавших триграмм запроса; при равенстве выше
+документ, ближе по коэффициенту Жаккара. Полного просмотра таблиц
+объектов нет.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, When
+
+from .models import Discipline, SearchDocument, SearchTrigram, Teacher
+
+DEFAULTS = {
+    'THRESHOLD': 0.5,     # минимальная доля совпавших триграмм запроса
+    'CANDIDATES': 200,    # сколько документов-кандидатов оценивать
+    'LIMIT': 50,          # сколько результатов возвращать
+}
+
+BATCH_SIZE = 500
+
+# Модель -> (вид документа, поля с текстом)
+SOURCES = {
+    Teacher: (SearchDocument.TEACHER, ['last_name', 'first_name', 'middle_name']),
+    Discipline: (SearchDocument.DISCIPLINE, ['name']),
+}
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def option(name):
+    return getattr(settings, 'FUZZY_SEARCH', {}).get(name, DEFAULTS[name])
+
+
+def normalize(text):
+    """Нижний регистр, ё -> е, слова из букв и цифр через пробел"""
+    text = text.lower().replace('ё', 'е')
+    return ' '.join(NON_WORD_RE.sub(' ', text).split())
+
+
+def trigrams(text):
+    result = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        result.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return result
+
+
+def document_text(instance):
+    _, fields = SOURCES[type(instance)]
+    return normalize(' '.join(getattr(instance, field) or '' for field in fields))[:400]
+
+
+def _documents(instances):
+    documents = []
+    for instance in instances:
+        kind, _ = SOURCES[type(instance)]
+        text = document_text(instance)
+        documents.append((instance.pk, text, trigrams(text)))
+    return kind, documents
+
+
+def _write(kind, documents):
+    """Заменяет документы вида kind; documents — [(object_id, текст, триграммы)]"""
+    object_ids = [object_id for object_id, _, _ in documents]
+    SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+    created = SearchDocument.objects.bulk_create([
+        SearchDocument(kind=kind, object_id=object_id, text=text, trigram_count=len(grams))
+        for object_id, text, grams in documents
+    ])
+    SearchTrigram.objects.bulk_create(
+        [
+            SearchTrigram(document_id=document.pk, kind=kind, trigram=gram)
+            for document, (_, _, grams) in zip(created, documents)
+            for gram in sorted(grams)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def index(instance):
+    """Обновляет документ объекта, если его текст изменился"""
+    kind, [(object_id, text, grams)] = _documents([instance])
+    if SearchDocument.objects.filter(kind=kind, object_id=object_id, text=text).exists():
+        return
+    with transaction.atomic():
+        _write(kind, [(object_id, text, grams)])
+
+
+def remove(model, object_id):
+    kind, _ = SOURCES[model]
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild():
+    """Полная перестройка индекса; возвращает число документов"""
+    total = 0
+    for model, (kind, fields) in SOURCES.items():
+        with transaction.atomic():
+            SearchDocument.objects.filter(kind=kind).delete()
+            queryset = model.objects.order_by('pk').only('pk', *fields)
+            batch = []
+            for instance in queryset.iterator(chunk_size=BATCH_SIZE):
+                batch.append(instance)
+                if len(batch) == BATCH_SIZE:
+                    _write(*_documents(batch))
+                    total += len(batch)
+                    batch = []
+            if batch:
+                _write(*_documents(batch))
+                total += len(batch)
+    return total
+
+
+def search(model, query, limit=None):
+    """ID объектов, похожих на запрос, от более похожих: [(id, доля совпадения)]"""
+    kind, _ = SOURCES[model]
+    grams = trigrams(query)
+    if not grams:
+        return []
+    candidates = (
+        SearchTrigram.objects.filter(kind=kind, trigram__in=grams)
+        .values('document__object_id', 'document__trigram_count')
+        .annotate(common=Count('pk'))
+        .order_by('-common')[:option('CANDIDATES')]
+    )
+    threshold = option('THRESHOLD')
+    ranked = []
+    for candidate in candidates:
+        common = candidate['common']
+        score = common / len(grams)
+        if score < threshold:
+            continue
+        jaccard = common / (len(grams) + candidate['document__trigram_count'] - common)
+        ranked.append((score, jaccard, candidate['document__object_id']))
+    ranked.sort(reverse=True)
+    return [(object_id, round(score, 3)) for score, _, object_id in ranked[:limit or option('LIMIT')]]
+
+
+def filter_ranked(queryset, model, query, field='pk'):
+    """Объекты queryset, похожие на запрос, в порядке похожести"""
+    object_ids = [object_id for object_id, _ in search(model, query)]
+    return queryset.filter(**{f'{field}__in': object_ids}).order_by(
+        Case(
+            *[When(**{field: object_id}, then=position) for position, object_id in enumerate(object_ids)],
+            output_field=IntegerField(),
+        ),
+        'pk',
+    )
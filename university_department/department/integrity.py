@@ -0,0 +1,215 @@
+"""Проверка согласованности данных кафедры.
+
+Каждая проверка находит нарушения одним запросом по всей таблице
+(фильтр, группировка или подзапрос), не загружая объекты по одному, —
+ночная проверка на полных данных занимает секунды (команда
+check_integrity). Исправление идет пакетами по BATCH_SIZE объектов, каждый
+пакет — в отдельной транзакции. Массовые UPDATE выполняются в обход
+сигналов, поэтому журнал, кеш объектов, версии количеств, справочник и
+лента изменений обновляются здесь же; удаление — обычным delete(), через
+сигналы. Проверки report_only только показывают найденное: это не
+обязательно ошибки, и на код возврата команды они не влияют.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.utils import timezone
+
+from . import assignments, audit, caching, changes, directory
+from .models import AuditEntry, Classroom, Discipline, ScheduledSession, Teacher, TeacherAdditionalWork
+from .paginators import bump_count_version
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,
+    'EXAMPLES': 5,    # сколько примеров нарушений показывать
+}
+
+
+def option(name):
+    return getattr(settings, 'INTEGRITY', {}).get(name, DEFAULTS[name])
+
+
+def _teachers_updated(teachers, changed):
+    """Последствия UPDATE преподавателей: changed(teacher) -> изменения для журнала"""
+    teacher_ids = [teacher.pk for teacher in teachers]
+    for teacher in teachers:
+        audit.record(teacher, AuditEntry.UPDATE, changed(teacher))
+    changes.record(Teacher, *teacher_ids)
+    directory.schedule_refresh(*teacher_ids)
+    bump_count_version(Teacher)
+    caching.invalidate(Teacher, *teacher_ids)
+
+
+class Check:
+    """Правило: запрос нарушений, примеры и исправление пакета"""
+    name = None
+    title = None
+    repair = None    # что делает исправление
+    report_only = False    # только отчет: не исправляется и не считается нарушением
+
+    def queryset(self):
+        """Объекты, нарушающие правило"""
+        raise NotImplementedError
+
+    def count(self):
+        return self.queryset().count()
+
+    def examples(self, limit):
+        return []
+
+    def fix(self, pks):
+        """Исправляет пакет объектов, возвращает число исправленных"""
+        raise NotImplementedError
+
+
+class OrphanClassroomCheck(Check):
+    name = 'orphan_classrooms'
+    title = 'Аудитории без преподавателя, не используемые в расписании'
+    # Так выглядят и брошенные кабинеты (TeacherForm.save при переезде или
+    # удалении преподавателя), и свободные аудитории из classroom_create,
+    # которые выдает индекс свободных аудиторий, — отличить их нельзя
+    report_only = True
+
+    def queryset(self):
+        return Classroom.objects.filter(teacher__isnull=True).exclude(
+            Exists(ScheduledSession.objects.filter(classroom=OuterRef('pk')))
+        )
+
+    def examples(self, limit):
+        return [f'Ауд. {room}' for room in self.queryset().values_list('room_number', flat=True)[:limit]]
+
+
+class EmploymentTypeCheck(Check):
+    name = 'employment_type'
+    title = 'Тип занятости не соответствует ставке'
+    repair = 'тип занятости выставляется по ставке (полная при ставке 1.0)'
+
+    def expected(self):
+        return Case(
+            When(rate__gte=1.0, then=Value(Teacher.FULL_TIME)),
+            default=Value(Teacher.PART_TIME),
+        )
+
+    def queryset(self):
+        return Teacher.objects.annotate(expected=self.expected()).exclude(employment_type=F('expected'))
+
+    def examples(self, limit):
+        return [
+            f'{teacher}: ставка {teacher.rate}, {teacher.get_employment_type_display().lower()}'
+            for teacher in self.queryset().only(
+                'last_name', 'first_name', 'middle_name', 'rate', 'employment_type'
+            )[:limit]
+        ]
+
+    def fix(self, pks):
+        teachers = list(self.queryset().filter(pk__in=pks))
+        Teacher.objects.filter(pk__in=pks).update(employment_type=self.expected(), updated_at=timezone.now())
+        _teachers_updated(
+            teachers, lambda teacher: {'employment_type': [teacher.employment_type, teacher.expected]}
+        )
+        return len(teachers)
+
+
+class WorkDatesCheck(Check):
+    name = 'work_dates'
+    title = 'Дата окончания дополнительной работы раньше даты начала'
+    repair = 'дата окончания приравнивается к дате начала'
+
+    def queryset(self):
+        return TeacherAdditionalWork.objects.filter(end_date__lt=F('start_date'))
+
+    def examples(self, limit):
+        return [
+            f'{work}: {work.start_date:%d.%m.%Y} — {work.end_date:%d.%m.%Y}'
+            for work in self.queryset().select_related('teacher', 'work_type')[:limit]
+        ]
+
+    def fix(self, pks):
+        works = list(self.queryset().filter(pk__in=pks).select_related('teacher', 'work_type'))
+        TeacherAdditionalWork.objects.filter(pk__in=pks).update(
+            end_date=F('start_date'), updated_at=timezone.now()
+        )
+        work_ids = [work.pk for work in works]
+        for work in works:
+            audit.record(work, AuditEntry.UPDATE, {'end_date': [work.end_date, work.start_date]})
+        changes.record(TeacherAdditionalWork, *work_ids)
+        caching.invalidate(TeacherAdditionalWork, *work_ids)
+        return len(works)
+
+
+class DuplicateDisciplineCheck(Check):
+    name = 'duplicate_disciplines'
+    title = 'Дисциплины с одинаковым названием в одном семестре'
+    repair = 'назначения и занятия переносятся на первую дисциплину, копии удаляются'
+
+    def groups(self):
+        """{(название, семестр): [pk, ...]} для названий, встречающихся больше одного раза.
+
+        Название сравнивается без учета регистра. LOWER() в SQLite меняет
+        только латиницу, поэтому ключ строится в Python — по-прежнему одним
+        запросом, по (pk, name, semester), без загрузки объектов.
+        """
+        groups = defaultdict(list)
+        rows = Discipline.objects.order_by('pk').values_list('pk', 'name', 'semester')
+        for pk, name, semester in rows.iterator():
+            groups[name.casefold(), semester].append(pk)
+        return {key: pks for key, pks in groups.items() if len(pks) > 1}
+
+    def originals(self):
+        """{pk копии: pk первой дисциплины с тем же названием}"""
+        return {duplicate: pks[0] for pks in self.groups().values() for duplicate in pks[1:]}
+
+    def queryset(self):
+        return Discipline.objects.filter(pk__in=list(self.originals()))
+
+    def examples(self, limit):
+        groups = sorted(self.groups().values(), key=len, reverse=True)[:limit]
+        first = Discipline.objects.in_bulk([pks[0] for pks in groups])
+        return [
+            f"«{first[pks[0]].name}» ({first[pks[0]].semester} семестр): копий {len(pks)}"
+            for pks in groups
+        ]
+
+    def fix(self, pks):
+        batch = set(pks)
+        originals = {pk: original for pk, original in self.originals().items() if pk in batch}
+        if not originals:
+            return 0
+        pairs = set(assignments.Assignment.objects.filter(
+            discipline_id__in=originals
+        ).values_list('teacher_id', 'discipline_id'))
+        assignments.apply_changes(
+            {(teacher_id, originals[discipline_id]) for teacher_id, discipline_id in pairs}, pairs
+        )
+        by_original = defaultdict(list)
+        for duplicate, original in originals.items():
+            by_original[original].append(duplicate)
+        for original, duplicates in by_original.items():
+            ScheduledSession.objects.filter(discipline_id__in=duplicates).update(discipline_id=original)
+        Discipline.objects.filter(pk__in=originals).delete()
+        return len(originals)
+
+
+CHECKS = {
+    check.name: check
+    for check in (
+        OrphanClassroomCheck(), EmploymentTypeCheck(), WorkDatesCheck(), DuplicateDisciplineCheck(),
+    )
+}
+
+
+def repair(check, batch_size=None):
+    """Исправляет все нарушения правила пакетами; возвращает их число"""
+    if check.report_only:
+        return 0
+    batch_size = batch_size or option('BATCH_SIZE')
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(check.queryset().order_by('pk').values_list('pk', flat=True)[:batch_size])
+            fixed = check.fix(batch) if batch else 0
+        if not fixed:
+            return total
+        total += fixed
@@ -0,0 +1,211 @@
+"""Фоновые задачи без внешнего брокера.
+
+Задачи хранятся в таблице Job. Представление ставит задачу в очередь
+функцией enqueue() и сразу возвращает ответ; выполняет задачи команда
+run_jobs — пул потоков, который забирает задачи из очереди условным
+UPDATE (задачу получает только один обработчик, даже если их запущено
+несколько). Пока задача выполняется, цикл обработчика раз в
+HEARTBEAT_INTERVAL секунд обновляет ее heartbeat, поэтому долгая задача
+без вызовов progress_update() не считается брошенной. Задача сообщает
+прогресс функцией progress_update(); в ней же проверяется запрошенная
+отмена. Упавшая задача повторяется с
+экспоненциальной задержкой, пока не исчерпаны попытки.
+
+Функции задач регистрируются декоратором @task (см. tasks.py) и получают
+объект задачи и ее параметры.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'EAGER': False,           # выполнять сразу после фиксации (тесты, отладка)
+    'WORKERS': 2,             # потоков в run_jobs
+    'POLL_INTERVAL': 1.0,     # пауза при пустой очереди, с
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,         # задержка перед первым повтором, с
+    'STALE_TIMEOUT': 300,     # задача без активности считается брошенной, с
+    'HEARTBEAT_INTERVAL': 30, # как часто обработчик отмечает активные задачи, с
+}
+
+
+def option(name):
+    return getattr(settings, 'JOBS', {}).get(name, DEFAULTS[name])
+
+
+class JobCancelled(Exception):
+    """Отмена задачи по запросу пользователя"""
+
+
+_registry = {}
+
+
+def task(name=None, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу"""
+    def decorator(func):
+        func.job_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        _registry[func.job_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, delay=0, **params):
+    """Ставит задачу в очередь, возвращает Job"""
+    job = Job.objects.create(
+        name=func.job_name,
+        params=params,
+        max_attempts=func.max_attempts or option('MAX_ATTEMPTS'),
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    if option('EAGER'):
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def cancel(job_id):
+    """Отменяет задачу в очереди или запрашивает отмену выполняющейся"""
+    now = timezone.now()
+    if Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+        status=Job.CANCELLED, cancel_requested=True, finished_at=now
+    ):
+        return True
+    return bool(Job.objects.filter(pk=job_id, status=Job.RUNNING).update(cancel_requested=True))
+
+
+def progress_update(job, progress, message=''):
+    """Сохраняет прогресс; бросает JobCancelled, если запрошена отмена"""
+    job.progress = max(0, min(100, int(progress)))
+    job.message = message[:255]
+    Job.objects.filter(pk=job.pk).update(
+        progress=job.progress, message=job.message, heartbeat=timezone.now()
+    )
+    if Job.objects.filter(pk=job.pk, cancel_requested=True).exists():
+        raise JobCancelled
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker):
+    """Забирает следующую задачу из очереди; None, если очередь пуста"""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:5]
+    )
+    for pk in candidates:
+        # Условный UPDATE: задачу получает только один обработчик
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, heartbeat=now
+        ):
+            return pk
+    return None
+
+
+def run_job(job_id):
+    """Выполняет задачу и сохраняет результат"""
+    job = Job.objects.get(pk=job_id)
+    if job.status == Job.QUEUED:
+        # Вызов без claim() (EAGER)
+        now = timezone.now()
+        if not Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker_name(), started_at=now, heartbeat=now
+        ):
+            return
+        job.refresh_from_db()
+    func = _registry.get(job.name)
+    job.attempts += 1
+    Job.objects.filter(pk=job_id).update(attempts=job.attempts)
+    try:
+        if func is None:
+            raise LookupError(f'Неизвестная задача {job.name}')
+        result = func(job, **job.params)
+    except JobCancelled:
+        Job.objects.filter(pk=job_id).update(
+            status=Job.CANCELLED, message='Отменена', finished_at=timezone.now()
+        )
+    except Exception as exc:
+        logger.exception('Ошибка задачи %s #%s', job.name, job_id)
+        error = ''.join(traceback.format_exception(exc))
+        if job.attempts < job.max_attempts and func is not None:
+            delay = option('RETRY_DELAY') * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job_id).update(
+                status=Job.QUEUED,
+                error=error,
+                message=f'Повтор через {delay} с',
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            Job.objects.filter(pk=job_id).update(
+                status=Job.FAILED, error=error, message=str(exc)[:255], finished_at=timezone.now()
+            )
+    else:
+        Job.objects.filter(pk=job_id).update(
+            status=Job.DONE, progress=100, result=result, finished_at=timezone.now()
+        )
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, обработчик которых перестал отвечать"""
+    limit = timezone.now() - timedelta(seconds=option('STALE_TIMEOUT'))
+    return Job.objects.filter(status=Job.RUNNING, heartbeat__lt=limit).update(
+        status=Job.QUEUED, worker='', run_after=timezone.now()
+    )
+
+
+def touch(job_ids):
+    """Обновляет heartbeat выполняющихся задач одним запросом"""
+    if not job_ids:
+        return 0
+    return Job.objects.filter(pk__in=job_ids, status=Job.RUNNING).update(heartbeat=timezone.now())
+
+
+def _execute(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def work(workers=None, once=False, stop=None):
+    """Цикл обработчика: пул потоков, забирающий задачи из очереди"""
+    workers = workers or option('WORKERS')
+    stop = stop or threading.Event()
+    requeue_stale()
+    active = {}
+    beat = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') as pool:
+        while not stop.is_set():
+            active = {future: job_id for future, job_id in active.items() if not future.done()}
+            if time.monotonic() - beat >= option('HEARTBEAT_INTERVAL'):
+                # Отметка не зависит от кода задачи: она идет из цикла
+                touch(list(active.values()))
+                beat = time.monotonic()
+            claimed = 0
+            while len(active) < workers:
+                job_id = claim(worker_name())
+                if job_id is None:
+                    break
+                active[pool.submit(_execute, job_id)] = job_id
+                claimed += 1
+            if once and not claimed and not active:
+                break
+            if not claimed:
+                time.sleep(option('POLL_INTERVAL'))
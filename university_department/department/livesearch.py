@@ -0,0 +1,91 @@
+"""Живой поиск в списках.
+
+Поле поиска запрашивает не всю страницу, а только фрагмент с
+результатами и пагинацией (режим фрагмента списков, заголовок
+X-Fragment). Готовый фрагмент кешируется на несколько секунд с учетом
+версий моделей (см. paginators.py), а одинаковые запросы, пришедшие
+одновременно, объединяются: фрагмент строит один поток, остальные ждут
+его результат.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import replica
+from .paginators import get_count_version
+
+DEFAULTS = {
+    'TIMEOUT': 10,    # время жизни фрагмента в кеше, с
+    'WAIT': 5.0,      # сколько ждать чужого расчета, с
+}
+
+FRAGMENT_HEADER = 'X-Fragment'
+
+
+def option(name):
+    return getattr(settings, 'LIVE_SEARCH', {}).get(name, DEFAULTS[name])
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных вычислений в процессе"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if call.event.wait(option('WAIT')) and call.error is None:
+                return call.result
+            # Расчет не успел или упал — считаем сами
+            return func()
+        try:
+            call.result = func()
+            return call.result
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+flights = SingleFlight()
+
+
+def cache_key(scope, params, models):
+    versions = ':'.join(str(get_count_version(model)) for model in models)
+    query = sorted((key, value) for key, values in params.lists() for value in values if value)
+    digest = hashlib.md5(repr(query).encode()).hexdigest()
+    return f'live_search:{scope}:{versions}{replica.stamp()}:{digest}'
+
+
+def fragment(scope, params, models, render):
+    """Фрагмент из кеша или render() -> (статус, содержимое)"""
+    key = cache_key(scope, params, models)
+    content = cache.get(key)
+    if content is not None:
+        return 200, content
+
+    def compute():
+        status, content = render()
+        if status == 200:
+            cache.set(key, content, option('TIMEOUT'))
+        return status, content
+
+    return flights.do(key, compute)
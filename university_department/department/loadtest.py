@@ -0,0 +1,525 @@
+"""Нагрузочное тестирование WSGI-приложения.
+
+Виртуальные пользователи (потоки) выполняют смесь действий: просмотр
+списков и карточек (browse), поиск и фильтры (search) и редактирование
+через формы с CSRF-токеном (edit). Запросы отправляются либо прямо в
+university_department.wsgi.application внутри процесса, либо на
+локальный сервер по HTTP. По каждому маршруту считаются число запросов,
+пропускная способность, задержки p50/p95/p99, доля ошибок, отказы
+ограничителя запросов (429, отдельно от ошибок) и ожидания блокировок
+SQLite. Внутри процесса ограничитель выключен: все виртуальные
+пользователи приходят с одного адреса.
+
+Ожидание блокировки SQLite проходит внутри обработчика занятости
+драйвера и снаружи видно только как долгий запрос. Поэтому внутри
+процесса учитываются пишущие запросы дольше порога и ошибки
+"database is locked"; в режиме HTTP доступны только ошибки.
+
+Команда loadtest по умолчанию создает временную базу и заполняет ее
+функцией generate_dataset(), так что тест не трогает рабочие данные и
+не требует сети.
+"""
+import io
+import itertools
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+from http.cookiejar import CookieJar
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.urls import reverse
+
+from .models import (
+    AdditionalWorkType, Classroom, Discipline, Teacher, TeacherAdditionalWork,
+)
+
+PAGE_SIZE = 10
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+CSRF_TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+DEFAULT_MIX = {'browse': 70, 'search': 20, 'edit': 10}
+
+
+def parse_mix(value):
+    """'browse=70,search=20,edit=10' -> {'browse': 70, ...}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX or not weight.strip().isdigit():
+            raise ValueError(f'Неверный элемент смеси: {part!r}')
+        mix[name] = int(weight)
+    if not sum(mix.values()):
+        raise ValueError('Сумма весов смеси должна быть больше нуля')
+    return mix
+
+
+# Тестовые данные
+
+LAST_NAMES = [
+    'Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов',
+    'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков', 'Зайцев', 'Павлов',
+    'Семенов', 'Голубев', 'Виноградов', 'Богданов', 'Воробьев', 'Федоров',
+]
+FIRST_NAMES = ['Александр', 'Сергей', 'Дмитрий', 'Андрей', 'Алексей', 'Михаил', 'Игорь', 'Николай']
+MIDDLE_NAMES = ['Александрович', 'Сергеевич', 'Дмитриевич', 'Андреевич', 'Петрович', 'Иванович']
+POSITIONS = ['Профессор', 'Доцент', 'Старший преподаватель', 'Ассистент', 'Заведующий кафедрой']
+DEGREES = ['Доктор наук', 'Кандидат технических наук', 'Кандидат физико-математических наук', '']
+SUBJECTS = [
+    'Программирование', 'Базы данных', 'Операционные системы', 'Компьютерные сети',
+    'Математический анализ', 'Дискретная математика', 'Теория вероятностей',
+    'Машинное обучение', 'Веб-разработка', 'Информационная безопасность',
+]
+WORK_TYPES = [
+    'Кураторство', 'Руководство практикой', 'Научная работа', 'Профориентация',
+    'Методическая работа', 'Олимпиады', 'Руководство ВКР', 'Приемная комиссия',
+]
+
+
+def generate_dataset(teachers=300, seed=0):
+    """Заполняет пустую базу синтетическими данными заданного объема"""
+    from . import availability, directory, fuzzy
+
+    rng = random.Random(seed)
+    classrooms = Classroom.objects.bulk_create([
+        Classroom(
+            room_number=f'{index // 100 + 1}{index % 100:02d}',
+            capacity=rng.choice([1, 1, 2, 15, 25, 30]),
+            description=f'Аудитория {index}',
+        )
+        for index in range(teachers + teachers // 10 + 1)
+    ])
+    disciplines = Discipline.objects.bulk_create([
+        Discipline(
+            name=f'{SUBJECTS[index % len(SUBJECTS)]} {index // len(SUBJECTS) + 1}',
+            semester=index % 8 + 1,
+            hours=rng.choice([36, 72, 108, 144]),
+            description=f'Дисциплина {index}',
+        )
+        for index in range(max(teachers // 4, len(SUBJECTS)))
+    ])
+    work_types = AdditionalWorkType.objects.bulk_create([
+        AdditionalWorkType(name=name, hours_per_week=rng.randint(1, 6)) for name in WORK_TYPES
+    ])
+    start = date(2010, 1, 1)
+    staff = Teacher.objects.bulk_create([
+        Teacher(
+            last_name=rng.choice(LAST_NAMES),
+            first_name=rng.choice(FIRST_NAMES),
+            middle_name=rng.choice(MIDDLE_NAMES),
+            email=f'teacher{index}@example.com',
+            phone=f'+7 900 {index:07d}',
+            position=rng.choice(POSITIONS),
+            academic_degree=rng.choice(DEGREES),
+            employment_date=start + timedelta(days=rng.randint(0, 5000)),
+            employment_type=rng.choice([Teacher.FULL_TIME, Teacher.PART_TIME]),
+            rate=rng.choice([0.25, 0.5, 0.75, 1.0]),
+            workplace=classrooms[index],
+        )
+        for index in range(teachers)
+    ])
+    Assignment = Teacher.disciplines.through
+    Assignment.objects.bulk_create([
+        Assignment(teacher_id=teacher.pk, discipline_id=discipline.pk)
+        for teacher in staff
+        for discipline in rng.sample(disciplines, rng.randint(1, min(6, len(disciplines))))
+    ])
+    TeacherAdditionalWork.objects.bulk_create([
+        TeacherAdditionalWork(
+            teacher=teacher,
+            work_type=work_type,
+            start_date=start + timedelta(days=rng.randint(3000, 5000)),
+        )
+        for teacher in staff
+        for work_type in rng.sample(work_types, rng.randint(0, 2))
+    ])
+    availability.rebuild_index()
+    directory.rebuild()
+    fuzzy.rebuild()
+    return len(staff)
+
+
+# Клиенты
+
+class InProcessClient:
+    """Вызывает WSGI-приложение напрямую; хранит cookie пользователя"""
+    # Свой адрес у каждого пользователя: ограничение запросов считается по IP
+    numbers = itertools.count()
+
+    def __init__(self, application, host=None, lock_threshold=0.02):
+        self.application = application
+        self.host = host or self._default_host()
+        self.lock_threshold = lock_threshold
+        self.cookies = SimpleCookie()
+        number = next(self.numbers)
+        self.remote_addr = f'10.0.{number // 250 % 256}.{number % 250 + 1}'
+
+    @staticmethod
+    def _default_host():
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+        return hosts[0] if hosts else 'localhost'
+
+    def request(self, method, path, data=None):
+        """Возвращает (статус, тело, LockRecorder)"""
+        url = urlsplit(path)
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': self.remote_addr,
+            'HTTP_HOST': self.host,
+            'HTTP_COOKIE': '; '.join(f'{key}={morsel.value}' for key, morsel in self.cookies.items()),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    self.cookies.load(value)
+
+        recorder = LockRecorder(self.lock_threshold)
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(recorder):
+            result = self.application(environ, start_response)
+            try:
+                content = b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        return response.get('status', 0), content.decode('utf-8', 'replace'), recorder
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Отправляет запросы на запущенный сервер; хранит cookie пользователя"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read().decode('utf-8', 'replace'), None
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode('utf-8', 'replace'), None
+
+
+class LockRecorder:
+    """Обертка запросов к базе: ожидания и ошибки блокировок SQLite"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.waits = 0
+        self.wait_time = 0.0
+        self.locked = 0
+
+    def _wait(self, started):
+        self.waits += 1
+        self.wait_time += time.perf_counter() - started
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        except OperationalError as exc:
+            if 'locked' in str(exc):
+                self.locked += 1
+                self._wait(started)
+            raise
+        if (
+            sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+            and time.perf_counter() - started >= self.threshold
+        ):
+            self._wait(started)
+        return result
+
+
+# Сценарий
+
+def csrf_token(body):
+    match = CSRF_TOKEN_RE.search(body)
+    return match.group(1) if match else ''
+
+
+class Scenario:
+    """Действия пользователей над маршрутами department/urls.py"""
+
+    def __init__(self, mix=None):
+        self.mix = mix or DEFAULT_MIX
+        self.teachers = list(Teacher.objects.values_list('pk', flat=True))
+        self.classrooms = list(Classroom.objects.values_list('pk', flat=True))
+        self.disciplines = list(Discipline.objects.values_list('pk', flat=True))
+        if not (self.teachers and self.classrooms and self.disciplines):
+            raise ValueError('В базе нет данных для нагрузочного теста')
+        self.last_names = sorted(set(Teacher.objects.values_list('last_name', flat=True)))
+        self.positions = sorted(set(Teacher.objects.values_list('position', flat=True)))
+        self.actions = {
+            'browse': [
+                self.home, self.teacher_list, self.teacher_detail, self.classroom_list,
+                self.classroom_detail, self.discipline_list, self.discipline_detail,
+                self.assignment_matrix,
+            ],
+            'search': [
+                self.teacher_search, self.teacher_facets, self.discipline_search, self.classroom_search,
+            ],
+            'edit': [self.discipline_edit, self.classroom_edit],
+        }
+
+    def choose(self, rng):
+        kinds = [kind for kind in self.mix if self.mix[kind]]
+        kind = rng.choices(kinds, weights=[self.mix[kind] for kind in kinds])[0]
+        return rng.choice(self.actions[kind])
+
+    @staticmethod
+    def _page(rng, total):
+        return rng.randint(1, max(1, -(-total // PAGE_SIZE)))
+
+    # browse
+
+    def home(self, user, rng):
+        user.call('home', 'GET', reverse('department:home'))
+
+    def teacher_list(self, user, rng):
+        page = self._page(rng, len(self.teachers))
+        user.call('teacher_list', 'GET', f"{reverse('department:teacher_list')}?page={page}")
+
+    def teacher_detail(self, user, rng):
+        pk = rng.choice(self.teachers)
+        user.call('teacher_detail', 'GET', reverse('department:teacher_detail', args=[pk]))
+
+    def classroom_list(self, user, rng):
+        page = self._page(rng, len(self.classrooms))
+        user.call('classroom_list', 'GET', f"{reverse('department:classroom_list')}?page={page}")
+
+    def classroom_detail(self, user, rng):
+        pk = rng.choice(self.classrooms)
+        user.call('classroom_detail', 'GET', reverse('department:classroom_detail', args=[pk]))
+
+    def discipline_list(self, user, rng):
+        page = self._page(rng, len(self.disciplines))
+        user.call('discipline_list', 'GET', f"{reverse('department:discipline_list')}?page={page}")
+
+    def discipline_detail(self, user, rng):
+        pk = rng.choice(self.disciplines)
+        user.call('discipline_detail', 'GET', reverse('department:discipline_detail', args=[pk]))
+
+    def assignment_matrix(self, user, rng):
+        user.call('assignment_matrix', 'GET', reverse('department:assignment_matrix'))
+
+    # search
+
+    def teacher_search(self, user, rng):
+        query = urlencode({'search': rng.choice(self.last_names)[:4]})
+        user.call('teacher_list', 'GET', f"{reverse('department:teacher_list')}?{query}")
+
+    def teacher_facets(self, user, rng):
+        query = urlencode({'position': rng.choice(self.positions), 'semester': rng.randint(1, 8)})
+        user.call('teacher_list', 'GET', f"{reverse('department:teacher_list')}?{query}")
+
+    def discipline_search(self, user, rng):
+        query = urlencode({'semester': rng.randint(1, 8)})
+        user.call('discipline_list', 'GET', f"{reverse('department:discipline_list')}?{query}")
+
+    def classroom_search(self, user, rng):
+        query = urlencode({'search': str(rng.randint(1, 9)), 'free': rng.choice(['', '1'])})
+        user.call('classroom_list', 'GET', f"{reverse('department:classroom_list')}?{query}")
+
+    # edit
+
+    def discipline_edit(self, user, rng):
+        pk = rng.choice(self.disciplines)
+        url = reverse('department:discipline_update', args=[pk])
+        body = user.call('discipline_update', 'GET', url)
+        discipline = Discipline.objects.filter(pk=pk).first()
+        if body is None or discipline is None:
+            return
+        user.call('discipline_update', 'POST', url, {
+            'csrfmiddlewaretoken': csrf_token(body),
+            'name': discipline.name,
+            'semester': discipline.semester,
+            'hours': discipline.hours,
+            'description': f'Нагрузочный тест {rng.randint(1, 10 ** 6)}',
+        })
+
+    def classroom_edit(self, user, rng):
+        pk = rng.choice(self.classrooms)
+        url = reverse('department:classroom_update', args=[pk])
+        body = user.call('classroom_update', 'GET', url)
+        classroom = Classroom.objects.filter(pk=pk).first()
+        if body is None or classroom is None:
+            return
+        user.call('classroom_update', 'POST', url, {
+            'csrfmiddlewaretoken': csrf_token(body),
+            'room_number': classroom.room_number,
+            'capacity': classroom.capacity,
+            'description': f'Нагрузочный тест {rng.randint(1, 10 ** 6)}',
+        })
+
+
+# Запуск и статистика
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.throttled = 0
+        self.lock_waits = 0
+        self.lock_time = 0.0
+        self.lock_errors = 0
+
+
+def percentile(values, fraction):
+    """Процентиль по ближайшему рангу (values отсортирован)"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class Stats:
+    """Результаты по маршрутам (потокобезопасно)"""
+
+    def __init__(self):
+        self.routes = defaultdict(RouteStats)
+        self.lock = threading.Lock()
+        self.elapsed = 0.0
+
+    def add(self, route, latency, status, recorder):
+        with self.lock:
+            stats = self.routes[route]
+            stats.latencies.append(latency)
+            if status == 429:
+                # Отказ ограничителя запросов — не ошибка приложения
+                stats.throttled += 1
+            elif status == 0 or status >= 400:
+                stats.errors += 1
+            if recorder is not None:
+                stats.lock_waits += recorder.waits
+                stats.lock_time += recorder.wait_time
+                stats.lock_errors += recorder.locked
+
+    def rows(self):
+        """Сводка: [(маршрут, запросов, запр/с, p50, p95, p99 мс, % ошибок, 429, ожиданий, мс ожиданий)]"""
+        elapsed = self.elapsed or 1.0
+        names = sorted(self.routes)
+        result = []
+        for name in names + ['ВСЕГО']:
+            if name == 'ВСЕГО':
+                stats = RouteStats()
+                for route in self.routes.values():
+                    stats.latencies.extend(route.latencies)
+                    stats.errors += route.errors
+                    stats.throttled += route.throttled
+                    stats.lock_waits += route.lock_waits
+                    stats.lock_time += route.lock_time
+                    stats.lock_errors += route.lock_errors
+            else:
+                stats = self.routes[name]
+            latencies = sorted(stats.latencies)
+            count = len(latencies)
+            result.append({
+                'route': name,
+                'requests': count,
+                'rps': round(count / elapsed, 1),
+                'p50': round(percentile(latencies, 0.50) * 1000, 1),
+                'p95': round(percentile(latencies, 0.95) * 1000, 1),
+                'p99': round(percentile(latencies, 0.99) * 1000, 1),
+                'error_rate': round(100 * stats.errors / count, 2) if count else 0.0,
+                'throttled': stats.throttled,
+                'lock_waits': stats.lock_waits,
+                'lock_wait_ms': round(stats.lock_time * 1000, 1),
+                'lock_errors': stats.lock_errors,
+            })
+        return result
+
+
+class VirtualUser:
+    """Пользователь со своими cookie; замеряет каждый запрос"""
+
+    def __init__(self, client, stats):
+        self.client = client
+        self.stats = stats
+
+    def call(self, route, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            status, body, recorder = self.client.request(method, path, data)
+        except Exception:
+            status, body, recorder = 0, None, None
+        self.stats.add(route, time.perf_counter() - started, status, recorder)
+        return body if status and status < 400 else None
+
+
+def run(client_factory, scenario, users=10, duration=30.0, requests=None, think_time=0.0, seed=None):
+    """Запускает пользователей в потоках и возвращает Stats.
+
+    Тест длится duration секунд или до requests действий (что раньше).
+    """
+    stats = Stats()
+    deadline = time.monotonic() + duration if duration else None
+    budget = {'left': requests}
+    budget_lock = threading.Lock()
+
+    def take():
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        if budget['left'] is None:
+            return True
+        with budget_lock:
+            if budget['left'] <= 0:
+                return False
+            budget['left'] -= 1
+            return True
+
+    def worker(number):
+        rng = random.Random(None if seed is None else seed + number)
+        user = VirtualUser(client_factory(), stats)
+        try:
+            while take():
+                scenario.choose(rng)(user, rng)
+                if think_time:
+                    time.sleep(rng.uniform(0, 2 * think_time))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats.elapsed = time.perf_counter() - started
+    return stats
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from department import archive
+
+
+class Command(BaseCommand):
+    help = 'Переносит завершенную дополнительную работу в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days', type=int, default=archive.option('KEEP_DAYS'),
+            help='Сколько дней после окончания назначение остается в рабочей таблице'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=archive.option('BATCH_SIZE'), help='Назначений в одной транзакции'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, сколько будет перенесено')
+
+    def handle(self, *args, **options):
+        before = archive.cutoff(options['keep_days'])
+        if options['dry_run']:
+            total = archive.archivable(before).count()
+            self.stdout.write(f'Будет перенесено в архив: {total} (окончание раньше {before:%d.%m.%Y})')
+            return
+        total = archive.archive(before=before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено в архив: {total}'))
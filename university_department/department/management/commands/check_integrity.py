@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from department import integrity
+
+
+class Command(BaseCommand):
+    help = 'Проверяет согласованность данных и при необходимости исправляет нарушения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='append', choices=list(integrity.CHECKS), dest='checks',
+            help='Выполнить только эту проверку (можно указать несколько раз)'
+        )
+        parser.add_argument('--fix', action='store_true', help='Исправить найденные нарушения')
+        parser.add_argument(
+            '--batch-size', type=int, default=integrity.option('BATCH_SIZE'),
+            help='Объектов в одной транзакции при исправлении'
+        )
+        parser.add_argument(
+            '--examples', type=int, default=integrity.option('EXAMPLES'),
+            help='Сколько примеров нарушений показывать'
+        )
+
+    def handle(self, *args, **options):
+        checks = [integrity.CHECKS[name] for name in options['checks'] or integrity.CHECKS]
+        remaining = 0
+        for check in checks:
+            count = check.count()
+            if check.report_only:
+                self.stdout.write(f'• {check.title}: {count} (только отчет)')
+                for example in check.examples(options['examples']):
+                    self.stdout.write(f'    {example}')
+                continue
+            if not count:
+                self.stdout.write(self.style.SUCCESS(f'✓ {check.title}: нарушений нет'))
+                continue
+            self.stdout.write(self.style.WARNING(f'✗ {check.title}: {count}'))
+            for example in check.examples(options['examples']):
+                self.stdout.write(f'    {example}')
+            if options['fix']:
+                fixed = integrity.repair(check, options['batch_size'])
+                self.stdout.write(f'  Исправлено: {fixed} ({check.repair})')
+                count = check.count()
+            remaining += count
+
+        if remaining:
+            raise CommandError(f'Нарушений: {remaining}')
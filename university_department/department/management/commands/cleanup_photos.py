@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from department.models import StoredFile, Teacher
+from department.storage import photo_storage
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ссылки на фотографии и удаляет неиспользуемые файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        storage = photo_storage()
+        references = dict(
+            Teacher.objects.exclude(photo='').exclude(photo__isnull=True)
+            .values_list('photo').annotate(total=Count('pk')).order_by()
+        )
+
+        orphans = []
+        for root, _, files in os.walk(storage.path('teachers')):
+            for filename in files:
+                name = os.path.relpath(os.path.join(root, filename), storage.location).replace(os.sep, '/')
+                if name not in references:
+                    orphans.append(name)
+
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(name)
+            self.stdout.write(f'Неиспользуемых файлов: {len(orphans)}')
+            return
+
+        with transaction.atomic():
+            StoredFile.objects.exclude(name__in=references).delete()
+            tracked = StoredFile.objects.in_bulk(list(references))
+            for name, total in references.items():
+                stored = tracked.get(name)
+                if stored is None:
+                    if storage.exists(name):
+                        StoredFile.objects.create(name=name, size=storage.size(name), ref_count=total)
+                elif stored.ref_count != total:
+                    stored.ref_count = total
+                    stored.save(update_fields=['ref_count'])
+
+        for name in orphans:
+            storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(f'Удалено неиспользуемых файлов: {len(orphans)}'))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from department import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Снимки базы SQLite: сохранение, восстановление и список'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['save', 'restore', 'delete', 'list'], help='Действие')
+        parser.add_argument('name', nargs='?', help='Имя снимка')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Псевдоним базы')
+
+    def handle(self, *args, **options):
+        action, name = options['action'], options['name']
+        if action == 'list':
+            for name, size, modified in snapshots.snapshots():
+                self.stdout.write(
+                    f'{name:<30}{size / 1024 / 1024:>8.1f} МБ  {time.strftime("%d.%m.%Y %H:%M", time.localtime(modified))}'
+                )
+            return
+        if not name:
+            raise CommandError('Укажите имя снимка')
+
+        started = time.monotonic()
+        try:
+            if action == 'save':
+                snapshots.create(name, using=options['database'])
+            elif action == 'restore':
+                snapshots.restore(name, using=options['database'])
+            else:
+                snapshots.delete(name)
+        except (ValueError, FileNotFoundError) as exc:
+            raise CommandError(exc)
+        elapsed = (time.monotonic() - started) * 1000
+        messages = {'save': 'Снимок сохранен', 'restore': 'База восстановлена из снимка', 'delete': 'Снимок удален'}
+        self.stdout.write(self.style.SUCCESS(f'{messages[action]}: {name} ({elapsed:.0f} мс)'))
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+
+from department import audit, loadtest, snapshots
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест приложения: пропускная способность, задержки и ошибки по маршрутам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Число одновременных пользователей')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность теста, с')
+        parser.add_argument('--requests', type=int, help='Ограничение числа действий')
+        parser.add_argument(
+            '--mix', default='browse=70,search=20,edit=10',
+            help='Доли действий: просмотр, поиск, редактирование'
+        )
+        parser.add_argument('--think-time', type=float, default=0, help='Средняя пауза между действиями, мс')
+        parser.add_argument(
+            '--url', help='Адрес запущенного сервера (по умолчанию приложение вызывается в процессе)'
+        )
+        parser.add_argument(
+            '--teachers', type=int, default=300, help='Объем временной базы: число преподавателей'
+        )
+        parser.add_argument(
+            '--lock-threshold', type=float, default=20,
+            help='Пишущий запрос дольше порога считается ожиданием блокировки, мс'
+        )
+        parser.add_argument('--seed', type=int, help='Начальное значение генератора случайных чисел')
+        parser.add_argument(
+            '--snapshot',
+            help='Взять временную базу из снимка; если снимка нет, сохранить в него созданные данные'
+        )
+        parser.add_argument('--json', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+            if options['snapshot']:
+                snapshots.path(options['snapshot'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['url']:
+            stats = self._run_http(mix, options)
+        else:
+            stats = self._run_in_process(mix, options)
+        rows = stats.rows()
+        self._report(rows, stats.elapsed)
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as output:
+                json.dump({'elapsed': stats.elapsed, 'routes': rows}, output, ensure_ascii=False, indent=2)
+
+    def _run(self, factory, mix, options):
+        try:
+            scenario = loadtest.Scenario(mix)
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(
+            f"Пользователей: {options['users']}, длительность: {options['duration']} с, смесь: {mix}"
+        )
+        return loadtest.run(
+            factory,
+            scenario,
+            users=options['users'],
+            duration=options['duration'],
+            requests=options['requests'],
+            think_time=options['think_time'] / 1000,
+            seed=options['seed'],
+        )
+
+    def _run_http(self, mix, options):
+        # Идентификаторы объектов берутся из настроенной базы: сервер должен работать с ней же
+        url = options['url']
+        return self._run(lambda: loadtest.HttpClient(url), mix, options)
+
+    def _run_in_process(self, mix, options):
+        from university_department.wsgi import application
+
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Встроенный режим рассчитан на SQLite; для других баз используйте --url')
+        threshold = options['lock_threshold'] / 1000
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            # Отдельный кеш, чтобы не смешивать временные данные с рабочими
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'loadtest',
+            }},
+            MEDIA_ROOT=directory,
+            # Реплика — копия рабочей базы, а не временной
+            REPLICA={**getattr(settings, 'REPLICA', {}), 'ENABLED': False},
+            # Все виртуальные пользователи — один адрес; 429 исказили бы долю ошибок
+            THROTTLING={**getattr(settings, 'THROTTLING', {}), 'ENABLED': False},
+        ):
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'loadtest.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self._load_dataset(options)
+                return self._run(
+                    lambda: loadtest.InProcessClient(application, lock_threshold=threshold), mix, options
+                )
+            finally:
+                audit.flush()
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _load_dataset(self, options):
+        name = options['snapshot']
+        if name and snapshots.path(name).exists():
+            self.stdout.write(f'Загрузка данных из снимка {name}...')
+            snapshots.restore(name)
+            return
+        self.stdout.write('Создание тестовых данных...')
+        loadtest.generate_dataset(options['teachers'], seed=options['seed'] or 0)
+        if name:
+            snapshots.create(name)
+            self.stdout.write(f'Данные сохранены в снимок {name}')
+
+    def _report(self, rows, elapsed):
+        self.stdout.write(f'Время теста: {elapsed:.1f} с')
+        header = (
+            f"{'Маршрут':<28}{'Запросов':>9}{'Запр/с':>8}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}"
+            f"{'Ошибки %':>10}{'429':>6}{'Блок.':>7}{'Блок. мс':>10}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in rows:
+            line = (
+                f"{row['route']:<28}{row['requests']:>9}{row['rps']:>8}{row['p50']:>9}{row['p95']:>9}"
+                f"{row['p99']:>9}{row['error_rate']:>10}{row['throttled']:>6}{row['lock_waits']:>7}"
+                f"{row['lock_wait_ms']:>10}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['error_rate'] else line)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from department.availability import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает индекс свободных аудиторий'
+
+    def handle(self, *args, **options):
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Индекс перестроен: {total} аудиторий'))
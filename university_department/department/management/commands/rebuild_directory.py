@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from department.directory import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает справочник преподавателей'
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Справочник перестроен: {total} преподавателей'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from department.fuzzy import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает триграммный индекс нечеткого поиска'
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Индекс поиска перестроен: {total} документов'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from department import replica
+
+
+class Command(BaseCommand):
+    help = 'Обновляет локальную реплику базы для чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Обновлять постоянно с периодом REPLICA["REFRESH_INTERVAL"]'
+        )
+        parser.add_argument('--interval', type=float, help='Период обновления, с')
+
+    def handle(self, *args, **options):
+        if not replica.configured() or not replica.option('LOCAL_COPY'):
+            raise CommandError('Локальная реплика не настроена (REPLICA и DATABASES)')
+        interval = options['interval'] or replica.option('REFRESH_INTERVAL')
+        while True:
+            started = time.monotonic()
+            path = replica.refresh()
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'Реплика обновлена: {path} ({elapsed * 1000:.0f} мс)')
+            if not options['loop']:
+                return
+            time.sleep(max(0.0, interval - elapsed))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from department import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=jobs.option('WORKERS'), help='Число потоков'
+        )
+        parser.add_argument(
+            '--once', action='store_true', help='Завершиться, когда очередь опустеет'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Обработчик задач запущен, потоков: {options['workers']}")
+        try:
+            jobs.work(workers=options['workers'], once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлен')
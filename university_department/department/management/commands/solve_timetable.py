@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from department import timetable
+from department.models import TimetableRun
+
+
+class Command(BaseCommand):
+    help = 'Рассчитывает расписание занятий'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--term',
+            choices=[TimetableRun.AUTUMN, TimetableRun.SPRING],
+            default=TimetableRun.AUTUMN,
+            help='Семестр: autumn (нечетные) или spring (четные)',
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=float,
+            default=timetable.option('TIME_BUDGET'),
+            help='Лимит времени расчета, с',
+        )
+
+    def handle(self, *args, **options):
+        run = TimetableRun.objects.create(term=options['term'], time_budget=options['time_budget'])
+        run = timetable.solve_run(run.pk)
+        if run.status == TimetableRun.FAILED:
+            self.stderr.write(self.style.ERROR(f'Ошибка расчета: {run.message}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{run}: занятий {run.total_sessions}, не размещено {run.unscheduled}, штраф {run.penalty}'
+        ))
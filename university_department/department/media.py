@@ -0,0 +1,130 @@
+"""Отдача загруженных файлов (фотографий преподавателей).
+
+Файл отдается через FileResponse: WSGI-сервер с поддержкой
+wsgi.file_wrapper (gunicorn, uWSGI) передает его через sendfile без
+копирования в Python. Если перед приложением стоит nginx, можно задать
+MEDIA_ACCEL_REDIRECT — тогда файл отдаст nginx по X-Accel-Redirect.
+ETag и Last-Modified вычисляются по stat(), поэтому повторный запрос
+получает 304 без чтения файла. Поддерживаются запросы диапазонов байтов.
+Имена, содержащие хеш содержимого, кешируются бессрочно.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE = 60 * 60
+
+# Имя файла вида <sha256>.<расширение> (адресация по содержимому)
+CONTENT_ADDRESSED_RE = re.compile(r'(^|/)[0-9a-f]{64}\.[\w]+$')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _range_reader(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header, size):
+    """(start, end) для одного диапазона; None — заголовок игнорируется"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Последние N байт
+        length = int(last)
+        if length == 0:
+            return (size, size)
+        return (max(size - length, 0), size - 1)
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        return (size, size) if start >= size else None
+    return (start, end)
+
+
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    last_modified = http_date(st.st_mtime)
+    immutable = bool(CONTENT_ADDRESSED_RE.search(path))
+    cache_control = (
+        f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable
+        else f'public, max-age={DEFAULT_MAX_AGE}'
+    )
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    # 304 / 412 по If-None-Match и If-Modified-Since
+    unchanged = with_headers(HttpResponse())
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(st.st_mtime), response=unchanged
+    )
+    if conditional is not unchanged:
+        return conditional
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and request.META.get('HTTP_IF_RANGE', etag) in (etag, last_modified):
+        byte_range = _parse_range(range_header, st.st_size)
+
+    if byte_range is not None:
+        start, end = byte_range
+        if start >= st.st_size:
+            response = with_headers(HttpResponse(status=416))
+            response['Content-Range'] = f'bytes */{st.st_size}'
+            return response
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _range_reader(full_path, start, length), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+        response['Content-Length'] = str(length)
+        return with_headers(response)
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+    if accel_prefix:
+        # Передача файла веб-серверу (nginx internal location)
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path.lstrip('/')
+        return with_headers(response)
+
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    return with_headers(response)
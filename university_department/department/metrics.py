@@ -0,0 +1,336 @@
+"""Метрики приложения в формате Prometheus (/metrics).
+
+MetricsMiddleware измеряет каждый запрос: длительность по имени
+маршрута из department/urls.py, число и время запросов к базе, ошибки
+блокировок SQLite и долгие записи. Формы считают неудачные проверки
+(forms.py), кеш объектов — попадания (caching.stats()).
+
+Значения копятся в памяти процесса и раз в FLUSH_INTERVAL секунд
+записываются в файл процесса в каталоге DIRECTORY (атомарной заменой).
+Страница /metrics складывает файлы всех процессов, поэтому метрики
+общие для всех обработчиков без внешних агентов. Глубина очереди
+фоновых задач считается запросом к базе в момент чтения.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.models import Count, Min
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIRECTORY': 'metrics',        # относительно BASE_DIR
+    'FLUSH_INTERVAL': 5.0,         # как часто процесс записывает свои значения, с
+    'LOCK_THRESHOLD': 0.02,        # запись дольше порога считается ожиданием блокировки, с
+    'RETENTION': 3600,             # через сколько секунд удалять файл завершившегося процесса
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],    # кому доступна страница /metrics; пусто — всем
+}
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_COUNT_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500]
+
+# Имя -> (тип, описание, границы гистограммы)
+METRICS = {
+    'department_http_requests_total': ('counter', 'Запросы по маршрутам и кодам ответа', None),
+    'department_http_request_duration_seconds': ('histogram', 'Длительность запроса', LATENCY_BUCKETS),
+    'department_db_queries_per_request': ('histogram', 'Запросов к базе за запрос', QUERY_COUNT_BUCKETS),
+    'department_db_time_per_request_seconds': ('histogram', 'Время запросов к базе за запрос', LATENCY_BUCKETS),
+    'department_db_lock_errors_total': ('counter', 'Ошибки database is locked/busy', None),
+    'department_db_lock_waits_total': ('counter', 'Записи в базу дольше LOCK_THRESHOLD', None),
+    'department_form_invalid_total': ('counter', 'Неудачные проверки форм', None),
+    'department_throttled_total': ('counter', 'Запросы, отклоненные ограничением (429)', None),
+    'department_object_cache_requests_total': ('counter', 'Обращения к кешу объектов', None),
+    'department_audit_queue_size': ('gauge', 'Записей журнала в очереди на запись', None),
+    'department_jobs': ('gauge', 'Фоновые задачи по состояниям', None),
+    'department_jobs_ready': ('gauge', 'Задачи в очереди, готовые к выполнению', None),
+    'department_jobs_oldest_ready_seconds': ('gauge', 'Ожидание самой старой готовой задачи', None),
+}
+
+
+def option(name):
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULTS[name])
+
+
+def directory():
+    return Path(settings.BASE_DIR) / option('DIRECTORY')
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Значения метрик процесса"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.values = defaultdict(float)            # (имя, метки) -> значение
+        self.histograms = {}                        # (имя, метки) -> [счетчики корзин, сумма, число]
+        self.flushed = time.monotonic()
+
+    def _check_fork(self):
+        # После fork значения родителя не должны попасть в файл потомка
+        if os.getpid() != self.pid:
+            self.reset()
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self._check_fork()
+            self.values[name, _labels(labels)] += value
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        with self.lock:
+            self._check_fork()
+            key = name, _labels(labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def dump(self):
+        from . import audit, caching
+
+        with self.lock:
+            self._check_fork()
+            values = [[name, dict(labels), value] for (name, labels), value in self.values.items()]
+            histograms = [
+                [name, dict(labels), counts, total, count]
+                for (name, labels), (counts, total, count) in self.histograms.items()
+            ]
+        for result in ('local', 'shared', 'miss'):
+            values.append(['department_object_cache_requests_total', {'result': result}, caching.stats()[result]])
+        queue = audit.buffer.queue
+        values.append(['department_audit_queue_size', {}, queue.qsize() if queue is not None else 0])
+        return {'values': values, 'histograms': histograms}
+
+    def flush(self, force=False):
+        """Записывает значения процесса в его файл"""
+        if not force and time.monotonic() - self.flushed < option('FLUSH_INTERVAL'):
+            return
+        self.flushed = time.monotonic()
+        path = directory() / f'{os.getpid()}.json'
+        temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary.write_text(json.dumps(self.dump()), encoding='utf-8')
+            os.replace(temporary, path)
+        except OSError:
+            logger.exception('Не удалось записать метрики в %s', path)
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_at_exit():
+    if option('ENABLED'):
+        registry.flush(force=True)
+
+
+def form_invalid(form):
+    if option('ENABLED'):
+        registry.inc('department_form_invalid_total', form=type(form).__name__)
+
+
+def throttled(reason):
+    if option('ENABLED'):
+        registry.inc('department_throttled_total', reason=reason)
+
+
+# Измерение запросов
+
+class QueryRecorder:
+    """Обертка запросов к базе: число, время и блокировки"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.lock_errors = 0
+        self.lock_waits = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as exc:
+            if 'locked' in str(exc) or 'busy' in str(exc):
+                self.lock_errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.time += elapsed
+            if elapsed >= option('LOCK_THRESHOLD') and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+                self.lock_waits += 1
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Длительность запросов и работа с базой по маршрутам"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not option('ENABLED'):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        status = 500
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            # Имя маршрута известно только после разрешения URL
+            view = view_name(request)
+            registry.inc('department_http_requests_total', view=view, method=request.method, status=str(status))
+            registry.observe('department_http_request_duration_seconds', time.perf_counter() - started, view=view)
+            registry.observe('department_db_queries_per_request', recorder.count, view=view)
+            registry.observe('department_db_time_per_request_seconds', recorder.time, view=view)
+            if recorder.lock_errors:
+                registry.inc('department_db_lock_errors_total', recorder.lock_errors, view=view)
+            if recorder.lock_waits:
+                registry.inc('department_db_lock_waits_total', recorder.lock_waits, view=view)
+            registry.flush()
+
+
+# Страница /metrics
+
+def _expired(path):
+    """Файл завершившегося процесса старше RETENTION"""
+    if time.time() - path.stat().st_mtime < option('RETENTION'):
+        return False
+    try:
+        os.kill(int(path.stem), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, ValueError):
+        pass
+    return False
+
+
+def collect():
+    """Значения всех процессов: ({(имя, метки): значение}, {(имя, метки): гистограмма})"""
+    registry.flush(force=True)
+    values = defaultdict(float)
+    histograms = {}
+    for path in directory().glob('*.json'):
+        try:
+            if _expired(path):
+                path.unlink()
+                continue
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data['values']:
+            values[name, _labels(labels)] += value
+        for name, labels, counts, total, count in data['histograms']:
+            key = name, _labels(labels)
+            if key not in histograms:
+                histograms[key] = [[0] * len(counts), 0.0, 0]
+            histogram = histograms[key]
+            histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+            histogram[1] += total
+            histogram[2] += count
+    return values, histograms
+
+
+def job_values():
+    """Состояние очереди фоновых задач по базе"""
+    from .models import Job
+
+    values = {('department_jobs', (('status', status),)): 0 for status, _ in Job.STATUS_CHOICES}
+    for row in Job.objects.values('status').annotate(count=Count('pk')).order_by():
+        values['department_jobs', (('status', row['status']),)] = row['count']
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).aggregate(
+        count=Count('pk'), oldest=Min('run_after')
+    )
+    values['department_jobs_ready', ()] = ready['count']
+    values['department_jobs_oldest_ready_seconds', ()] = (
+        (now - ready['oldest']).total_seconds() if ready['oldest'] else 0
+    )
+    return values
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render():
+    """Текст в формате Prometheus 0.0.4"""
+    values, histograms = collect()
+    values.update(job_values())
+    by_name = defaultdict(list)
+    for (name, labels), value in values.items():
+        by_name[name].append((labels, value))
+    for (name, labels), histogram in histograms.items():
+        by_name[name].append((labels, histogram))
+
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        if name not in by_name:
+            continue
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_number(value)}')
+                continue
+            counts, total, count = value
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {bucket_count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    allowed = option('ALLOWED_IPS')
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
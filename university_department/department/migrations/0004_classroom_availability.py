@@ -0,0 +1,112 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CAPACITY_BANDS = [1, 2, 5, 10, 20, 50, 100]
+
+
+def band_for(capacity):
+    band = CAPACITY_BANDS[0]
+    for bound in CAPACITY_BANDS:
+        if capacity >= bound:
+            band = bound
+    return band
+
+
+def build_availability(apps, schema_editor):
+    Classroom = apps.get_model("department", "Classroom")
+    Teacher = apps.get_model("department", "Teacher")
+    ClassroomAvailability = apps.get_model("department", "ClassroomAvailability")
+    occupied = set(
+        Teacher.objects.filter(workplace__isnull=False).values_list(
+            "workplace_id", flat=True
+        )
+    )
+    ClassroomAvailability.objects.bulk_create(
+        [
+            ClassroomAvailability(
+                classroom_id=pk,
+                capacity=capacity,
+                capacity_band=band_for(capacity),
+                is_free=pk not in occupied,
+            )
+            for pk, capacity in Classroom.objects.values_list("pk", "capacity")
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0003_remove_discipline_code"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="classroom",
+            name="room_number",
+            field=models.CharField(
+                max_length=10, unique=True, verbose_name="Номер аудитории"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="teacher",
+            name="email",
+            field=models.EmailField(max_length=254, verbose_name="Email"),
+        ),
+        migrations.AlterField(
+            model_name="teacher",
+            name="phone",
+            field=models.CharField(max_length=20, verbose_name="Телефон"),
+        ),
+        migrations.AlterField(
+            model_name="teacher",
+            name="workplace",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="department.classroom",
+                unique=True,
+                verbose_name="Рабочее место",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ClassroomAvailability",
+            fields=[
+                (
+                    "classroom",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="availability",
+                        serialize=False,
+                        to="department.classroom",
+                        verbose_name="Аудитория",
+                    ),
+                ),
+                ("capacity", models.IntegerField(verbose_name="Вместимость")),
+                (
+                    "capacity_band",
+                    models.IntegerField(verbose_name="Диапазон вместимости"),
+                ),
+                ("is_free", models.BooleanField(default=True, verbose_name="Свободна")),
+            ],
+            options={
+                "verbose_name": "Занятость аудитории",
+                "verbose_name_plural": "Занятость аудиторий",
+                "indexes": [
+                    models.Index(
+                        fields=["is_free", "capacity"], name="availability_free_cap_idx"
+                    ),
+                    models.Index(
+                        fields=["is_free", "capacity_band"],
+                        name="availability_free_band_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(build_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,166 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0004_classroom_availability"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimetableRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "term",
+                    models.CharField(
+                        choices=[
+                            ("autumn", "Осенний семестр (нечетные)"),
+                            ("spring", "Весенний семестр (четные)"),
+                        ],
+                        default="autumn",
+                        max_length=10,
+                        verbose_name="Семестр",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("done", "Готово"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "time_budget",
+                    models.FloatField(default=10.0, verbose_name="Лимит времени, с"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создан"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Завершен"
+                    ),
+                ),
+                (
+                    "total_sessions",
+                    models.IntegerField(default=0, verbose_name="Всего занятий"),
+                ),
+                (
+                    "unscheduled",
+                    models.IntegerField(default=0, verbose_name="Не размещено"),
+                ),
+                ("penalty", models.IntegerField(default=0, verbose_name="Штраф")),
+                ("message", models.TextField(blank=True, verbose_name="Сообщение")),
+            ],
+            options={
+                "verbose_name": "Расчет расписания",
+                "verbose_name_plural": "Расчеты расписания",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ScheduledSession",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "day",
+                    models.IntegerField(
+                        blank=True,
+                        choices=[
+                            (0, "Понедельник"),
+                            (1, "Вторник"),
+                            (2, "Среда"),
+                            (3, "Четверг"),
+                            (4, "Пятница"),
+                            (5, "Суббота"),
+                        ],
+                        null=True,
+                        verbose_name="День недели",
+                    ),
+                ),
+                (
+                    "period",
+                    models.IntegerField(blank=True, null=True, verbose_name="Пара"),
+                ),
+                (
+                    "classroom",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="department.classroom",
+                        verbose_name="Аудитория",
+                    ),
+                ),
+                (
+                    "discipline",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="department.discipline",
+                        verbose_name="Дисциплина",
+                    ),
+                ),
+                (
+                    "teacher",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="department.teacher",
+                        verbose_name="Преподаватель",
+                    ),
+                ),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sessions",
+                        to="department.timetablerun",
+                        verbose_name="Расчет",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Занятие",
+                "verbose_name_plural": "Занятия",
+                "ordering": ["day", "period"],
+                "indexes": [
+                    models.Index(
+                        fields=["run", "teacher"], name="session_run_teacher_idx"
+                    ),
+                    models.Index(
+                        fields=["run", "classroom", "day", "period"],
+                        name="session_run_room_slot_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-19 11:05
+
+import department.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0006_audit_entry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredFile",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Имя файла",
+                    ),
+                ),
+                ("size", models.BigIntegerField(verbose_name="Размер, байт")),
+                (
+                    "ref_count",
+                    models.IntegerField(default=0, verbose_name="Число ссылок"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Загружен"),
+                ),
+            ],
+            options={
+                "verbose_name": "Файл",
+                "verbose_name_plural": "Файлы",
+            },
+        ),
+        migrations.AlterField(
+            model_name="teacher",
+            name="photo",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=department.storage.photo_storage,
+                upload_to="teachers/",
+                verbose_name="Фотография",
+            ),
+        ),
+    ]
@@ -0,0 +1,182 @@
+# Generated by Django 5.2.9 on 2026-10-19 11:10
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def build_directory(apps, schema_editor):
+    Teacher = apps.get_model("department", "Teacher")
+    TeacherAdditionalWork = apps.get_model("department", "TeacherAdditionalWork")
+    TeacherDirectoryEntry = apps.get_model("department", "TeacherDirectoryEntry")
+    Assignment = Teacher.disciplines.through
+    disciplines = defaultdict(list)
+    for teacher_id, name in Assignment.objects.order_by(
+        "discipline__semester", "discipline__name"
+    ).values_list("teacher_id", "discipline__name"):
+        disciplines[teacher_id].append(name)
+    work_types = defaultdict(list)
+    for teacher_id, name in TeacherAdditionalWork.objects.order_by(
+        "work_type__name"
+    ).values_list("teacher_id", "work_type__name"):
+        work_types[teacher_id].append(name)
+    entries = []
+    for teacher in Teacher.objects.select_related("workplace"):
+        names = disciplines[teacher.pk]
+        works = work_types[teacher.pk]
+        search = " ".join(
+            [
+                teacher.last_name,
+                teacher.first_name,
+                teacher.middle_name,
+                teacher.position,
+                teacher.academic_degree,
+            ]
+        )
+        entries.append(
+            TeacherDirectoryEntry(
+                teacher_id=teacher.pk,
+                last_name=teacher.last_name,
+                first_name=teacher.first_name,
+                middle_name=teacher.middle_name,
+                email=teacher.email,
+                phone=teacher.phone,
+                position=teacher.position,
+                academic_degree=teacher.academic_degree,
+                employment_type=teacher.employment_type,
+                rate=teacher.rate,
+                photo=teacher.photo.name or "",
+                workplace_id=teacher.workplace_id,
+                room_number=(
+                    teacher.workplace.room_number if teacher.workplace else ""
+                ),
+                disciplines="\n".join(names),
+                discipline_count=len(names),
+                work_types="\n".join(works),
+                work_type_count=len(works),
+                search_text=" ".join(search.lower().split()),
+            )
+        )
+    TeacherDirectoryEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0007_stored_files"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeacherDirectoryEntry",
+            fields=[
+                (
+                    "teacher",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="directory_entry",
+                        serialize=False,
+                        to="department.teacher",
+                        verbose_name="Преподаватель",
+                    ),
+                ),
+                ("last_name", models.CharField(max_length=100, verbose_name="Фамилия")),
+                ("first_name", models.CharField(max_length=100, verbose_name="Имя")),
+                (
+                    "middle_name",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Отчество"
+                    ),
+                ),
+                (
+                    "email",
+                    models.EmailField(blank=True, max_length=254, verbose_name="Email"),
+                ),
+                (
+                    "phone",
+                    models.CharField(blank=True, max_length=20, verbose_name="Телефон"),
+                ),
+                (
+                    "position",
+                    models.CharField(max_length=100, verbose_name="Должность"),
+                ),
+                (
+                    "academic_degree",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Ученая степень"
+                    ),
+                ),
+                (
+                    "employment_type",
+                    models.CharField(
+                        choices=[
+                            ("full", "Полная ставка"),
+                            ("part", "Неполная ставка"),
+                        ],
+                        max_length=10,
+                        verbose_name="Тип занятости",
+                    ),
+                ),
+                ("rate", models.FloatField(verbose_name="Ставка")),
+                (
+                    "photo",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Фотография"
+                    ),
+                ),
+                (
+                    "workplace_id",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="Аудитория (id)"
+                    ),
+                ),
+                (
+                    "room_number",
+                    models.CharField(
+                        blank=True, max_length=10, verbose_name="Аудитория"
+                    ),
+                ),
+                (
+                    "disciplines",
+                    models.TextField(blank=True, verbose_name="Дисциплины"),
+                ),
+                (
+                    "discipline_count",
+                    models.IntegerField(default=0, verbose_name="Число дисциплин"),
+                ),
+                (
+                    "work_types",
+                    models.TextField(blank=True, verbose_name="Дополнительные работы"),
+                ),
+                (
+                    "work_type_count",
+                    models.IntegerField(default=0, verbose_name="Число доп. работ"),
+                ),
+                (
+                    "search_text",
+                    models.TextField(blank=True, verbose_name="Текст для поиска"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Запись справочника преподавателей",
+                "verbose_name_plural": "Справочник преподавателей",
+                "ordering": ["last_name", "first_name"],
+                "indexes": [
+                    models.Index(
+                        fields=["last_name", "first_name"], name="directory_name_idx"
+                    ),
+                    models.Index(
+                        fields=["employment_type", "last_name"],
+                        name="directory_employment_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(build_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.9 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0009_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedAdditionalWork",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "original_id",
+                    models.BigIntegerField(db_index=True, verbose_name="ID назначения"),
+                ),
+                ("start_date", models.DateField(verbose_name="Дата начала")),
+                ("end_date", models.DateField(verbose_name="Дата окончания")),
+                ("description", models.TextField(blank=True, verbose_name="Описание")),
+                (
+                    "archived_at",
+                    models.DateTimeField(verbose_name="Перенесено в архив"),
+                ),
+            ],
+            options={
+                "verbose_name": "Архивная дополнительная работа",
+                "verbose_name_plural": "Архив дополнительной работы",
+                "ordering": ["-end_date"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="teacheradditionalwork",
+            index=models.Index(fields=["end_date"], name="additional_work_end_idx"),
+        ),
+        migrations.AddField(
+            model_name="archivedadditionalwork",
+            name="teacher",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_additional_works",
+                to="department.teacher",
+                verbose_name="Преподаватель",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedadditionalwork",
+            name="work_type",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_assignments",
+                to="department.additionalworktype",
+                verbose_name="Тип работы",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedadditionalwork",
+            index=models.Index(
+                fields=["teacher", "end_date"], name="archived_work_teacher_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 5.2.9 on 2026-10-19 11:24
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize(text):
+    text = text.lower().replace("ё", "е")
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+
+def trigrams(text):
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return result
+
+
+def build_index(apps, schema_editor):
+    SearchDocument = apps.get_model("department", "SearchDocument")
+    SearchTrigram = apps.get_model("department", "SearchTrigram")
+    sources = [
+        ("teacher", apps.get_model("department", "Teacher"), ["last_name", "first_name", "middle_name"]),
+        ("discipline", apps.get_model("department", "Discipline"), ["name"]),
+    ]
+    for kind, model, fields in sources:
+        for values in model.objects.order_by("pk").values_list("pk", *fields).iterator():
+            text = normalize(" ".join(value or "" for value in values[1:]))[:400]
+            grams = trigrams(text)
+            document = SearchDocument.objects.create(
+                kind=kind, object_id=values[0], text=text, trigram_count=len(grams)
+            )
+            SearchTrigram.objects.bulk_create(
+                [SearchTrigram(document=document, kind=kind, trigram=gram) for gram in sorted(grams)]
+            )
+
+
+def fold_yo_in_directory(apps, schema_editor):
+    # Поиск по справочнику теперь не различает е и ё
+    TeacherDirectoryEntry = apps.get_model("department", "TeacherDirectoryEntry")
+    for entry in TeacherDirectoryEntry.objects.filter(search_text__contains="ё"):
+        entry.search_text = entry.search_text.replace("ё", "е")
+        entry.save(update_fields=["search_text"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0010_additional_work_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("teacher", "Преподаватель"),
+                            ("discipline", "Дисциплина"),
+                        ],
+                        max_length=20,
+                        verbose_name="Вид объекта",
+                    ),
+                ),
+                ("object_id", models.BigIntegerField(verbose_name="ID объекта")),
+                ("text", models.CharField(max_length=400, verbose_name="Текст")),
+                (
+                    "trigram_count",
+                    models.PositiveIntegerField(verbose_name="Число триграмм"),
+                ),
+            ],
+            options={
+                "verbose_name": "Документ поискового индекса",
+                "verbose_name_plural": "Документы поискового индекса",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "object_id"), name="search_document_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="SearchTrigram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=20, verbose_name="Вид объекта")),
+                ("trigram", models.CharField(max_length=3, verbose_name="Триграмма")),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trigrams",
+                        to="department.searchdocument",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Триграмма",
+                "verbose_name_plural": "Триграммы",
+                "indexes": [
+                    models.Index(fields=["kind", "trigram"], name="search_trigram_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("document", "trigram"), name="search_trigram_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+        migrations.RunPython(fold_yo_in_directory, migrations.RunPython.noop),
+    ]
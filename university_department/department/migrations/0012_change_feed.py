@@ -0,0 +1,100 @@
+# Generated by Django 5.2.9 on 2026-10-19 11:25
+
+from django.db import migrations, models
+from django.utils import timezone
+
+TRACKED = ["classroom", "discipline", "additionalworktype", "teacher", "teacheradditionalwork"]
+
+
+def seed_feed(apps, schema_editor):
+    # Первая синхронизация с пустым курсором получает все существующие объекты
+    ChangeRecord = apps.get_model("department", "ChangeRecord")
+    now = timezone.now()
+    for model_name in TRACKED:
+        model = apps.get_model("department", model_name)
+        ChangeRecord.objects.bulk_create(
+            [
+                ChangeRecord(model_name=model_name, object_id=pk, changed_at=now)
+                for pk in model.objects.order_by("pk").values_list("pk", flat=True)
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0011_search_trigrams"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="additionalworktype",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Изменено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="classroom",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Изменено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="discipline",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Изменено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="teacher",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Изменено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="teacheradditionalwork",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Изменено"
+            ),
+        ),
+        migrations.CreateModel(
+            name="ChangeRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model_name", models.CharField(max_length=50, verbose_name="Модель")),
+                ("object_id", models.BigIntegerField(verbose_name="ID объекта")),
+                ("deleted", models.BooleanField(default=False, verbose_name="Удален")),
+                ("changed_at", models.DateTimeField(verbose_name="Время изменения")),
+            ],
+            options={
+                "verbose_name": "Запись ленты изменений",
+                "verbose_name_plural": "Лента изменений",
+                "indexes": [
+                    models.Index(
+                        fields=["model_name", "id"], name="change_record_model_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("model_name", "object_id"),
+                        name="change_record_object_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(seed_feed, migrations.RunPython.noop),
+    ]
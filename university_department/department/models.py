@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .storage import photo_storage
 
 
 class Classroom(models.Model):
@@ -7,6 +11,7 @@ class Classroom(models.Model):
     room_number = models.CharField(max_length=10, verbose_name="Номер аудитории", unique=True)
     capacity = models.IntegerField(verbose_name="Вместимость", default=25)
     description = models.TextField(verbose_name="Описание", blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменено")
     
     class Meta:
         verbose_name = "Аудитория"
@@ -26,6 +31,7 @@ class Discipline(models.Model):
     )
     hours = models.IntegerField(verbose_name="Количество часов")
     description = models.TextField(verbose_name="Описание", blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменено")
     
     class Meta:
         verbose_name = "Дисциплина"
@@ -41,6 +47,7 @@ class AdditionalWorkType(models.Model):
     name = models.CharField(max_length=100, verbose_name="Название работы")
     description = models.TextField(verbose_name="Описание", blank=True)
     hours_per_week = models.IntegerField(verbose_name="Часов в неделю", default=2)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменено")
     
     class Meta:
         verbose_name = "Тип дополнительной работы"
@@ -106,7 +113,14 @@ class Teacher(models.Model):
     
     # Дополнительная информация
     notes = models.TextField(verbose_name="Примечания", blank=True)
-    photo = models.ImageField(upload_to='teachers/', verbose_name="Фотография", blank=True, null=True)
+    photo = models.ImageField(
+        upload_to='teachers/',
+        storage=photo_storage,
+        verbose_name="Фотография",
+        blank=True,
+        null=True
+    )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменено")
     
     class Meta:
         verbose_name = "Преподаватель"
@@ -130,11 +144,396 @@ class TeacherAdditionalWork(models.Model):
     start_date = models.DateField(verbose_name="Дата начала")
     end_date = models.DateField(verbose_name="Дата окончания", null=True, blank=True)
     description = models.TextField(verbose_name="Описание", blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменено")
     
     class Meta:
         verbose_name = "Дополнительная работа преподавателя"
         verbose_name_plural = "Дополнительные работы преподавателей"
         unique_together = ['teacher', 'work_type']
+        indexes = [
+            models.Index(fields=['end_date'], name='additional_work_end_idx'),
+        ]
     
     def __str__(self):
         return f"{self.teacher} - {self.work_type}"
+
+
+class ArchivedAdditionalWork(models.Model):
+    """Завершенная дополнительная работа, перенесенная в архив (см. archive.py)"""
+    original_id = models.BigIntegerField(verbose_name="ID назначения", db_index=True)
+    teacher = models.ForeignKey(
+        Teacher,
+        on_delete=models.CASCADE,
+        related_name='archived_additional_works',
+        verbose_name="Преподаватель"
+    )
+    work_type = models.ForeignKey(
+        AdditionalWorkType,
+        on_delete=models.CASCADE,
+        related_name='archived_assignments',
+        verbose_name="Тип работы"
+    )
+    start_date = models.DateField(verbose_name="Дата начала")
+    end_date = models.DateField(verbose_name="Дата окончания")
+    description = models.TextField(verbose_name="Описание", blank=True)
+    archived_at = models.DateTimeField(verbose_name="Перенесено в архив")
+
+    class Meta:
+        verbose_name = "Архивная дополнительная работа"
+        verbose_name_plural = "Архив дополнительной работы"
+        ordering = ['-end_date']
+        indexes = [
+            models.Index(fields=['teacher', 'end_date'], name='archived_work_teacher_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.teacher} - {self.work_type} (архив)"
+
+
+class ClassroomAvailability(models.Model):
+    """Индекс занятости аудиторий (поддерживается сигналами)"""
+    # Границы диапазонов вместимости: 1, 2-4, 5-9, 10-19, 20-49, 50-99, 100+
+    CAPACITY_BANDS = [1, 2, 5, 10, 20, 50, 100]
+
+    classroom = models.OneToOneField(
+        Classroom,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='availability',
+        verbose_name="Аудитория"
+    )
+    capacity = models.IntegerField(verbose_name="Вместимость")
+    capacity_band = models.IntegerField(verbose_name="Диапазон вместимости")
+    is_free = models.BooleanField(verbose_name="Свободна", default=True)
+
+    class Meta:
+        verbose_name = "Занятость аудитории"
+        verbose_name_plural = "Занятость аудиторий"
+        indexes = [
+            models.Index(fields=['is_free', 'capacity'], name='availability_free_cap_idx'),
+            models.Index(fields=['is_free', 'capacity_band'], name='availability_free_band_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.classroom_id}: {'свободна' if self.is_free else 'занята'}"
+
+    @classmethod
+    def band_for(cls, capacity):
+        """Нижняя граница диапазона, в который попадает вместимость"""
+        band = cls.CAPACITY_BANDS[0]
+        for bound in cls.CAPACITY_BANDS:
+            if capacity >= bound:
+                band = bound
+        return band
+
+
+class TimetableRun(models.Model):
+    """Расчет расписания"""
+    AUTUMN = 'autumn'
+    SPRING = 'spring'
+    TERM_CHOICES = [
+        (AUTUMN, 'Осенний семестр (нечетные)'),
+        (SPRING, 'Весенний семестр (четные)'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    term = models.CharField(max_length=10, choices=TERM_CHOICES, default=AUTUMN, verbose_name="Семестр")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус")
+    time_budget = models.FloatField(verbose_name="Лимит времени, с", default=10.0)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершен")
+    total_sessions = models.IntegerField(verbose_name="Всего занятий", default=0)
+    unscheduled = models.IntegerField(verbose_name="Не размещено", default=0)
+    penalty = models.IntegerField(verbose_name="Штраф", default=0)
+    message = models.TextField(verbose_name="Сообщение", blank=True)
+
+    class Meta:
+        verbose_name = "Расчет расписания"
+        verbose_name_plural = "Расчеты расписания"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Расписание #{self.pk} ({self.get_term_display()})"
+
+
+class ScheduledSession(models.Model):
+    """Занятие в расписании"""
+    DAY_CHOICES = [
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+    ]
+
+    run = models.ForeignKey(TimetableRun, on_delete=models.CASCADE, related_name='sessions', verbose_name="Расчет")
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, verbose_name="Преподаватель")
+    discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE, verbose_name="Дисциплина")
+    classroom = models.ForeignKey(
+        Classroom, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Аудитория"
+    )
+    day = models.IntegerField(choices=DAY_CHOICES, null=True, blank=True, verbose_name="День недели")
+    period = models.IntegerField(null=True, blank=True, verbose_name="Пара")
+
+    class Meta:
+        verbose_name = "Занятие"
+        verbose_name_plural = "Занятия"
+        ordering = ['day', 'period']
+        indexes = [
+            models.Index(fields=['run', 'teacher'], name='session_run_teacher_idx'),
+            models.Index(fields=['run', 'classroom', 'day', 'period'], name='session_run_room_slot_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.discipline.name} — {self.teacher}"
+
+    @property
+    def is_scheduled(self):
+        return self.day is not None
+
+
+class AuditEntry(models.Model):
+    """Запись журнала изменений"""
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    M2M = 'm2m'
+    ACTION_CHOICES = [
+        (CREATE, 'Создание'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+        (M2M, 'Изменение связей'),
+    ]
+
+    model_name = models.CharField(max_length=50, verbose_name="Модель")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    object_repr = models.CharField(max_length=200, verbose_name="Объект")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name="Действие")
+    changes = models.JSONField(encoder=DjangoJSONEncoder, default=dict, verbose_name="Изменения")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        verbose_name="Пользователь"
+    )
+    username = models.CharField(max_length=150, blank=True, verbose_name="Имя пользователя")
+    timestamp = models.DateTimeField(verbose_name="Время")
+
+    class Meta:
+        verbose_name = "Запись журнала"
+        verbose_name_plural = "Журнал изменений"
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            models.Index(fields=['model_name', 'object_id', '-timestamp'], name='audit_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()}: {self.object_repr}"
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище с адресацией по содержимому"""
+    name = models.CharField(max_length=255, primary_key=True, verbose_name="Имя файла")
+    size = models.BigIntegerField(verbose_name="Размер, байт")
+    ref_count = models.IntegerField(default=0, verbose_name="Число ссылок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Загружен")
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+
+    def __str__(self):
+        return self.name
+
+
+class TeacherDirectoryEntry(models.Model):
+    """Строка справочника преподавателей (денормализованная модель чтения).
+
+    Обновляется сигналами при изменении преподавателей, аудиторий,
+    дисциплин и дополнительной работы (см. directory.py).
+    """
+    teacher = models.OneToOneField(
+        Teacher,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='directory_entry',
+        verbose_name="Преподаватель"
+    )
+    last_name = models.CharField(max_length=100, verbose_name="Фамилия")
+    first_name = models.CharField(max_length=100, verbose_name="Имя")
+    middle_name = models.CharField(max_length=100, blank=True, verbose_name="Отчество")
+    email = models.EmailField(blank=True, verbose_name="Email")
+    phone = models.CharField(max_length=20, blank=True, verbose_name="Телефон")
+    position = models.CharField(max_length=100, verbose_name="Должность")
+    academic_degree = models.CharField(max_length=100, blank=True, verbose_name="Ученая степень")
+    employment_type = models.CharField(
+        max_length=10, choices=Teacher.EMPLOYMENT_CHOICES, verbose_name="Тип занятости"
+    )
+    rate = models.FloatField(verbose_name="Ставка")
+    photo = models.CharField(max_length=255, blank=True, verbose_name="Фотография")
+    workplace_id = models.IntegerField(null=True, blank=True, verbose_name="Аудитория (id)")
+    room_number = models.CharField(max_length=10, blank=True, verbose_name="Аудитория")
+    disciplines = models.TextField(blank=True, verbose_name="Дисциплины")
+    discipline_count = models.IntegerField(default=0, verbose_name="Число дисциплин")
+    work_types = models.TextField(blank=True, verbose_name="Дополнительные работы")
+    work_type_count = models.IntegerField(default=0, verbose_name="Число доп. работ")
+    search_text = models.TextField(blank=True, verbose_name="Текст для поиска")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Запись справочника преподавателей"
+        verbose_name_plural = "Справочник преподавателей"
+        ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='directory_name_idx'),
+            models.Index(fields=['employment_type', 'last_name'], name='directory_employment_idx'),
+        ]
+
+    def __str__(self):
+        return self.full_name()
+
+    def full_name(self):
+        return f"{self.last_name} {self.first_name} {self.middle_name}".strip()
+
+    def get_employment_type_display_name(self):
+        return dict(Teacher.EMPLOYMENT_CHOICES)[self.employment_type]
+
+    @property
+    def photo_url(self):
+        if not self.photo:
+            return ''
+        return Teacher._meta.get_field('photo').storage.url(self.photo)
+
+    @property
+    def discipline_list(self):
+        return self.disciplines.split('\n') if self.disciplines else []
+
+
+class SearchDocument(models.Model):
+    """Нормализованное имя объекта для нечеткого поиска (см. fuzzy.py)"""
+    TEACHER = 'teacher'
+    DISCIPLINE = 'discipline'
+    KIND_CHOICES = [
+        (TEACHER, 'Преподаватель'),
+        (DISCIPLINE, 'Дисциплина'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Вид объекта")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    text = models.CharField(max_length=400, verbose_name="Текст")
+    trigram_count = models.PositiveIntegerField(verbose_name="Число триграмм")
+
+    class Meta:
+        verbose_name = "Документ поискового индекса"
+        verbose_name_plural = "Документы поискового индекса"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_document_unique'),
+        ]
+
+    def __str__(self):
+        return self.text
+
+
+class SearchTrigram(models.Model):
+    """Запись списка вхождений: триграмма встречается в документе"""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='trigrams')
+    kind = models.CharField(max_length=20, verbose_name="Вид объекта")
+    trigram = models.CharField(max_length=3, verbose_name="Триграмма")
+
+    class Meta:
+        verbose_name = "Триграмма"
+        verbose_name_plural = "Триграммы"
+        indexes = [
+            models.Index(fields=['kind', 'trigram'], name='search_trigram_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'trigram'], name='search_trigram_unique'),
+        ]
+
+
+class Job(models.Model):
+    """Фоновая задача (см. jobs.py)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершена'),
+        (FAILED, 'Ошибка'),
+        (CANCELLED, 'Отменена'),
+    ]
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="Параметры")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name="Статус")
+    progress = models.IntegerField(default=0, verbose_name="Выполнено, %")
+    message = models.CharField(max_length=255, blank=True, verbose_name="Сообщение")
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Результат")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    attempts = models.IntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.IntegerField(default=3, verbose_name="Максимум попыток")
+    cancel_requested = models.BooleanField(default=False, verbose_name="Запрошена отмена")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Запуск не раньше")
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Обработчик")
+    heartbeat = models.DateTimeField(null=True, blank=True, verbose_name="Последняя активность")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начата")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED
+
+
+class ChangeRecord(models.Model):
+    """Запись ленты изменений: последнее изменение объекта или его удаление.
+
+    На каждый объект хранится одна запись; при новом изменении она
+    заменяется записью с большим id, поэтому выборка id > курсора
+    возвращает каждый изменившийся объект один раз (см. changes.py).
+    """
+    model_name = models.CharField(max_length=50, verbose_name="Модель")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    deleted = models.BooleanField(default=False, verbose_name="Удален")
+    changed_at = models.DateTimeField(verbose_name="Время изменения")
+
+    class Meta:
+        verbose_name = "Запись ленты изменений"
+        verbose_name_plural = "Лента изменений"
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'object_id'], name='change_record_object_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['model_name', 'id'], name='change_record_model_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} #{self.object_id}"
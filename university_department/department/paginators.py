@@ -0,0 +1,145 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import InvalidPage, Paginator
+from django.utils.functional import cached_property
+
+from . import replica
+
+COUNT_TIMEOUT = 300
+ESTIMATE_LIMIT = 1000
+
+
+def _version_key(model):
+    return f'count_version:{model._meta.label_lower}'
+
+
+def _initial_version():
+    # После вытеснения ключа версия не повторяет прежние значения
+    return time.time_ns() // 1000
+
+
+def get_count_version(model):
+    return cache.get_or_set(_version_key(model), _initial_version, None)
+
+
+def bump_count_version(model):
+    """Сбрасывает закешированные количества для модели"""
+    try:
+        cache.incr(_version_key(model))
+    except ValueError:
+        cache.set(_version_key(model), _initial_version(), None)
+
+
+def _normalized_sql(queryset):
+    """Текст запроса без сортировки (на количество она не влияет)"""
+    query = queryset.query.clone()
+    query.clear_ordering(force=True)
+    return str(query)
+
+
+def result_key(queryset, label, dependencies=()):
+    """Ключ кеша для значения по запросу; None, если запрос пустой"""
+    try:
+        sql = _normalized_sql(queryset)
+    except EmptyResultSet:
+        return None
+    models = [queryset.model, *dependencies]
+    versions = ':'.join(str(get_count_version(model)) for model in models)
+    digest = hashlib.md5(sql.encode()).hexdigest()
+    # Значения, посчитанные по реплике, не подменяют значения основной базы
+    return f'{label}:{queryset.model._meta.label_lower}:{versions}{replica.stamp()}:{digest}'
+
+
+def cached_result(queryset, label, compute, dependencies=()):
+    """Кеширует значение, вычисленное по запросу.
+
+    Ключ строится по тексту запроса и версиям модели запроса и моделей из
+    dependencies, поэтому любое изменение этих моделей делает значение
+    устаревшим.
+    """
+    key = result_key(queryset, label, dependencies)
+    if key is None:
+        return compute()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, COUNT_TIMEOUT)
+    return value
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, кеширующий COUNT(*) по тексту запроса.
+
+    Ключ включает версию модели, которая увеличивается при любых
+    изменениях (см. signals.py), поэтому устаревшие значения не
+    используются.
+    """
+
+    def __init__(self, *args, dependencies=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dependencies = dependencies
+
+    def _exact_count(self):
+        return Paginator.count.func(self)
+
+    @cached_property
+    def count(self):
+        if getattr(self.object_list, 'query', None) is None:
+            return super().count
+        return cached_result(self.object_list, 'count', self._exact_count, self.dependencies)
+
+
+class EstimatedCountPaginator(CachedCountPaginator):
+    """Пагинатор с оценкой количества для больших выборок.
+
+    Вместо полного COUNT(*) считается не больше ESTIMATE_LIMIT + 1 строк
+    (SELECT COUNT(*) FROM (... LIMIT n)). Если строк больше, количество
+    считается оценкой «более ESTIMATE_LIMIT», а точное значение
+    вычисляется только при переходе на последнюю известную страницу.
+    Оценка и точное количество кешируются (см. cached_result).
+    """
+    estimate_limit = ESTIMATE_LIMIT
+
+    def _bounded_count(self):
+        count = self.object_list[:self.estimate_limit + 1].count()
+        return (count, count > self.estimate_limit)
+
+    @cached_property
+    def _estimate(self):
+        if getattr(self.object_list, 'query', None) is None:
+            return (len(self.object_list), False)
+        key = result_key(self.object_list, 'count', self.dependencies)
+        exact = cache.get(key) if key else None
+        if exact is not None:
+            return (exact, False)
+        return cached_result(self.object_list, 'bounded_count', self._bounded_count, self.dependencies)
+
+    @cached_property
+    def count(self):
+        return self._estimate[0]
+
+    @property
+    def count_is_estimate(self):
+        return self._estimate[1]
+
+    def _refine(self):
+        """Точное количество вместо оценки"""
+        exact = cached_result(self.object_list, 'count', self._exact_count, self.dependencies)
+        self._estimate = (exact, False)
+        for name in ('count', 'num_pages'):
+            self.__dict__.pop(name, None)
+
+    def validate_number(self, number):
+        try:
+            number = super().validate_number(number)
+        except InvalidPage:
+            if not self.count_is_estimate:
+                raise
+            self._refine()
+            return super().validate_number(number)
+        if self.count_is_estimate and number >= self.num_pages:
+            self._refine()
+        return number
@@ -0,0 +1,187 @@
+"""Чтение с реплики базы.
+
+GET- и HEAD-запросы (списки, карточки, отчеты) читают с реплики —
+базы ALIAS из settings.DATABASES, запись и все остальные запросы идут в
+основную базу. Реплика по умолчанию — локальная копия db.sqlite3,
+которую команда refresh_replica периодически снимает API резервного
+копирования SQLite (см. snapshots.py) и подменяет целиком; время
+изменения файла — момент начала копирования. Вместо копии можно указать
+любую вторую базу, реплицируемую снаружи (LOCAL_COPY = False).
+
+Чтение своих записей: после POST (и других изменяющих запросов) ответ
+ставит cookie со временем записи. Пока копия не новее этой записи (для
+внешней реплики — STICKY_SECONDS), запросы того же браузера читают с
+основной базы. С основной базы читают и запросы, в которых уже была
+запись или открыта транзакция, и все, что выполняется вне HTTP-запросов
+(команды, фоновые задачи). Копия старше MAX_LAG не используется.
+
+Значения в общем кеше, построенные по данным реплики, хранятся под
+ключом с отметкой реплики (stamp()), чтобы не смешиваться с данными
+основной базы.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import snapshots
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'replica',
+    'LOCAL_COPY': True,       # реплика — копия основной базы от refresh_replica
+    'REFRESH_INTERVAL': 30,   # период обновления копии в refresh_replica --loop, с
+    'MAX_LAG': 120,           # копия старше не используется, с
+    'STICKY_SECONDS': 30,     # внешняя реплика: сколько читать с основной базы после записи, с
+}
+
+COOKIE = 'last_write'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def option(name):
+    return getattr(settings, 'REPLICA', {}).get(name, DEFAULTS[name])
+
+
+def configured():
+    return option('ENABLED') and option('ALIAS') in settings.DATABASES
+
+
+def _local_path():
+    return Path(connections[option('ALIAS')].settings_dict['NAME'])
+
+
+def synced_at():
+    """Момент, по состоянию на который снята локальная копия; None, если ее нет"""
+    try:
+        return _local_path().stat().st_mtime
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def refresh():
+    """Снимает копию основной базы на место реплики; возвращает путь"""
+    target = _local_path()
+    temporary = target.with_name(target.name + '.tmp')
+    started = time.time()
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    destination = sqlite3.connect(temporary)
+    try:
+        snapshots.copy(source.connection, destination)
+        # Копия в режиме WAL оставила бы рядом -wal и -shm прежнего файла
+        destination.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        destination.close()
+    os.utime(temporary, (started, started))
+    # Открытые соединения дочитывают прежний файл, новые открывают свежий
+    os.replace(temporary, target)
+    return target
+
+
+def readable(request):
+    """Может ли запрос читать с реплики"""
+    if not configured() or request.method not in SAFE_METHODS:
+        return False
+    try:
+        last_write = float(request.COOKIES.get(COOKIE, 0))
+    except ValueError:
+        last_write = 0
+    now = time.time()
+    if not option('LOCAL_COPY'):
+        return now - last_write > option('STICKY_SECONDS')
+    synced = synced_at()
+    return synced is not None and now - synced <= option('MAX_LAG') and synced > last_write
+
+
+def stamp():
+    """Отметка источника данных для ключей кеша: '' для основной базы"""
+    if not _use_replica.get():
+        return ''
+    if option('LOCAL_COPY'):
+        return f'replica{synced_at() or 0:.0f}'
+    return 'replica'
+
+
+@contextmanager
+def primary():
+    """Читать с основной базы внутри блока"""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def primary_view(view):
+    """Представление всегда читает с основной базы (например, опрос состояния)"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with primary():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _reopen_if_replaced():
+    """Закрывает постоянное соединение (CONN_MAX_AGE), открытое на прежнем файле копии"""
+    connection = connections[option('ALIAS')]
+    synced = synced_at()
+    if connection.connection is not None and getattr(connection, 'replica_synced_at', None) != synced:
+        connection.close()
+    connection.replica_synced_at = synced
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return option('ALIAS')
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # После записи запрос читает свои данные с основной базы
+        _use_replica.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, option('ALIAS')}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика — копия основной базы вместе со схемой
+        if db == option('ALIAS'):
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения и запоминает время записи в cookie"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replica = readable(request)
+        if use_replica and option('LOCAL_COPY'):
+            _reopen_if_replaced()
+        token = _use_replica.set(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        if configured() and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                COOKIE, f'{time.time():.3f}',
+                max_age=max(option('MAX_LAG'), option('STICKY_SECONDS')),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,342 @@
+"""Отчеты кафедры в XLSX и PDF.
+
+Отчет описывается генератором строк: ('group', заголовок),
+('row', значения) и ('total', значения). Строки читаются из базы
+частями (QuerySet.iterator), а итоги групп выводятся после последней
+строки группы, поэтому память не зависит от объема данных. XLSX пишется
+openpyxl в режиме write_only, PDF — напрямую на холст reportlab
+постранично, без списка flowable-объектов.
+
+Готовый файл сохраняется под именем с отметкой версии данных (версии
+моделей из paginators.py). Пока данные не менялись, повторный запрос
+отдает уже построенный файл; файлы прежних версий того же отчета и
+формата удаляются после сохранения нового.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import AdditionalWorkType, Discipline, Teacher, TeacherAdditionalWork, TeacherDirectoryEntry
+from .paginators import get_count_version
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+except ImportError:  # отчеты XLSX необязательны
+    Workbook = None
+
+try:
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:  # отчеты PDF необязательны
+    canvas = None
+
+DEFAULTS = {
+    'DIRECTORY': 'reports',
+    # TTF-шрифт с кириллицей для PDF (стандартные шрифты PDF ее не содержат)
+    'PDF_FONT': '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+}
+
+FORMATS = ('xlsx', 'pdf')
+CHUNK_SIZE = 500
+
+
+def option(name):
+    return getattr(settings, 'REPORTS', {}).get(name, DEFAULTS[name])
+
+
+class Report:
+    """Описание отчета: колонки, источник строк и модели для версии данных"""
+    name = None
+    title = None
+    columns = []
+    widths = []
+    models = []
+
+    def total_rows(self):
+        return 0
+
+    def rows(self):
+        raise NotImplementedError
+
+
+class StaffReport(Report):
+    name = 'staff'
+    title = 'Состав кафедры по должностям и ученым степеням'
+    columns = ['ФИО', 'Ученая степень', 'Ставка', 'Аудитория', 'Дисциплин']
+    widths = [45, 25, 10, 12, 12]
+    models = [TeacherDirectoryEntry]
+
+    def queryset(self):
+        return TeacherDirectoryEntry.objects.order_by(
+            'position', 'academic_degree', 'last_name', 'first_name'
+        ).only(
+            'last_name', 'first_name', 'middle_name', 'position', 'academic_degree',
+            'rate', 'room_number', 'discipline_count'
+        )
+
+    def total_rows(self):
+        return self.queryset().count()
+
+    def rows(self):
+        position = None
+        count = rate = 0
+        for entry in self.queryset().iterator(chunk_size=CHUNK_SIZE):
+            if entry.position != position:
+                if position is not None:
+                    yield 'total', [f'Итого: {count}', '', round(rate, 2), '', '']
+                position, count, rate = entry.position, 0, 0
+                yield 'group', position
+            count += 1
+            rate += entry.rate
+            yield 'row', [
+                entry.full_name(), entry.academic_degree or '—', entry.rate,
+                entry.room_number or '—', entry.discipline_count,
+            ]
+        if position is not None:
+            yield 'total', [f'Итого: {count}', '', round(rate, 2), '', '']
+
+
+class DisciplinesReport(Report):
+    name = 'disciplines'
+    title = 'Дисциплины по семестрам'
+    columns = ['Дисциплина', 'Часов', 'Преподавателей']
+    widths = [60, 12, 16]
+    models = [Discipline, Teacher]
+
+    def queryset(self):
+        return Discipline.objects.annotate(teacher_count=Count('teacher')).order_by('semester', 'name')
+
+    def total_rows(self):
+        return Discipline.objects.count()
+
+    def rows(self):
+        semester = None
+        count = hours = 0
+        for discipline in self.queryset().iterator(chunk_size=CHUNK_SIZE):
+            if discipline.semester != semester:
+                if semester is not None:
+                    yield 'total', [f'Итого дисциплин: {count}', hours, '']
+                semester, count, hours = discipline.semester, 0, 0
+                yield 'group', f'{semester} семестр'
+            count += 1
+            hours += discipline.hours
+            yield 'row', [discipline.name, discipline.hours, discipline.teacher_count]
+        if semester is not None:
+            yield 'total', [f'Итого дисциплин: {count}', hours, '']
+
+
+class AdditionalWorkReport(Report):
+    name = 'additional_work'
+    title = 'Дополнительная работа по видам'
+    columns = ['Преподаватель', 'Начало', 'Окончание', 'Часов в неделю']
+    widths = [45, 14, 14, 16]
+    models = [TeacherAdditionalWork, AdditionalWorkType, Teacher]
+
+    def queryset(self):
+        return TeacherAdditionalWork.objects.select_related('teacher', 'work_type').order_by(
+            'work_type__name', 'start_date'
+        )
+
+    def total_rows(self):
+        return TeacherAdditionalWork.objects.count()
+
+    def rows(self):
+        work_type = None
+        count = hours = 0
+        for work in self.queryset().iterator(chunk_size=CHUNK_SIZE):
+            if work.work_type_id != work_type:
+                if work_type is not None:
+                    yield 'total', [f'Итого: {count}', '', '', hours]
+                work_type, count, hours = work.work_type_id, 0, 0
+                yield 'group', work.work_type.name
+            count += 1
+            hours += work.work_type.hours_per_week
+            yield 'row', [
+                work.teacher.full_name(),
+                work.start_date.strftime('%d.%m.%Y'),
+                work.end_date.strftime('%d.%m.%Y') if work.end_date else '—',
+                work.work_type.hours_per_week,
+            ]
+        if work_type is not None:
+            yield 'total', [f'Итого: {count}', '', '', hours]
+
+
+REPORTS = {report.name: report for report in (StaffReport(), DisciplinesReport(), AdditionalWorkReport())}
+
+
+def data_stamp(report):
+    """Отметка версии данных отчета"""
+    versions = ':'.join(str(get_count_version(model)) for model in report.models)
+    return hashlib.md5(versions.encode()).hexdigest()[:16]
+
+
+def file_name(report, fmt, stamp=None):
+    return f"{option('DIRECTORY')}/{report.name}-{stamp or data_stamp(report)}.{fmt}"
+
+
+def remove_superseded(report, fmt, keep):
+    """Удаляет файлы отчета в формате fmt, кроме keep"""
+    pattern = re.compile(rf'{re.escape(report.name)}-[0-9a-f]{{16}}\.{fmt}')
+    directory = option('DIRECTORY')
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file in files:
+        name = f'{directory}/{file}'
+        if pattern.fullmatch(file) and name != keep:
+            default_storage.delete(name)
+
+
+def cached_url(report, fmt):
+    """Адрес готового отчета для текущей версии данных или None"""
+    name = file_name(report, fmt)
+    return default_storage.url(name) if default_storage.exists(name) else None
+
+
+class XlsxWriter:
+    def __init__(self, path, report):
+        if Workbook is None:
+            raise RuntimeError('Для отчетов XLSX нужен пакет openpyxl')
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(report.title[:31])
+        for index, width in enumerate(report.widths):
+            self.sheet.column_dimensions[get_column_letter(index + 1)].width = width
+        self.bold = Font(bold=True)
+        self._styled([report.title])
+        self._styled([f"Сформирован {timezone.localtime():%d.%m.%Y %H:%M}"], bold=False)
+        self.sheet.append([])
+        self._styled(report.columns)
+
+    def _styled(self, values, bold=True):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(self.sheet, value=value)
+            if bold:
+                cell.font = self.bold
+            cells.append(cell)
+        self.sheet.append(cells)
+
+    def write(self, kind, value):
+        if kind == 'group':
+            self._styled([value])
+        elif kind == 'total':
+            self._styled(value)
+        else:
+            self.sheet.append(value)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class PdfWriter:
+    MARGIN = 36
+    LINE = 14
+
+    def __init__(self, path, report):
+        if canvas is None:
+            raise RuntimeError('Для отчетов PDF нужен пакет reportlab')
+        self.font = self._register_font()
+        self.canvas = canvas.Canvas(path, pagesize=landscape(A4))
+        self.width, self.height = landscape(A4)
+        self.report = report
+        total = sum(report.widths)
+        usable = self.width - 2 * self.MARGIN
+        self.offsets = []
+        x = self.MARGIN
+        for width in report.widths:
+            self.offsets.append(x)
+            x += usable * width / total
+        self.page = 0
+        self._new_page()
+
+    def _register_font(self):
+        path = option('PDF_FONT')
+        if path and os.path.exists(path):
+            if 'ReportFont' not in pdfmetrics.getRegisteredFontNames():
+                pdfmetrics.registerFont(TTFont('ReportFont', path))
+            return 'ReportFont'
+        return 'Helvetica'
+
+    def _new_page(self):
+        if self.page:
+            self.canvas.showPage()
+        self.page += 1
+        self.y = self.height - self.MARGIN
+        if self.page == 1:
+            self.canvas.setFont(self.font, 14)
+            self.canvas.drawString(self.MARGIN, self.y, self.report.title)
+            self.y -= self.LINE * 2
+        self.canvas.setFont(self.font, 8)
+        self.canvas.drawRightString(self.width - self.MARGIN, self.MARGIN / 2, f'Стр. {self.page}')
+        self._line(self.report.columns, size=10)
+        self.y -= 4
+
+    def _line(self, values, size=9):
+        if self.y < self.MARGIN + self.LINE:
+            self._new_page()
+        self.canvas.setFont(self.font, size)
+        for x, value in zip(self.offsets, values):
+            self.canvas.drawString(x, self.y, str(value))
+        self.y -= self.LINE
+
+    def write(self, kind, value):
+        if kind == 'group':
+            self.y -= 4
+            self._line([value], size=11)
+        elif kind == 'total':
+            self._line(value, size=10)
+        else:
+            self._line(value)
+
+    def close(self):
+        self.canvas.save()
+
+
+WRITERS = {'xlsx': XlsxWriter, 'pdf': PdfWriter}
+
+
+def build(report, fmt, progress=None):
+    """Строит отчет (или берет готовый) и возвращает имя файла в хранилище"""
+    stamp = data_stamp(report)
+    name = file_name(report, fmt, stamp)
+    if default_storage.exists(name):
+        return name
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Уникальное имя: один отчет могут строить несколько потоков и процессов
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f'{os.path.basename(path)}.', suffix='.tmp'
+    )
+    os.close(fd)
+    total = report.total_rows()
+    try:
+        writer = WRITERS[fmt](temp_path, report)
+        done = 0
+        for kind, value in report.rows():
+            writer.write(kind, value)
+            if kind == 'row':
+                done += 1
+                if progress and done % CHUNK_SIZE == 0:
+                    progress(done * 100 // max(total, 1), f'Обработано строк: {done} из {total}')
+        writer.close()
+        # mkstemp создает файл с правами 0600; готовый отчет читает веб-сервер
+        os.chmod(temp_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    remove_superseded(report, fmt, name)
+    return name
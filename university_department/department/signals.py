@@ -0,0 +1,267 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import audit, availability, caching, changes, directory, fuzzy, storage, timetable
+from .paginators import bump_count_version
+from .models import AdditionalWorkType, AuditEntry, Classroom, Discipline, Teacher, TeacherAdditionalWork
+
+
+@receiver(post_init, sender=Teacher)
+def remember_teacher_state(sender, instance, **kwargs):
+    # Запоминаем исходные значения, не обращаясь к отложенным полям
+    instance._original_workplace_id = instance.__dict__.get('workplace_id')
+    instance._original_rate = instance.__dict__.get('rate')
+    photo = instance.__dict__.get('photo')
+    instance._original_photo = getattr(photo, 'name', photo) or ''
+
+
+# Индекс свободных аудиторий
+
+
+@receiver(post_save, sender=Teacher)
+def update_availability_on_teacher_save(sender, instance, created, **kwargs):
+    old_workplace_id = getattr(instance, '_original_workplace_id', None)
+    if old_workplace_id == instance.workplace_id and not created:
+        return
+    if old_workplace_id != instance.workplace_id:
+        availability.mark_occupied(old_workplace_id, False)
+    availability.mark_occupied(instance.workplace_id, True)
+    instance._original_workplace_id = instance.workplace_id
+
+
+@receiver(post_delete, sender=Teacher)
+def update_availability_on_teacher_delete(sender, instance, **kwargs):
+    availability.mark_occupied(instance.workplace_id, False)
+
+
+@receiver(post_save, sender=Classroom)
+def update_availability_on_classroom_save(sender, instance, created, **kwargs):
+    availability.index_classroom(instance, created=created)
+
+
+# Пересчет расписания преподавателя
+@receiver(post_save, sender=Teacher)
+def resolve_timetable_on_rate_change(sender, instance, created, **kwargs):
+    if not created and instance._original_rate != instance.rate:
+        timetable.schedule_teacher_resolve(instance.pk)
+    instance._original_rate = instance.rate
+
+
+@receiver(m2m_changed, sender=Teacher.disciplines.through)
+def resolve_timetable_on_disciplines_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Изменение со стороны дисциплины затрагивает нескольких преподавателей;
+        # при очистке pk_set пуст, поэтому преподаватели берутся до нее
+        if action == 'pre_clear':
+            timetable.schedule_teacher_resolve(*instance.teacher_set.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            timetable.schedule_teacher_resolve(*(pk_set or ()))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        timetable.schedule_teacher_resolve(instance.pk)
+
+
+# Журнал изменений
+AUDITED_MODELS = [Teacher, Classroom, Discipline, AdditionalWorkType, TeacherAdditionalWork]
+
+
+def audit_snapshot(sender, instance, **kwargs):
+    instance._audit_snapshot = audit.snapshot(instance)
+
+
+def audit_save(sender, instance, created, **kwargs):
+    current = audit.snapshot(instance)
+    if created:
+        audit.record(instance, AuditEntry.CREATE, {name: [None, value] for name, value in current.items()})
+    else:
+        changes = audit.diff(getattr(instance, '_audit_snapshot', {}), current)
+        if changes:
+            audit.record(instance, AuditEntry.UPDATE, changes)
+    instance._audit_snapshot = current
+
+
+def audit_delete(sender, instance, **kwargs):
+    current = audit.snapshot(instance)
+    audit.record(instance, AuditEntry.DELETE, {name: [value, None] for name, value in current.items()})
+
+
+for model in AUDITED_MODELS:
+    uid = f'audit_{model._meta.model_name}'
+    post_init.connect(audit_snapshot, sender=model, dispatch_uid=f'{uid}_init')
+    post_save.connect(audit_save, sender=model, dispatch_uid=f'{uid}_save')
+    post_delete.connect(audit_delete, sender=model, dispatch_uid=f'{uid}_delete')
+
+
+@receiver(m2m_changed, sender=Teacher.disciplines.through)
+def audit_disciplines_change(sender, instance, action, reverse, pk_set, **kwargs):
+    field = 'teachers' if reverse else 'disciplines'
+    if action == 'pre_clear':
+        # Запоминаем удаляемые связи до очистки
+        related = instance.teacher_set if reverse else instance.disciplines
+        removed = sorted(related.values_list('pk', flat=True))
+        if removed:
+            audit.record(instance, AuditEntry.M2M, {field: {'removed': removed}})
+    elif action in ('post_add', 'post_remove') and pk_set:
+        key = 'added' if action == 'post_add' else 'removed'
+        audit.record(instance, AuditEntry.M2M, {field: {key: sorted(pk_set)}})
+
+
+# Сброс закешированных количеств для пагинации
+def invalidate_counts(sender, **kwargs):
+    bump_count_version(sender)
+
+
+for model in AUDITED_MODELS:
+    uid = f'counts_{model._meta.model_name}'
+    post_save.connect(invalidate_counts, sender=model, dispatch_uid=f'{uid}_save')
+    post_delete.connect(invalidate_counts, sender=model, dispatch_uid=f'{uid}_delete')
+
+
+@receiver(m2m_changed, sender=Teacher.disciplines.through)
+def invalidate_counts_on_disciplines_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_count_version(Teacher)
+        bump_count_version(Discipline)
+
+
+# Сброс версий объектов в двухуровневом кеше
+def invalidate_cached_object(sender, instance, **kwargs):
+    pk = instance.pk
+    caching.invalidate(sender, pk)
+    # Повторно после фиксации: объект мог попасть в кеш до COMMIT
+    transaction.on_commit(lambda: caching.invalidate(sender, pk))
+
+
+for model in AUDITED_MODELS:
+    uid = f'object_cache_{model._meta.model_name}'
+    post_save.connect(invalidate_cached_object, sender=model, dispatch_uid=f'{uid}_save')
+    post_delete.connect(invalidate_cached_object, sender=model, dispatch_uid=f'{uid}_delete')
+
+
+# Подсчет ссылок на файлы фотографий
+@receiver(post_save, sender=Teacher)
+def update_photo_refs_on_save(sender, instance, **kwargs):
+    photo = instance.photo.name or ''
+    if photo != instance._original_photo:
+        storage.acquire(photo)
+        storage.release(instance._original_photo)
+        instance._original_photo = photo
+
+
+@receiver(post_delete, sender=Teacher)
+def update_photo_refs_on_delete(sender, instance, **kwargs):
+    storage.release(instance.__dict__.get('photo') and instance.photo.name)
+
+
+# Справочник преподавателей (модель чтения)
+@receiver(post_save, sender=Teacher)
+def refresh_directory_on_teacher_save(sender, instance, **kwargs):
+    directory.schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Classroom)
+def refresh_directory_on_classroom_save(sender, instance, created, **kwargs):
+    if not created:
+        directory.schedule_refresh(*Teacher.objects.filter(workplace=instance).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Classroom)
+def refresh_directory_on_classroom_delete(sender, instance, **kwargs):
+    # Рабочее место обнуляется через UPDATE без сигналов Teacher
+    directory.schedule_refresh(*Teacher.objects.filter(workplace=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Discipline)
+def refresh_directory_on_discipline_save(sender, instance, created, **kwargs):
+    if not created:
+        directory.schedule_refresh(*instance.teacher_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Discipline)
+def refresh_directory_on_discipline_delete(sender, instance, **kwargs):
+    directory.schedule_refresh(*instance.teacher_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=AdditionalWorkType)
+def refresh_directory_on_work_type_save(sender, instance, created, **kwargs):
+    if not created:
+        directory.schedule_refresh(
+            *TeacherAdditionalWork.objects.filter(work_type=instance).values_list('teacher_id', flat=True)
+        )
+
+
+@receiver(pre_delete, sender=AdditionalWorkType)
+def refresh_directory_on_work_type_delete(sender, instance, **kwargs):
+    directory.schedule_refresh(
+        *TeacherAdditionalWork.objects.filter(work_type=instance).values_list('teacher_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=TeacherAdditionalWork)
+@receiver(post_delete, sender=TeacherAdditionalWork)
+def refresh_directory_on_additional_work_change(sender, instance, **kwargs):
+    directory.schedule_refresh(instance.teacher_id)
+
+
+@receiver(m2m_changed, sender=Teacher.disciplines.through)
+def refresh_directory_on_disciplines_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action == 'pre_clear':
+            directory.schedule_refresh(*instance.teacher_set.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            directory.schedule_refresh(*(pk_set or ()))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        directory.schedule_refresh(instance.pk)
+
+
+# Триграммный индекс нечеткого поиска
+def update_search_index(sender, instance, **kwargs):
+    fuzzy.index(instance)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    fuzzy.remove(sender, instance.pk)
+
+
+for model in fuzzy.SOURCES:
+    uid = f'search_index_{model._meta.model_name}'
+    post_save.connect(update_search_index, sender=model, dispatch_uid=f'{uid}_save')
+    post_delete.connect(remove_from_search_index, sender=model, dispatch_uid=f'{uid}_delete')
+
+
+# Лента изменений для синхронизации
+def record_change(sender, instance, **kwargs):
+    changes.record(sender, instance.pk)
+
+
+def record_deletion(sender, instance, **kwargs):
+    changes.record(sender, instance.pk, deleted=True)
+
+
+for model in changes.TRACKED.values():
+    uid = f'changes_{model._meta.model_name}'
+    post_save.connect(record_change, sender=model, dispatch_uid=f'{uid}_save')
+    post_delete.connect(record_deletion, sender=model, dispatch_uid=f'{uid}_delete')
+
+
+@receiver(m2m_changed, sender=Teacher.disciplines.through)
+def record_disciplines_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action == 'pre_clear':
+            changes.touch(Teacher, *instance.teacher_set.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            changes.touch(Teacher, *(pk_set or ()))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        changes.touch(Teacher, instance.pk)
+
+
+@receiver(pre_delete, sender=Classroom)
+def record_workplace_deletion(sender, instance, **kwargs):
+    # Рабочее место обнуляется через UPDATE без сигналов Teacher
+    changes.touch(Teacher, *Teacher.objects.filter(workplace=instance).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Discipline)
+def record_discipline_deletion(sender, instance, **kwargs):
+    # Строки связи удаляются без m2m_changed
+    changes.touch(Teacher, *instance.teacher_set.values_list('pk', flat=True))
@@ -0,0 +1,107 @@
+"""Снимки базы SQLite.
+
+Снимок — файл-копия базы, снятая онлайн-API резервного копирования
+SQLite (sqlite3.Connection.backup): согласованная копия без остановки
+приложения, постранично, без SQL. Восстановление — та же операция в
+обратную сторону, поэтому заполненная база (create_test_data.py,
+loadtest) возвращается за миллисекунды вместо повторной вставки строк.
+
+Снимки хранятся в каталоге DIRECTORY (команда db_snapshot). Тестовый
+запуск может строить тестовую базу из снимка (test_runner.py), базы
+процессов --parallel клонируются из нее тем же API.
+"""
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULTS = {
+    'DIRECTORY': 'snapshots',    # относительно BASE_DIR
+    'TEST': '',                  # снимок для тестовой базы (пусто — миграции на пустой базе)
+}
+
+NAME_RE = re.compile(r'^[\w-]+$')
+
+
+def option(name):
+    return getattr(settings, 'SNAPSHOTS', {}).get(name, DEFAULTS[name])
+
+
+def directory():
+    return Path(settings.BASE_DIR) / option('DIRECTORY')
+
+
+def path(name):
+    if not NAME_RE.match(name):
+        raise ValueError(f'Недопустимое имя снимка: {name!r}')
+    return directory() / f'{name}.sqlite3'
+
+
+def copy(source, target):
+    """Копирует базу source в target (соединения sqlite3) одной операцией"""
+    source.backup(target)
+
+
+def open_readonly(name):
+    """Соединение со снимком только для чтения"""
+    snapshot = path(name)
+    if not snapshot.exists():
+        raise FileNotFoundError(f'Снимок {name} не найден')
+    return sqlite3.connect(f'{snapshot.as_uri()}?mode=ro', uri=True)
+
+
+def _raw_connection(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise ValueError('Снимки поддерживаются только для SQLite')
+    connection.ensure_connection()
+    return connection, connection.connection
+
+
+def create(name, using=DEFAULT_DB_ALIAS):
+    """Снимает базу в файл снимка, возвращает путь к нему"""
+    target = path(name)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    _, source = _raw_connection(using)
+    # Готовый файл подменяет старый целиком: снимок не бывает наполовину записан
+    temporary = target.with_suffix('.tmp')
+    destination = sqlite3.connect(temporary)
+    try:
+        copy(source, destination)
+    finally:
+        destination.close()
+    os.replace(temporary, target)
+    return target
+
+
+def restore(name, using=DEFAULT_DB_ALIAS, clear_cache=True):
+    """Заменяет содержимое базы снимком"""
+    connection, target = _raw_connection(using)
+    if connection.in_atomic_block:
+        raise ValueError('Нельзя восстанавливать снимок внутри транзакции')
+    source = open_readonly(name)
+    try:
+        copy(source, target)
+    finally:
+        source.close()
+    if clear_cache:
+        # Кешированные объекты и версии количеств относятся к прежним данным
+        cache.clear()
+
+
+def delete(name):
+    path(name).unlink()
+
+
+def snapshots():
+    """Имеющиеся снимки: [(имя, размер в байтах, время изменения)]"""
+    if not directory().exists():
+        return []
+    return [
+        (snapshot.stem, snapshot.stat().st_size, snapshot.stat().st_mtime)
+        for snapshot in sorted(directory().glob('*.sqlite3'))
+    ]
@@ -0,0 +1,113 @@
+"""Статические файлы: хешированные имена, предварительное сжатие и отдача.
+
+CompressedManifestStaticFilesStorage при collectstatic добавляет к именам
+хеш содержимого и рядом с каждым текстовым файлом сохраняет сжатые копии
+.gz и .br (если установлен пакет brotli). StaticAssetsMiddleware отдает
+файлы из STATIC_ROOT без участия представлений: выбирает сжатую копию по
+Accept-Encoding, а для хешированных имен выставляет бессрочное
+кеширование.
+
+Манифест строгий: при DEBUG = False без collectstatic шаблоны падают на
+первом {% static %}, а не отдают ссылки на несуществующие файлы. Тесты
+используют обычное хранилище (см. test_runner.py).
+"""
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # сжатие brotli необязательно
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE = 60
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хранилище с манифестом хешей и сжатыми копиями файлов"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if not dry_run and hashed_name and not isinstance(processed, Exception):
+                self._compress(name)
+                self._compress(hashed_name)
+
+    def _compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+            return
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            # Сжатая копия нужна только если она действительно меньше
+            if len(compressed) < len(content):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+
+class StaticAssetsMiddleware:
+    """Отдает собранные статические файлы из STATIC_ROOT"""
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = settings.STATIC_ROOT
+
+    def __call__(self, request):
+        if settings.DEBUG or not self.root or not request.path.startswith(self.prefix):
+            return self.get_response(request)
+        if request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        response = self.serve(request, request.path[len(self.prefix):])
+        return response or self.get_response(request)
+
+    def _hashed_names(self):
+        names = getattr(self, '_hashed', None)
+        if names is None:
+            manifest = getattr(staticfiles_storage, 'hashed_files', {})
+            names = self._hashed = set(manifest.values())
+        return names
+
+    def serve(self, request, name):
+        path = os.path.normpath(os.path.join(self.root, name))
+        if not path.startswith(os.path.join(os.path.normpath(self.root), '')) or not os.path.isfile(path):
+            return None
+
+        content_type, _ = mimetypes.guess_type(path)
+        accept = {
+            part.split(';')[0].strip()
+            for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        encoding = None
+        serve_path = path
+        for candidate, suffix in self.ENCODINGS:
+            if candidate in accept and os.path.isfile(path + suffix):
+                encoding, serve_path = candidate, path + suffix
+                break
+
+        response = FileResponse(open(serve_path, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if name in self._hashed_names():
+            response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={DEFAULT_MAX_AGE}'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
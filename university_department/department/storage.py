@@ -0,0 +1,137 @@
+"""Хранилище фотографий с адресацией по содержимому.
+
+Загружаемый файл пишется на диск частями (HashingUploadHandler) с
+одновременным подсчетом SHA-256 и проверкой размера, поэтому в памяти
+файл целиком не держится. ContentAddressedStorage сохраняет файл под
+именем teachers/<xx>/<sha256>.<ext>: повторная загрузка той же
+фотографии не создает новый файл. Число ссылок на файл ведется в
+StoredFile (см. signals.py); файл удаляется, когда на него не ссылается
+ни один преподаватель.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F
+
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 25_000_000
+
+
+def max_upload_size():
+    return getattr(settings, 'PHOTO_MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+
+
+def max_pixels():
+    return getattr(settings, 'PHOTO_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, считая SHA-256 и размер"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.limit = max_upload_size()
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.exceeded:
+            return None
+        if start + len(raw_data) > self.limit:
+            # Остаток не сохраняем, форма отклонит файл по размеру
+            self.exceeded = True
+            return None
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.limit_exceeded = self.exceeded
+        file.sha256 = None if self.exceeded else self.hasher.hexdigest()
+        return file
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище с именами по хешу содержимого"""
+
+    def _hashed_name(self, name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension).replace(os.sep, '/')
+
+    def _spool(self, content):
+        """Копирует содержимое во временный файл, считая хеш"""
+        os.makedirs(self.location, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.upload', dir=self.location)
+        hasher = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, 'wb') as temp:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks(CHUNK_SIZE):
+                hasher.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        return temp_path, hasher.hexdigest(), size
+
+    def _save(self, name, content):
+        digest = getattr(content, 'sha256', None)
+        if digest:
+            hashed_name = self._hashed_name(name, digest)
+            if not self.exists(hashed_name):
+                hashed_name = super()._save(hashed_name, content)
+            size = content.size
+        else:
+            temp_path, digest, size = self._spool(content)
+            hashed_name = self._hashed_name(name, digest)
+            if self.exists(hashed_name):
+                os.remove(temp_path)
+            else:
+                full_path = self.path(hashed_name)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                file_move_safe(temp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        StoredFile = apps.get_model('department', 'StoredFile')
+        StoredFile.objects.get_or_create(name=hashed_name, defaults={'size': size})
+        return hashed_name
+
+
+def photo_storage():
+    return ContentAddressedStorage()
+
+
+# Подсчет ссылок
+
+def acquire(name):
+    if name:
+        StoredFile = apps.get_model('department', 'StoredFile')
+        StoredFile.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release(name):
+    """Уменьшает число ссылок и удаляет файл, если ссылок не осталось"""
+    if not name:
+        return
+    StoredFile = apps.get_model('department', 'StoredFile')
+    StoredFile.objects.filter(name=name).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: delete_if_orphan(name))
+
+
+def delete_if_orphan(name):
+    StoredFile = apps.get_model('department', 'StoredFile')
+    with transaction.atomic():
+        deleted, _ = StoredFile.objects.filter(name=name, ref_count__lte=0).delete()
+    if deleted:
+        photo_storage().delete(name)
+    return bool(deleted)
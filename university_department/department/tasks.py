@@ -0,0 +1,42 @@
+"""Фоновые задачи кафедры (выполняются командой run_jobs, см. jobs.py)"""
+import csv
+import os
+
+from django.core.files.storage import default_storage
+from django.http import QueryDict
+
+from . import directory, facets, reports
+from .jobs import progress_update, task
+
+PROGRESS_EVERY = 500
+
+
+@task(name='export_teachers')
+def export_teachers(job, filters=None):
+    """Выгрузка справочника преподавателей в CSV-файл"""
+    params = QueryDict(mutable=True)
+    params.update(filters or {})
+    entries = facets.apply(directory.filtered(params), facets.selected_from(params))
+    total = entries.count()
+
+    name = f'exports/teachers-{job.pk}.csv'
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(directory.CSV_HEADER)
+        for number, row in enumerate(directory.csv_rows(entries), 1):
+            writer.writerow(row)
+            if number % PROGRESS_EVERY == 0:
+                progress_update(job, number * 100 // max(total, 1), f'Выгружено {number} из {total}')
+    return {'url': default_storage.url(name), 'rows': total}
+
+
+@task(name='build_report')
+def build_report(job, report, fmt):
+    """Отчет кафедры в XLSX или PDF"""
+    name = reports.build(
+        reports.REPORTS[report], fmt,
+        progress=lambda percent, message: progress_update(job, percent, message),
+    )
+    return {'url': default_storage.url(name)}
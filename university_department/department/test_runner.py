@@ -0,0 +1,91 @@
+"""Запуск тестов с тестовой базой из снимка (см. snapshots.py).
+
+Если задан снимок (--snapshot или SNAPSHOTS['TEST']), тестовая база
+SQLite не строится миграциями с нуля, а заполняется из снимка; migrate
+после этого применяет только миграции, которых в снимке еще нет. Базы
+процессов --parallel клонируются из готовой тестовой базы API резервного
+копирования SQLite (в памяти при fork копию дает сам fork). Без снимка
+поведение не отличается от DiscoverRunner.
+
+Статические файлы в тестах отдаются обычным хранилищем без манифеста:
+тесты не требуют collectstatic.
+"""
+import os
+import sqlite3
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.sqlite3.creation import DatabaseCreation
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from . import snapshots
+
+
+class SnapshotDatabaseCreation(DatabaseCreation):
+    """Создание тестовой базы SQLite из снимка"""
+
+    def __init__(self, connection, snapshot):
+        super().__init__(connection)
+        self.snapshot = snapshot
+
+    def _create_test_db(self, verbosity, autoclobber, keepdb=False):
+        test_database_name = super()._create_test_db(verbosity, autoclobber, keepdb)
+        if keepdb and not self.is_in_memory_db(test_database_name) and os.path.exists(test_database_name):
+            return test_database_name
+        if verbosity >= 1:
+            self.log(f'Загрузка снимка {self.snapshot} в тестовую базу...')
+        # Соединение Django держит базу в памяти открытой, поэтому снимок пишется через него
+        self.connection.close()
+        self.connection.settings_dict['NAME'] = test_database_name
+        snapshots.restore(self.snapshot, using=self.connection.alias, clear_cache=False)
+        return test_database_name
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        source_database_name = self.connection.settings_dict['NAME']
+        if self.is_in_memory_db(source_database_name):
+            return super()._clone_test_db(suffix, verbosity, keepdb)
+        target_database_name = self.get_test_db_clone_settings(suffix)['NAME']
+        if keepdb and os.path.exists(target_database_name):
+            return
+        # Согласованная копия вместо копирования файла, в который могли не попасть данные из WAL
+        self.connection.ensure_connection()
+        target = sqlite3.connect(target_database_name)
+        try:
+            snapshots.copy(self.connection.connection, target)
+        finally:
+            target.close()
+
+
+class SnapshotTestRunner(DiscoverRunner):
+    def __init__(self, snapshot=None, **kwargs):
+        super().__init__(**kwargs)
+        self.snapshot = snapshot or snapshots.option('TEST')
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--snapshot', help='Заполнить тестовую базу из снимка (см. команду db_snapshot)'
+        )
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.static_storage = override_settings(STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        self.static_storage.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.static_storage.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        if self.snapshot:
+            # Отсутствующий снимок — ошибка до создания баз, а не посреди миграций
+            snapshots.open_readonly(self.snapshot).close()
+            for connection in connections.all():
+                if connection.vendor == 'sqlite':
+                    connection.creation = SnapshotDatabaseCreation(connection, self.snapshot)
+        return super().setup_databases(**kwargs)
@@ -1,3 +1,485 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archive, assignments, audit, changes, integrity, jobs, throttling
+from .models import (
+    AdditionalWorkType, ArchivedAdditionalWork, AuditEntry, ChangeRecord, Classroom, Discipline, Job, Teacher,
+    TeacherAdditionalWork,
+)
+
+
+@override_settings(
+    OBJECT_CACHE={'ENABLED': False},
+    AUDIT={'ASYNC': False},
+    TIMETABLE={'ASYNC': False},
+)
+class DetailViewQueriesTests(TestCase):
+    """Страницы объектов загружаются постоянным числом запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.discipline = Discipline.objects.create(name='Базы данных', semester=3, hours=72)
+        cls.teachers = []
+        for number in range(30):
+            classroom = Classroom.objects.create(room_number=f'{100 + number}', capacity=1)
+            teacher = Teacher.objects.create(
+                last_name=f'Иванов{number}',
+                first_name='Иван',
+                position='Доцент',
+                email=f'teacher{number}@example.com',
+                employment_date=datetime.date(2020, 9, 1),
+                workplace=classroom,
+            )
+            teacher.disciplines.add(cls.discipline)
+            cls.teachers.append(teacher)
+        teacher = cls.teachers[0]
+        for number in range(5):
+            teacher.disciplines.add(
+                Discipline.objects.create(name=f'Дисциплина {number}', semester=number + 1, hours=36)
+            )
+            TeacherAdditionalWork.objects.create(
+                teacher=teacher,
+                work_type=AdditionalWorkType.objects.create(name=f'Работа {number}'),
+                start_date=datetime.date(2021, number + 1, 1),
+            )
+
+    def test_discipline_detail(self):
+        # Дисциплина, преподаватели вместе с аудиториями
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('department:discipline_detail', args=[self.discipline.pk]))
+        self.assertEqual(len(response.context['teachers']), 30)
+        self.assertContains(response, self.teachers[-1].workplace.room_number)
+
+    def test_teacher_detail(self):
+        # Преподаватель, аудитория, дисциплины, дополнительная работа
+        teacher = self.teachers[0]
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('department:teacher_detail', args=[teacher.pk]))
+        self.assertEqual(len(response.context['disciplines']), 6)
+        self.assertEqual(len(response.context['additional_works']), 5)
+
+    def test_classroom_detail(self):
+        classroom = self.teachers[0].workplace
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('department:classroom_detail', args=[classroom.pk]))
+        self.assertEqual(response.context['teachers'], [self.teachers[0]])
+
+
+@override_settings(AUDIT={'ASYNC': True, 'FLUSH_INTERVAL': 0.05, 'BATCH_SIZE': 2})
+class AuditBufferTests(SimpleTestCase):
+    """Фоновая запись журнала (записи журнала заменены строками)"""
+
+    def setUp(self):
+        self.buffer = audit.AuditBuffer()
+        self.written = []
+        self.buffer._write = self.written.extend
+
+    def test_close_writes_everything(self):
+        for number in range(5):
+            self.buffer.put(number)
+        self.buffer.close()
+        self.assertEqual(sorted(self.written), [0, 1, 2, 3, 4])
+        self.assertFalse(self.buffer.worker.is_alive())
+
+    def test_flush_waits_for_batch_in_worker(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(entries):
+            started.set()
+            release.wait(5)
+            self.written.extend(entries)
+
+        self.buffer._write = slow_write
+        self.buffer.put('first')
+        self.assertTrue(started.wait(1))
+        flusher = threading.Thread(target=self.buffer.flush)
+        flusher.start()
+        flusher.join(0.2)
+        # Пачка уже взята потоком, но еще не записана — flush() ее дожидается
+        self.assertTrue(flusher.is_alive())
+        release.set()
+        flusher.join(5)
+        self.assertEqual(self.written, ['first'])
+        self.buffer.close()
+
+
+class ConcurrentWriteTests(SimpleTestCase):
+    """Транзакция «чтение, затем запись» при записи из другого потока (как поток журнала)"""
+
+    def test_read_then_write_waits_for_lock(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')}
+            read_done, written = threading.Event(), threading.Event()
+            errors = []
+
+            def run(target):
+                connections['concurrency'] = DatabaseWrapper(settings_dict, 'concurrency')
+                try:
+                    target(connections['concurrency'])
+                except Exception as exc:
+                    errors.append(exc)
+                    read_done.set()
+                finally:
+                    connections['concurrency'].close()
+
+            def reader(db):
+                with transaction.atomic(using='concurrency'), db.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM item')
+                    read_done.set()
+                    # При BEGIN IMMEDIATE второй поток ждет нас, поэтому ожидание ограничено
+                    written.wait(0.5)
+                    cursor.execute("INSERT INTO item (name) VALUES ('reader')")
+
+            def writer(db):
+                read_done.wait(5)
+                with transaction.atomic(using='concurrency'), db.cursor() as cursor:
+                    cursor.execute("INSERT INTO item (name) VALUES ('writer')")
+                    written.set()
+                    time.sleep(0.2)
+
+            setup = DatabaseWrapper(settings_dict, 'concurrency')
+            with setup.cursor() as cursor:
+                cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)')
+            threads = [threading.Thread(target=run, args=(target,)) for target in (reader, writer)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(30)
+            with setup.cursor() as cursor:
+                cursor.execute('SELECT name FROM item ORDER BY name')
+                names = [row[0] for row in cursor.fetchall()]
+            setup.close()
+        self.assertEqual(errors, [])
+        self.assertEqual(names, ['reader', 'writer'])
+
+
+def create_teacher(number, **kwargs):
+    return Teacher.objects.create(
+        last_name=f'Петров{number}',
+        first_name='Петр',
+        position='Доцент',
+        email=f'petrov{number}@example.com',
+        employment_date=datetime.date(2020, 9, 1),
+        workplace=Classroom.objects.create(room_number=f'{500 + number}', capacity=1),
+        **kwargs,
+    )
+
+
+@override_settings(AUDIT={'ASYNC': False}, TIMETABLE={'ASYNC': False})
+class AssignmentChangesTests(TestCase):
+    """Пакетное изменение назначений учитывает только реальные изменения"""
+
+    def setUp(self):
+        self.teacher = create_teacher(1)
+        self.assigned = Discipline.objects.create(name='Базы данных', semester=3, hours=72)
+        self.other = Discipline.objects.create(name='Сети', semester=3, hours=72)
+        self.teacher.disciplines.add(self.assigned)
+        AuditEntry.objects.all().delete()
+        ChangeRecord.objects.all().delete()
+
+    def apply(self, added, removed):
+        with self.captureOnCommitCallbacks(execute=True):
+            return assignments.apply_changes(added, removed)
+
+    def test_no_op(self):
+        result = self.apply({(self.teacher.pk, self.assigned.pk)}, {(self.teacher.pk, self.other.pk)})
+        self.assertEqual(result, (0, 0))
+        self.assertFalse(AuditEntry.objects.exists())
+        self.assertFalse(ChangeRecord.objects.exists())
+
+    def test_only_real_changes_are_recorded(self):
+        result = self.apply(
+            {(self.teacher.pk, self.assigned.pk), (self.teacher.pk, self.other.pk)},
+            {(self.teacher.pk, self.assigned.pk + self.other.pk + 1)},
+        )
+        self.assertEqual(result, (1, 0))
+        entry = AuditEntry.objects.get()
+        self.assertEqual(entry.changes, {'disciplines': {'added': [self.other.pk]}})
+        result = self.apply(set(), {(self.teacher.pk, self.assigned.pk), (self.teacher.pk, self.assigned.pk + 100)})
+        self.assertEqual(result, (0, 1))
+        self.assertEqual(list(self.teacher.disciplines.all()), [self.other])
+
+    def test_matrix_ignores_bad_semester(self):
+        response = self.client.get(reverse('department:assignment_matrix'), {'semester': 'abc'})
+        self.assertEqual(response.status_code, 200)
+
+
+@jobs.task(name='tests.echo')
+def echo_task(job, value=None):
+    return value
+
+
+@jobs.task(name='tests.fail', max_attempts=2)
+def fail_task(job):
+    raise ValueError('сбой')
+
+
+@jobs.task(name='tests.cancel')
+def cancel_task(job):
+    jobs.cancel(job.pk)
+    jobs.progress_update(job, 50)
+
+
+@override_settings(JOBS={'RETRY_DELAY': 5, 'STALE_TIMEOUT': 300, 'HEARTBEAT_INTERVAL': 0, 'POLL_INTERVAL': 0.01})
+class JobTests(TestCase):
+    """Очередь задач: захват, повторы, отмена и отметки активности"""
+
+    def test_claim_is_exclusive(self):
+        job = jobs.enqueue(echo_task, value=1)
+        self.assertEqual(jobs.claim('first'), job.pk)
+        self.assertIsNone(jobs.claim('second'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.RUNNING, 'first'))
+        self.assertIsNotNone(job.heartbeat)
+
+    def test_delayed_job_is_not_claimed(self):
+        jobs.enqueue(echo_task, delay=60)
+        self.assertIsNone(jobs.claim('worker'))
+
+    def test_retry_then_fail(self):
+        job = jobs.enqueue(fail_task)
+        with self.assertLogs('department.jobs', 'ERROR'):
+            jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=4))
+        with self.assertLogs('department.jobs', 'ERROR'):
+            jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('ValueError', job.error)
+
+    def test_cancel(self):
+        queued = jobs.enqueue(echo_task)
+        self.assertTrue(jobs.cancel(queued.pk))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.CANCELLED)
+        self.assertFalse(jobs.cancel(queued.pk))
+        running = jobs.enqueue(cancel_task)
+        jobs.run_job(running.pk)
+        running.refresh_from_db()
+        self.assertEqual(running.status, Job.CANCELLED)
+
+    @override_settings(JOBS={'EAGER': True})
+    def test_eager_claim_sets_heartbeat(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.enqueue(echo_task, value=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.DONE, 2))
+        self.assertIsNotNone(job.heartbeat)
+
+    def test_requeue_only_silent_jobs(self):
+        silent = jobs.enqueue(echo_task)
+        busy = jobs.enqueue(echo_task)
+        old = timezone.now() - timedelta(seconds=600)
+        Job.objects.update(status=Job.RUNNING, heartbeat=old)
+        jobs.touch([busy.pk])
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=silent.pk).status, Job.QUEUED)
+        self.assertEqual(Job.objects.get(pk=busy.pk).status, Job.RUNNING)
+
+    def test_worker_loop_refreshes_heartbeat(self):
+        job = jobs.enqueue(echo_task)
+        old = timezone.now() - timedelta(seconds=60)
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, heartbeat=old)
+        claims = iter([job.pk])
+        # Задача не вызывает progress_update(): отметку ставит цикл обработчика
+        with mock.patch.object(jobs, 'claim', lambda worker: next(claims, None)), \
+                mock.patch.object(jobs, '_execute', lambda job_id: time.sleep(0.2)):
+            jobs.work(workers=1, once=True)
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat, old + timedelta(seconds=30))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttling'}},
+    THROTTLING={'CAPACITY': 6, 'RATE': 1, 'COSTS': {'search': 3, 'deep_page': 2, 'export': 10}},
+)
+class ThrottlingTests(TestCase):
+    """Корзина жетонов: списание, пополнение и ответ 429"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_drains_and_refills(self):
+        with mock.patch.object(throttling.time, 'time', return_value=1000.0) as clock:
+            self.assertEqual(throttling.take('user:1', 3), 0)
+            self.assertEqual(throttling.take('user:1', 3), 0)
+            self.assertEqual(throttling.take('user:1', 3), 3)
+            self.assertEqual(throttling.take('user:2', 3), 0)
+            clock.return_value = 1002.0
+            self.assertEqual(throttling.take('user:1', 3), 1)
+            clock.return_value = 1003.0
+            self.assertEqual(throttling.take('user:1', 3), 0)
+
+    def test_cost_above_capacity_runs_on_full_bucket(self):
+        with mock.patch.object(throttling.time, 'time', return_value=1000.0):
+            self.assertEqual(throttling.take('user:1', 10), 0)
+            self.assertEqual(throttling.take('user:1', 10), 6)
+
+    def test_charge_raises_throttled(self):
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.1'}, user=None)
+        throttling.charge(request, 'search')
+        throttling.charge(request, 'search')
+        with self.assertRaises(throttling.Throttled) as raised:
+            throttling.charge(request, 'search')
+        self.assertGreater(raised.exception.wait, 0)
+
+    def test_search_gets_429(self):
+        url = reverse('department:teacher_list')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url, {'search': 'Иванов'}).status_code, 200)
+        response = self.client.get(url, {'search': 'Иванов'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Обычный просмотр не ограничивается
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_disabled(self):
+        url = reverse('department:teacher_list')
+        with self.settings(THROTTLING={'ENABLED': False}):
+            for _ in range(5):
+                self.assertEqual(self.client.get(url, {'search': 'Иванов'}).status_code, 200)
+
+
+@override_settings(AUDIT={'ASYNC': False}, TIMETABLE={'ASYNC': False})
+class DuplicateDisciplineCheckTests(TestCase):
+    """Копии дисциплин находятся без учета регистра, в том числе кириллицы"""
+
+    def test_cyrillic_case(self):
+        check = integrity.DuplicateDisciplineCheck()
+        original = Discipline.objects.create(name='Базы данных', semester=3, hours=72)
+        copy = Discipline.objects.create(name='БАЗЫ ДАННЫХ', semester=3, hours=72)
+        Discipline.objects.create(name='базы данных', semester=4, hours=72)
+        teacher = create_teacher(1)
+        teacher.disciplines.add(copy)
+        self.assertEqual(list(check.queryset()), [copy])
+        self.assertEqual(check.examples(5), ['«Базы данных» (3 семестр): копий 2'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(integrity.repair(check), 1)
+        self.assertEqual(list(teacher.disciplines.all()), [original])
+        self.assertEqual(check.count(), 0)
+
+
+@override_settings(AUDIT={'ASYNC': False}, TIMETABLE={'ASYNC': False})
+class ArchiveTests(TestCase):
+    """Перенос завершенных назначений в архив"""
+
+    def setUp(self):
+        self.teacher = create_teacher(1)
+        self.types = [
+            AdditionalWorkType.objects.create(name=f'Работа {number}') for number in range(3)
+        ]
+        today = timezone.localdate()
+        self.ended = [
+            TeacherAdditionalWork.objects.create(
+                teacher=self.teacher, work_type=work_type,
+                start_date=today - timedelta(days=60), end_date=today - timedelta(days=1),
+            )
+            for work_type in self.types[:2]
+        ]
+        self.active = TeacherAdditionalWork.objects.create(
+            teacher=self.teacher, work_type=self.types[2], start_date=today - timedelta(days=60),
+        )
+
+    def test_archive_moves_ended_works(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive.archive(batch_size=1), 2)
+        self.assertEqual(list(TeacherAdditionalWork.objects.all()), [self.active])
+        self.assertEqual(
+            sorted(ArchivedAdditionalWork.objects.values_list('original_id', flat=True)),
+            [work.pk for work in self.ended],
+        )
+        self.assertTrue(all(
+            ChangeRecord.objects.get(model_name='teacheradditionalwork', object_id=work.pk).deleted
+            for work in self.ended
+        ))
+        rows = list(archive.history(teacher=self.teacher))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(sorted(row['work_id'] for row in rows if row['archived']), [work.pk for work in self.ended])
+        self.assertEqual(archive.archive(), 0)
+
+    def test_release_allows_reassigning(self):
+        work_type = self.types[0]
+        self.assertEqual(archive.release(self.teacher.pk, self.types[2].pk), 0)
+        self.assertEqual(archive.release('x', work_type.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive.release(self.teacher.pk, work_type.pk), 1)
+        self.assertEqual(ArchivedAdditionalWork.objects.get().original_id, self.ended[0].pk)
+        TeacherAdditionalWork.objects.create(
+            teacher=self.teacher, work_type=work_type, start_date=timezone.localdate(),
+        )
+        self.assertEqual(TeacherAdditionalWork.objects.filter(work_type=work_type).count(), 1)
+
+
+@override_settings(AUDIT={'ASYNC': False}, TIMETABLE={'ASYNC': False})
+class ChangeFeedTests(TestCase):
+    """Курсор ленты изменений и надгробия удаленных объектов"""
+
+    def setUp(self):
+        self.classroom = Classroom.objects.create(room_number='101', capacity=10)
+        self.discipline = Discipline.objects.create(name='Базы данных', semester=3, hours=72)
+
+    def ids(self, feed):
+        return [(change['model'], change['id'], change['deleted']) for change in feed['changes']]
+
+    def test_cursor_returns_only_new_changes(self):
+        feed = changes.changes_since()
+        self.assertEqual(self.ids(feed), [
+            ('classroom', self.classroom.pk, False), ('discipline', self.discipline.pk, False),
+        ])
+        self.assertEqual(feed['changes'][1]['data']['name'], 'Базы данных')
+        self.assertEqual(self.ids(changes.changes_since(feed['cursor'])), [])
+
+        self.discipline.hours = 36
+        self.discipline.save()
+        self.discipline.hours = 48
+        self.discipline.save()
+        later = changes.changes_since(feed['cursor'])
+        # Объект, изменившийся дважды, приходит один раз с текущими данными
+        self.assertEqual(self.ids(later), [('discipline', self.discipline.pk, False)])
+        self.assertEqual(later['changes'][0]['data']['hours'], 48)
+
+        pk = self.discipline.pk
+        self.discipline.delete()
+        tombstone = changes.changes_since(later['cursor'])
+        self.assertEqual(self.ids(tombstone), [('discipline', pk, True)])
+        self.assertIsNone(tombstone['changes'][0]['data'])
+
+    def test_paging_and_models(self):
+        first = changes.changes_since(limit=1)
+        self.assertTrue(first['has_more'])
+        second = changes.changes_since(first['cursor'], limit=1)
+        self.assertEqual(self.ids(second), [('discipline', self.discipline.pk, False)])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(self.ids(changes.changes_since(models=['classroom'])), [
+            ('classroom', self.classroom.pk, False),
+        ])
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(changes.decode_cursor(changes.encode_cursor(42)), 42)
+        self.assertEqual(changes.decode_cursor(''), 0)
+        # Мусор, v1:x и v2:1
+        for cursor in ('!!!', 'djE6eA', 'djI6MQ'):
+            with self.assertRaises(ValueError):
+                changes.decode_cursor(cursor)
+
+    def test_view_rejects_bad_parameters(self):
+        url = reverse('department:changes_feed')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['changes']), 2)
+        for params in ({'since': 'garbage'}, {'limit': 'x'}, {'models': 'unknown'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400)
@@ -0,0 +1,131 @@
+"""Ограничение ресурсоемких запросов.
+
+Запрос оценивается по стоимости: поиск (LIKE по таблицам), глубокая
+страница списка, выгрузка. Обычный просмотр ничего не стоит и не
+ограничивается. У каждого пользователя (или IP-адреса для анонимных
+запросов) есть корзина жетонов в общем кеше: CAPACITY жетонов,
+пополнение RATE жетонов в секунду. Если жетонов не хватает, запрос
+получает 429 с заголовком Retry-After, и один пользователь не может
+занять однопоточную базу SQLite поиском в ущерб остальным.
+
+Поиск в представлениях CACHED_SEARCH_VIEWS (живой поиск) оплачивается
+не здесь, а в самом представлении и только при промахе кеша фрагментов:
+готовый или объединенный с чужим расчетом фрагмент базу не нагружает.
+
+Чтение и запись корзины не атомарны: при одновременных запросах одного
+пользователя возможен небольшой перерасход, для защиты от перегрузки
+это допустимо.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+
+from . import livesearch, metrics
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CAPACITY': 30,     # жетонов в полной корзине
+    'RATE': 0.5,        # пополнение, жетонов в секунду
+    'COSTS': {'search': 3, 'deep_page': 2, 'export': 10},
+    'DEEP_PAGE': 20,    # страницы списка дальше этой считаются глубокими
+    'EXPORT_VIEWS': ['department:teacher_export', 'department:report_generate'],
+    'CACHED_SEARCH_VIEWS': ['department:live_search'],    # поиск оплачивается только при расчете (charge)
+}
+
+
+class Throttled(Exception):
+    def __init__(self, wait):
+        super().__init__(wait)
+        self.wait = wait
+
+
+def option(name):
+    return getattr(settings, 'THROTTLING', {}).get(name, DEFAULTS[name])
+
+
+def classify(request, view_name):
+    """Составляющие стоимости запроса: {'search': 3, ...}"""
+    costs = option('COSTS')
+    parts = {}
+    if request.GET.get('search', '').strip() and view_name not in option('CACHED_SEARCH_VIEWS'):
+        parts['search'] = costs['search']
+    page = request.GET.get('page', '')
+    if page.isdigit() and int(page) > option('DEEP_PAGE'):
+        parts['deep_page'] = costs['deep_page']
+    if view_name in option('EXPORT_VIEWS'):
+        parts['export'] = costs['export']
+    return parts
+
+
+def identity(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def take(key, cost):
+    """Списывает жетоны; возвращает 0 или сколько секунд ждать"""
+    capacity, rate = option('CAPACITY'), option('RATE')
+    # Запрос дороже полной корзины все же выполняется, когда она полна
+    cost = min(cost, capacity)
+    now = time.time()
+    cache_key = f'throttle:{key}'
+    tokens, updated = cache.get(cache_key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    wait = 0
+    if tokens < cost:
+        wait = math.ceil((cost - tokens) / rate)
+    else:
+        tokens -= cost
+    cache.set(cache_key, (tokens, now), math.ceil(capacity / rate) + 60)
+    return wait
+
+
+def charge(request, reason):
+    """Списывает стоимость reason внутри представления; Throttled, если жетонов не хватает"""
+    if not option('ENABLED'):
+        return
+    wait = take(identity(request), option('COSTS')[reason])
+    if wait:
+        metrics.throttled(reason)
+        raise Throttled(wait)
+
+
+def throttled_response(request, wait):
+    if request.headers.get(livesearch.FRAGMENT_HEADER):
+        response = HttpResponse(
+            f'Слишком много запросов. Повторите через {wait} с.',
+            status=429, content_type='text/plain; charset=utf-8',
+        )
+    else:
+        response = TemplateResponse(request, 'department/throttled.html', {'wait': wait}, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
+
+class ThrottleMiddleware:
+    """429 для ресурсоемких запросов сверх корзины жетонов"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not option('ENABLED') or request.resolver_match is None:
+            return None
+        parts = classify(request, request.resolver_match.view_name)
+        if not parts:
+            return None
+        wait = take(identity(request), sum(parts.values()))
+        if not wait:
+            return None
+        for reason in parts:
+            metrics.throttled(reason)
+        return throttled_response(request, wait)
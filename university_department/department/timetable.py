@@ -0,0 +1,419 @@
+"""Построение расписания занятий.
+
+Каждая пара «преподаватель — дисциплина» дает несколько занятий в неделю
+(по числу часов дисциплины). Решатель размещает занятия по слотам
+(день, пара) и аудиториям так, чтобы у преподавателя и аудитории не было
+накладок, аудитория вмещала группу, а недельная нагрузка не превышала
+ставку преподавателя. Сначала строится жадное решение, затем в пределах
+лимита времени выполняется локальный поиск: перенос мешающих занятий для
+неразмещенных и снижение штрафа за повторы дисциплины в один день.
+
+Расчет выполняется в фоновом потоке, результат сохраняется в
+TimetableRun / ScheduledSession. При изменении дисциплин или ставки
+преподавателя пересчитываются только его занятия.
+"""
+import bisect
+import logging
+import math
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Classroom, ScheduledSession, Teacher, TimetableRun
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'DAYS': 6,                # учебных дней в неделе
+    'PERIODS': 6,             # пар в день
+    'WEEKS': 18,              # недель в семестре
+    'MAX_WEEKLY_PAIRS': 18,   # пар в неделю на полную ставку
+    'GROUP_SIZE': 25,         # размер группы по умолчанию
+    'TIME_BUDGET': 10.0,      # лимит времени на расчет, с
+    'ASYNC': True,            # запускать расчет в фоновом потоке
+}
+
+
+def option(name):
+    return getattr(settings, 'TIMETABLE', {}).get(name, DEFAULTS[name])
+
+
+class Session:
+    """Занятие, которое нужно разместить"""
+    __slots__ = ('teacher_id', 'discipline_id', 'size', 'slot', 'room_id', 'fixed')
+
+    def __init__(self, teacher_id, discipline_id, size, slot=None, room_id=None, fixed=False):
+        self.teacher_id = teacher_id
+        self.discipline_id = discipline_id
+        self.size = size
+        self.slot = slot
+        self.room_id = room_id
+        self.fixed = fixed
+
+
+class Solver:
+    """Жадное построение + локальный поиск"""
+
+    def __init__(self, sessions, rooms, days, periods, seed=None):
+        self.sessions = sessions
+        self.days = days
+        self.periods = periods
+        self.slots = list(range(days * periods))
+        # Аудитории по возрастанию вместимости для поиска наименьшей подходящей
+        rooms = sorted((capacity, pk) for pk, capacity in rooms)
+        self.room_capacities = [capacity for capacity, _ in rooms]
+        self.room_ids = [pk for _, pk in rooms]
+        self.random = random.Random(seed)
+
+        self.teacher_busy = defaultdict(dict)   # teacher -> {slot: session}
+        self.room_busy = defaultdict(dict)      # slot -> {room: session}
+        self.same_day = defaultdict(int)        # (teacher, discipline, day) -> число занятий
+        self.unassigned = set()
+
+        for session in sessions:
+            if session.slot is not None:
+                self._place(session, session.slot, session.room_id)
+            else:
+                self.unassigned.add(session)
+
+    # Состояние
+
+    def _day(self, slot):
+        return slot // self.periods
+
+    def _place(self, session, slot, room_id):
+        session.slot = slot
+        session.room_id = room_id
+        self.teacher_busy[session.teacher_id][slot] = session
+        self.room_busy[slot][room_id] = session
+        self.same_day[(session.teacher_id, session.discipline_id, self._day(slot))] += 1
+        self.unassigned.discard(session)
+
+    def _unplace(self, session):
+        slot = session.slot
+        del self.teacher_busy[session.teacher_id][slot]
+        del self.room_busy[slot][session.room_id]
+        self.same_day[(session.teacher_id, session.discipline_id, self._day(slot))] -= 1
+        session.slot = None
+        session.room_id = None
+        self.unassigned.add(session)
+
+    def _free_room(self, slot, size):
+        """Наименьшая свободная аудитория, вмещающая группу"""
+        busy = self.room_busy[slot]
+        start = bisect.bisect_left(self.room_capacities, size)
+        for room_id in self.room_ids[start:]:
+            if room_id not in busy:
+                return room_id
+        return None
+
+    def _cost(self, session, slot):
+        """Штраф за размещение: повтор дисциплины в тот же день"""
+        return self.same_day[(session.teacher_id, session.discipline_id, self._day(slot))]
+
+    def penalty(self):
+        return sum(count * (count - 1) // 2 for count in self.same_day.values() if count > 1)
+
+    # Жадное построение
+
+    def _best_position(self, session):
+        busy = self.teacher_busy[session.teacher_id]
+        best = None
+        for slot in self.slots:
+            if slot in busy:
+                continue
+            cost = self._cost(session, slot)
+            if best is not None and cost >= best[0]:
+                continue
+            room_id = self._free_room(slot, session.size)
+            if room_id is not None:
+                best = (cost, slot, room_id)
+                if cost == 0:
+                    break
+        return best
+
+    def construct(self):
+        load = defaultdict(int)
+        for session in self.unassigned:
+            load[session.teacher_id] += 1
+        # Сначала самые загруженные преподаватели и самые большие группы
+        order = sorted(
+            self.unassigned,
+            key=lambda s: (-load[s.teacher_id], -s.size, s.teacher_id, s.discipline_id),
+        )
+        for session in order:
+            best = self._best_position(session)
+            if best is not None:
+                self._place(session, best[1], best[2])
+
+    # Локальный поиск
+
+    def _eject_and_place(self, session, deadline):
+        """Освобождает место для занятия, перенося одно мешающее"""
+        busy = self.teacher_busy[session.teacher_id]
+        slots = [slot for slot in self.slots if slot not in busy]
+        self.random.shuffle(slots)
+        start = bisect.bisect_left(self.room_capacities, session.size)
+        # Перебор слоты × аудитории × слоты велик, лимит проверяется на каждом уровне
+        for slot in slots:
+            if time.monotonic() >= deadline:
+                return False
+            for room_id in self.room_ids[start:]:
+                blocker = self.room_busy[slot].get(room_id)
+                if blocker is None or blocker.fixed:
+                    continue
+                if time.monotonic() >= deadline:
+                    return False
+                blocker_busy = self.teacher_busy[blocker.teacher_id]
+                for other in self.slots:
+                    if other == slot or other in blocker_busy:
+                        continue
+                    if time.monotonic() >= deadline:
+                        return False
+                    other_room = self._free_room(other, blocker.size)
+                    if other_room is not None:
+                        self._unplace(blocker)
+                        self._place(blocker, other, other_room)
+                        self._place(session, slot, room_id)
+                        return True
+        return False
+
+    def _improve(self, session):
+        """Переносит занятие в слот с меньшим штрафом"""
+        current = self._cost(session, session.slot) - 1
+        if current <= 0:
+            return False
+        busy = self.teacher_busy[session.teacher_id]
+        for slot in self.random.sample(self.slots, len(self.slots)):
+            if slot in busy or self._cost(session, slot) >= current:
+                continue
+            room_id = self._free_room(slot, session.size)
+            if room_id is not None:
+                self._unplace(session)
+                self._place(session, slot, room_id)
+                return True
+        return False
+
+    def local_search(self, deadline):
+        # Размещение оставшихся занятий, пока есть продвижение
+        progress = True
+        while progress and self.unassigned and time.monotonic() < deadline:
+            progress = False
+            pending = list(self.unassigned)
+            self.random.shuffle(pending)
+            for session in pending:
+                if self._eject_and_place(session, deadline):
+                    progress = True
+        # Снижение штрафа
+        movable = [s for s in self.sessions if not s.fixed and s.slot is not None]
+        idle = 0
+        while movable and idle < len(movable) and time.monotonic() < deadline:
+            session = self.random.choice(movable)
+            if session.slot is not None and self._improve(session):
+                idle = 0
+            else:
+                idle += 1
+
+    def solve(self, time_budget):
+        deadline = time.monotonic() + time_budget
+        self.construct()
+        self.local_search(deadline)
+        return self
+
+
+# Работа с базой данных
+
+def _term_filter(term):
+    """Дисциплины семестра: осенью нечетные, весной четные"""
+    return [s for s in range(1, 13) if (s % 2 == 1) == (term == TimetableRun.AUTUMN)]
+
+
+def build_sessions(term, teacher_ids=None):
+    """Занятия на неделю для пар «преподаватель — дисциплина»"""
+    weeks = option('WEEKS')
+    group_size = option('GROUP_SIZE')
+    max_pairs = option('MAX_WEEKLY_PAIRS')
+
+    links = Teacher.disciplines.through.objects.filter(
+        discipline__semester__in=_term_filter(term)
+    ).order_by('teacher_id', 'discipline__semester', 'discipline_id')
+    if teacher_ids is not None:
+        links = links.filter(teacher_id__in=teacher_ids)
+    rates = dict(Teacher.objects.values_list('pk', 'rate'))
+
+    sessions = []
+    overload = []
+    planned = defaultdict(int)
+    for teacher_id, discipline_id, hours in links.values_list(
+        'teacher_id', 'discipline_id', 'discipline__hours'
+    ).iterator():
+        # Одна пара — два академических часа
+        pairs = max(1, math.ceil(hours / (weeks * 2)))
+        limit = int(rates.get(teacher_id, 1.0) * max_pairs)
+        for _ in range(pairs):
+            session = Session(teacher_id, discipline_id, group_size)
+            if planned[teacher_id] < limit:
+                planned[teacher_id] += 1
+                sessions.append(session)
+            else:
+                overload.append(session)
+    return sessions, overload
+
+
+def _rooms():
+    return list(Classroom.objects.values_list('pk', 'capacity'))
+
+
+def _save(run, sessions, batch_size=1000):
+    periods = option('PERIODS')
+    ScheduledSession.objects.bulk_create(
+        [
+            ScheduledSession(
+                run=run,
+                teacher_id=s.teacher_id,
+                discipline_id=s.discipline_id,
+                classroom_id=s.room_id,
+                day=None if s.slot is None else s.slot // periods,
+                period=None if s.slot is None else s.slot % periods + 1,
+            )
+            for s in sessions
+        ],
+        batch_size=batch_size,
+    )
+
+
+def solve_run(run_id):
+    """Полный расчет расписания"""
+    run = TimetableRun.objects.get(pk=run_id)
+    run.status = TimetableRun.RUNNING
+    run.save(update_fields=['status'])
+    try:
+        sessions, overload = build_sessions(run.term)
+        solver = Solver(sessions, _rooms(), option('DAYS'), option('PERIODS'), seed=run.pk)
+        solver.solve(run.time_budget)
+        with transaction.atomic():
+            run.sessions.all().delete()
+            _save(run, sessions + overload)
+            run.total_sessions = len(sessions) + len(overload)
+            run.unscheduled = len(solver.unassigned) + len(overload)
+            run.penalty = solver.penalty()
+            run.status = TimetableRun.DONE
+            run.message = (
+                f'Превышение ставки: {len(overload)} занятий' if overload else ''
+            )
+            run.finished_at = timezone.now()
+            run.save()
+    except Exception as exc:
+        logger.exception('Ошибка расчета расписания #%s', run_id)
+        run.status = TimetableRun.FAILED
+        run.message = str(exc)
+        run.finished_at = timezone.now()
+        run.save()
+    return run
+
+
+def resolve_teacher(teacher_id, run=None):
+    """Пересчитывает занятия одного преподавателя в последнем расписании"""
+    run = run or TimetableRun.objects.filter(status=TimetableRun.DONE).first()
+    if run is None:
+        return None
+    periods = option('PERIODS')
+    fixed = [
+        Session(teacher, discipline, 0, day * periods + period - 1, room, fixed=True)
+        for teacher, discipline, room, day, period in run.sessions.exclude(teacher_id=teacher_id)
+        .filter(day__isnull=False)
+        .values_list('teacher_id', 'discipline_id', 'classroom_id', 'day', 'period')
+        .iterator()
+    ]
+    sessions, overload = build_sessions(run.term, teacher_ids=[teacher_id])
+    solver = Solver(fixed + sessions, _rooms(), option('DAYS'), periods, seed=teacher_id)
+    solver.solve(min(run.time_budget, 2.0))
+    with transaction.atomic():
+        run.sessions.filter(teacher_id=teacher_id).delete()
+        _save(run, sessions + overload)
+        counts = run.sessions.aggregate(
+            total=Count('pk'),
+            unscheduled=Count('pk', filter=Q(day__isnull=True)),
+        )
+        run.total_sessions = counts['total']
+        run.unscheduled = counts['unscheduled']
+        run.penalty = solver.penalty()
+        run.save(update_fields=['total_sessions', 'unscheduled', 'penalty'])
+    return run
+
+
+def _in_background(target, *args):
+    if not option('ASYNC'):
+        return target(*args)
+
+    def worker():
+        close_old_connections()
+        try:
+            target(*args)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+
+# Очередь пересчетов по преподавателям: один поток, без дублей в очереди
+_resolve_queue = queue.Queue()
+_queued_teachers = set()
+_resolve_lock = threading.Lock()
+_resolve_worker = None
+
+
+def _resolve_loop():
+    while True:
+        teacher_id = _resolve_queue.get()
+        with _resolve_lock:
+            _queued_teachers.discard(teacher_id)
+        close_old_connections()
+        try:
+            resolve_teacher(teacher_id)
+        except Exception:
+            logger.exception('Ошибка пересчета расписания преподавателя %s', teacher_id)
+        finally:
+            connections.close_all()
+
+
+def _enqueue_resolve(teacher_id):
+    global _resolve_worker
+    if not option('ASYNC'):
+        resolve_teacher(teacher_id)
+        return
+    with _resolve_lock:
+        if teacher_id in _queued_teachers:
+            return
+        _queued_teachers.add(teacher_id)
+        if _resolve_worker is None or not _resolve_worker.is_alive():
+            _resolve_worker = threading.Thread(target=_resolve_loop, daemon=True)
+            _resolve_worker.start()
+    _resolve_queue.put(teacher_id)
+
+
+def start_run(term, time_budget=None):
+    """Создает расчет и запускает его в фоне"""
+    run = TimetableRun.objects.create(
+        term=term, time_budget=time_budget or option('TIME_BUDGET')
+    )
+    transaction.on_commit(lambda: _in_background(solve_run, run.pk))
+    return run
+
+
+def schedule_teacher_resolve(*teacher_ids):
+    """Пересчет занятий преподавателей после фиксации транзакции"""
+    if teacher_ids and TimetableRun.objects.filter(status=TimetableRun.DONE).exists():
+        def enqueue():
+            for teacher_id in teacher_ids:
+                _enqueue_resolve(teacher_id)
+        transaction.on_commit(enqueue)
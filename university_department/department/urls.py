@@ -5,8 +5,11 @@ app_name = 'department'
 
 urlpatterns = [
     path('', views.home, name='home'),
+    # Живой поиск в списках (фрагмент результатов)
+    path('search/live/<str:scope>/', views.live_search, name='live_search'),
     # Преподаватели
     path('teachers/', views.TeacherListView.as_view(), name='teacher_list'),
+    path('teachers/export/', views.teacher_export, name='teacher_export'),
     path('teachers/<int:pk>/', views.TeacherDetailView.as_view(), name='teacher_detail'),
     path('teachers/add/', views.teacher_create, name='teacher_create'),
     path('teachers/<int:pk>/edit/', views.teacher_update, name='teacher_update'),
@@ -37,5 +40,27 @@ urlpatterns = [
     path('teacher-additional-works/add/', views.teacher_additional_work_create, name='teacher_additional_work_create'),
     path('teacher-additional-works/<int:pk>/edit/', views.teacher_additional_work_update, name='teacher_additional_work_update'),
     path('teacher-additional-works/<int:pk>/delete/', views.teacher_additional_work_delete, name='teacher_additional_work_delete'),
+    
+    # Матрица назначений на дисциплины
+    path('assignments/', views.assignment_matrix, name='assignment_matrix'),
+    
+    # Расписание
+    path('timetable/', views.timetable_view, name='timetable'),
+    path('timetable/generate/', views.timetable_generate, name='timetable_generate'),
+    
+    # История изменений
+    path('history/<str:model_name>/<int:pk>/', views.object_history, name='object_history'),
+    
+    # Отчеты
+    path('reports/', views.report_list, name='report_list'),
+    path('reports/<str:name>/<str:fmt>/', views.report_generate, name='report_generate'),
+    
+    # Фоновые задачи
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/cancel/', views.job_cancel, name='job_cancel'),
+    
+    # Лента изменений
+    path('api/changes/', views.changes_feed, name='changes_feed'),
 
 ]
\ No newline at end of file
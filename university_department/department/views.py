@@ -1,7 +1,13 @@
-from django.shortcuts import render
-from django.db.models import Q, Count, Sum
-from .models import Teacher, Classroom, Discipline, TeacherAdditionalWork
+import csv
+
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect
+from django.utils.cache import patch_vary_headers
+from django.db.models import Q, Count, Sum, Prefetch, prefetch_related_objects
+from .models import Teacher, Classroom, Discipline, TeacherAdditionalWork, TeacherDirectoryEntry
 from django.views.generic import ListView, DetailView
+from . import availability, caching, directory, facets, fuzzy, jobs, livesearch, reports, tasks, throttling
+from .paginators import EstimatedCountPaginator, cached_result
 
 
 def home(request):
@@ -16,61 +22,170 @@ def home(request):
     return render(request, 'department/home.html', context)
 
 
-class TeacherListView(ListView):
+class CachedPaginationMixin:
+    """Кешированное (при большом объеме — оценочное) количество строк списка"""
+    paginator_class = EstimatedCountPaginator
+    count_dependencies = ()
+    
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(
+            queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+            dependencies=self.count_dependencies, **kwargs
+        )
+
+
+class FragmentMixin:
+    """Режим фрагмента: по заголовку X-Fragment отдаются только результаты с пагинацией"""
+    fragment_template_name = None
+    # Модели, от которых зависит фрагмент (версии входят в ключ кеша живого поиска)
+    live_search_models = ()
+    
+    @property
+    def is_fragment(self):
+        return bool(self.request.headers.get(livesearch.FRAGMENT_HEADER))
+    
+    def get_template_names(self):
+        if self.is_fragment:
+            return [self.fragment_template_name]
+        return super().get_template_names()
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        context['filter_query'] = params.urlencode()
+        return context
+    
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        patch_vary_headers(response, [livesearch.FRAGMENT_HEADER])
+        return response
+
+
+class TeacherListView(FragmentMixin, CachedPaginationMixin, ListView):
     """Список преподавателей"""
-    model = Teacher
+    model = TeacherDirectoryEntry
     template_name = 'department/teacher_list.html'
+    fragment_template_name = 'department/teacher_list_results.html'
+    live_search_models = (TeacherDirectoryEntry,)
     context_object_name = 'teachers'
     paginate_by = 10
     
     def get_queryset(self):
-        queryset = Teacher.objects.all().order_by('last_name', 'first_name')
-        
-        # Фильтрация по типу занятости
-        employment_type = self.request.GET.get('employment_type')
-        if employment_type:
-            queryset = queryset.filter(employment_type=employment_type)
-        
-        # Поиск по имени
-        search_query = self.request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(last_name__icontains=search_query) |
-                Q(first_name__icontains=search_query) |
-                Q(middle_name__icontains=search_query) |
-                Q(position__icontains=search_query)
-            )
+        # Фильтры и поиск по справочнику (одна таблица)
+        queryset = directory.filtered(self.request.GET)
+        # Нет точных совпадений — ищем с учетом опечаток
+        self.fuzzy_search = bool(self.request.GET.get('search')) and not queryset.exists()
+        if self.fuzzy_search:
+            queryset = directory.filtered(self.request.GET, fuzzy_search=True)
         
-        return queryset
+        # Фасетные фильтры; количества считаются по исходным таблицам
+        self.base_queryset = Teacher.objects.filter(pk__in=queryset.values('pk'))
+        self.selected_facets = facets.selected_from(self.request.GET)
+        return facets.apply(queryset, self.selected_facets)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_count'] = Teacher.objects.count()
-        context['full_time_count'] = Teacher.objects.filter(employment_type='full').count()
-        context['part_time_count'] = Teacher.objects.filter(employment_type='part').count()
+        context['fuzzy_search'] = self.fuzzy_search
+        if self.is_fragment:
+            return context
+        context['facets'] = facets.facet_counts(self.base_queryset, self.selected_facets)
+        # Общая статистика: один запрос, кешируется до изменения Teacher
+        teachers = Teacher.objects.all()
+        stats = cached_result(teachers, 'teacher_stats', lambda: teachers.aggregate(
+            total_count=Count('pk'),
+            full_time_count=Count('pk', filter=Q(employment_type='full')),
+            part_time_count=Count('pk', filter=Q(employment_type='part')),
+        ))
+        context.update(stats)
         return context
 
 
-class TeacherDetailView(DetailView):
+class Echo:
+    """Псевдобуфер для потоковой записи CSV"""
+
+    def write(self, value):
+        return value
+
+
+def teacher_export(request):
+    """Выгрузка списка преподавателей в CSV с учетом фильтров"""
+    if request.GET.get('background'):
+        # Большая выгрузка: задача в очереди, страница с прогрессом
+        params = request.GET.copy()
+        params.pop('background')
+        job = jobs.enqueue(tasks.export_teachers, filters=params.dict())
+        return redirect('department:job_detail', pk=job.pk)
+    
+    entries = facets.apply(directory.filtered(request.GET), facets.selected_from(request.GET))
+    writer = csv.writer(Echo(), delimiter=';')
+    
+    def rows():
+        # BOM, чтобы Excel распознал UTF-8
+        yield '\ufeff' + writer.writerow(directory.CSV_HEADER)
+        for row in directory.csv_rows(entries):
+            yield writer.writerow(row)
+    
+    response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="teachers.csv"'
+    return response
+
+
+class PrefetchPlanMixin:
+    """Загружает связанные объекты страницы фиксированным набором запросов.
+
+    План выполняется один раз для полученного объекта (в том числе взятого
+    из кеша); шаблоны используют готовые списки и их длину вместо
+    повторных .all и .count.
+    """
+
+    def get_prefetch_plan(self):
+        return []
+
+    def get_object(self, queryset=None):
+        obj = super().get_object(queryset)
+        prefetch_related_objects([obj], *self.get_prefetch_plan())
+        return obj
+
+
+class TeacherDetailView(PrefetchPlanMixin, caching.CachedObjectMixin, DetailView):
     """Детальная информация о преподавателе"""
     model = Teacher
     template_name = 'department/teacher_detail.html'
     context_object_name = 'teacher'
     
+    def get_prefetch_plan(self):
+        return [
+            'workplace',
+            Prefetch(
+                'disciplines',
+                queryset=Discipline.objects.order_by('semester', 'name'),
+                to_attr='discipline_list',
+            ),
+            Prefetch(
+                'teacheradditionalwork_set',
+                queryset=TeacherAdditionalWork.objects.select_related('work_type').order_by('-start_date'),
+                to_attr='additional_work_list',
+            ),
+        ]
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['additional_works'] = TeacherAdditionalWork.objects.filter(
-            teacher=self.object
-        ).select_related('work_type')
+        context['disciplines'] = self.object.discipline_list
+        context['additional_works'] = self.object.additional_work_list
         return context
 
 
-class ClassroomListView(ListView):
+class ClassroomListView(FragmentMixin, CachedPaginationMixin, ListView):
     """Список аудиторий"""
     model = Classroom
     template_name = 'department/classroom_list.html'
+    fragment_template_name = 'department/classroom_list_results.html'
+    live_search_models = (Classroom, Teacher)
     context_object_name = 'classrooms'
     paginate_by = 10
+    # Занятость аудиторий меняется вместе с рабочими местами преподавателей
+    count_dependencies = (Teacher,)
     
     def get_queryset(self):
         queryset = Classroom.objects.annotate(
@@ -85,42 +200,69 @@ class ClassroomListView(ListView):
                 Q(description__icontains=search_query)
             )
         
+        # Только свободные аудитории (по индексу занятости)
+        if self.request.GET.get('free'):
+            queryset = queryset.filter(availability__is_free=True)
+        
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Добавляем общую статистику
-        classrooms = self.get_queryset()
-        total_capacity = sum(classroom.capacity for classroom in classrooms)
-        total_teachers = sum(classroom.teacher_count for classroom in classrooms)
+        if self.is_fragment:
+            return context
+        # Общая статистика одним агрегатным запросом (кешируется)
+        classrooms = self.object_list
+        stats = cached_result(classrooms, 'classroom_stats', lambda: classrooms.aggregate(
+            total_capacity=Sum('capacity'), total_teachers=Sum('teacher_count')
+        ), self.count_dependencies)
         
-        context['total_capacity'] = total_capacity
-        context['total_teachers'] = total_teachers
+        context['total_capacity'] = stats['total_capacity'] or 0
+        context['total_teachers'] = stats['total_teachers'] or 0
+        
+        # Подбор свободной аудитории нужной вместимости
+        min_capacity = self.request.GET.get('min_capacity')
+        if min_capacity and min_capacity.isdigit():
+            context['suggested_classroom'] = availability.suggest_free_classroom(int(min_capacity))
+        context['free_by_band'] = availability.free_count_by_band()
+        context['free_count'] = sum(context['free_by_band'].values())
         return context
 
 
-class ClassroomDetailView(DetailView):
+class ClassroomDetailView(PrefetchPlanMixin, caching.CachedObjectMixin, DetailView):
     """Детальная информация об аудитории"""
     model = Classroom
     template_name = 'department/classroom_detail.html'
     context_object_name = 'classroom'
     
+    def get_prefetch_plan(self):
+        return [
+            Prefetch(
+                'teacher_set',
+                queryset=Teacher.objects.only(
+                    'pk', 'last_name', 'first_name', 'middle_name', 'workplace_id'
+                ).order_by('last_name', 'first_name'),
+                to_attr='teacher_list',
+            ),
+        ]
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['teachers'] = Teacher.objects.filter(workplace=self.object)
+        context['teachers'] = self.object.teacher_list
         return context
 
 
-class DisciplineListView(ListView):
+class DisciplineListView(FragmentMixin, CachedPaginationMixin, ListView):
     """Список дисциплин"""
     model = Discipline
     template_name = 'department/discipline_list.html'
+    fragment_template_name = 'department/discipline_list_results.html'
+    live_search_models = (Discipline, Teacher)
     context_object_name = 'disciplines'
     ordering = ['semester', 'name']
     paginate_by = 10
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().annotate(teacher_count=Count('teacher'))
         
         # Фильтрация по семестру
         semester = self.request.GET.get('semester')
@@ -129,37 +271,102 @@ class DisciplineListView(ListView):
         
         # Поиск по названию
         search_query = self.request.GET.get('search')
+        self.fuzzy_search = False
         if search_query:
-            queryset = queryset.filter(
+            matches = queryset.filter(
                 Q(name__icontains=search_query) |
                 Q(description__icontains=search_query)
             )
+            # Нет точных совпадений — ищем с учетом опечаток
+            self.fuzzy_search = not matches.exists()
+            if self.fuzzy_search:
+                return fuzzy.filter_ranked(queryset, Discipline, search_query)
+            queryset = matches
         
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Общая статистика
-        queryset = self.get_queryset()
-        total_hours = sum(d.hours for d in queryset)
-        total_teachers = sum(d.teacher_set.count() for d in queryset)
+        context['fuzzy_search'] = self.fuzzy_search
+        if self.is_fragment:
+            return context
+        # Общая статистика (кешируется)
+        queryset = self.object_list
+        stats = cached_result(queryset, 'discipline_stats', lambda: {
+            'total_hours': queryset.aggregate(total=Sum('hours'))['total'] or 0,
+            'total_teachers': Teacher.disciplines.through.objects.filter(
+                discipline__in=queryset.values('pk')
+            ).count(),
+        })
         
-        context['total_hours'] = total_hours
-        context['total_teachers'] = total_teachers
+        context['total_hours'] = stats['total_hours']
+        context['total_teachers'] = stats['total_teachers']
         return context
 
 
-class DisciplineDetailView(DetailView):
+LIVE_SEARCH_VIEWS = {
+    'teachers': TeacherListView,
+    'classrooms': ClassroomListView,
+    'disciplines': DisciplineListView,
+}
+
+
+def live_search(request, scope):
+    """Фрагмент результатов списка для поля поиска (кешируется и объединяется)"""
+    view_class = LIVE_SEARCH_VIEWS.get(scope)
+    if view_class is None:
+        raise Http404
+    
+    def render_fragment():
+        # Выполняется только при промахе кеша и только ведущим из одновременных запросов
+        if request.GET.get('search', '').strip():
+            throttling.charge(request, 'search')
+        request.META['HTTP_X_FRAGMENT'] = 'results'
+        response = view_class.as_view()(request)
+        response.render()
+        return response.status_code, response.content
+    
+    try:
+        status, content = livesearch.fragment(scope, request.GET, view_class.live_search_models, render_fragment)
+    except throttling.Throttled as exc:
+        return throttling.throttled_response(request, exc.wait)
+    response = HttpResponse(content, status=status)
+    patch_vary_headers(response, [livesearch.FRAGMENT_HEADER])
+    return response
+
+
+class DisciplineDetailView(PrefetchPlanMixin, caching.CachedObjectMixin, DetailView):
     """Детальная информация о дисциплине"""
     model = Discipline
     template_name = 'department/discipline_detail.html'
     context_object_name = 'discipline'
+    
+    def get_prefetch_plan(self):
+        return [
+            Prefetch(
+                'teacher_set',
+                queryset=Teacher.objects.select_related('workplace').order_by('last_name', 'first_name'),
+                to_attr='teacher_list',
+            ),
+        ]
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['teachers'] = self.object.teacher_list
+        return context
 
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
-from .forms import TeacherForm, ClassroomForm, DisciplineForm, AdditionalWorkTypeForm, TeacherAdditionalWorkForm
-from .models import Teacher, Classroom, Discipline, AdditionalWorkType, TeacherAdditionalWork
+from django.views.decorators.http import require_POST
+from .forms import TeacherForm, ClassroomForm, DisciplineForm, AdditionalWorkTypeForm, TeacherAdditionalWorkForm, TimetableRunForm, TimetableFilterForm
+from .models import Teacher, Classroom, Discipline, AdditionalWorkType, TeacherAdditionalWork, TimetableRun, ScheduledSession, Job
+from . import archive, assignments, audit, changes, replica, timetable
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 
 # Управление преподавателями
 def teacher_create(request):
@@ -179,7 +386,7 @@ def teacher_create(request):
     })
 
 def teacher_update(request, pk):
-    teacher = get_object_or_404(Teacher, pk=pk)
+    teacher = caching.get_object_or_404(Teacher, pk)
     
     if request.method == 'POST':
         form = TeacherForm(request.POST, request.FILES, instance=teacher)
@@ -198,7 +405,7 @@ def teacher_update(request, pk):
     })
 
 def teacher_delete(request, pk):
-    teacher = get_object_or_404(Teacher, pk=pk)
+    teacher = caching.get_object_or_404(Teacher, pk)
     
     if request.method == 'POST':
         teacher.delete()
@@ -228,7 +435,7 @@ def classroom_create(request):
     })
 
 def classroom_update(request, pk):
-    classroom = get_object_or_404(Classroom, pk=pk)
+    classroom = caching.get_object_or_404(Classroom, pk)
     
     if request.method == 'POST':
         form = ClassroomForm(request.POST, instance=classroom)
@@ -247,7 +454,7 @@ def classroom_update(request, pk):
     })
 
 def classroom_delete(request, pk):
-    classroom = get_object_or_404(Classroom, pk=pk)
+    classroom = caching.get_object_or_404(Classroom, pk)
     
     if request.method == 'POST':
         classroom.delete()
@@ -276,7 +483,7 @@ def discipline_create(request):
     })
 
 def discipline_update(request, pk):
-    discipline = get_object_or_404(Discipline, pk=pk)
+    discipline = caching.get_object_or_404(Discipline, pk)
     
     if request.method == 'POST':
         form = DisciplineForm(request.POST, instance=discipline)
@@ -295,7 +502,7 @@ def discipline_update(request, pk):
     })
 
 def discipline_delete(request, pk):
-    discipline = get_object_or_404(Discipline, pk=pk)
+    discipline = caching.get_object_or_404(Discipline, pk)
     
     if request.method == 'POST':
         discipline.delete()
@@ -330,7 +537,7 @@ def additional_work_type_list(request):
     })
 
 def additional_work_type_update(request, pk):
-    work_type = get_object_or_404(AdditionalWorkType, pk=pk)
+    work_type = caching.get_object_or_404(AdditionalWorkType, pk)
     
     if request.method == 'POST':
         form = AdditionalWorkTypeForm(request.POST, instance=work_type)
@@ -349,7 +556,7 @@ def additional_work_type_update(request, pk):
     })
 
 def additional_work_type_delete(request, pk):
-    work_type = get_object_or_404(AdditionalWorkType, pk=pk)
+    work_type = caching.get_object_or_404(AdditionalWorkType, pk)
     
     if request.method == 'POST':
         work_type.delete()
@@ -364,10 +571,14 @@ def additional_work_type_delete(request, pk):
 def teacher_additional_work_create(request):
     if request.method == 'POST':
         form = TeacherAdditionalWorkForm(request.POST)
-        if form.is_valid():
-            form.save()
-            messages.success(request, 'Дополнительная работа назначена!')
-            return redirect('department:teacher_additional_work_list')
+        with transaction.atomic():
+            # Завершенное назначение того же вида уходит в архив, иначе его не назначить снова
+            archive.release(request.POST.get('teacher'), request.POST.get('work_type'))
+            if form.is_valid():
+                form.save()
+                messages.success(request, 'Дополнительная работа назначена!')
+                return redirect('department:teacher_additional_work_list')
+            transaction.set_rollback(True)
     else:
         form = TeacherAdditionalWorkForm()
     
@@ -378,13 +589,22 @@ def teacher_additional_work_create(request):
     })
 
 def teacher_additional_work_list(request):
-    additional_works = TeacherAdditionalWork.objects.all().select_related('teacher', 'work_type')
+    show_history = bool(request.GET.get('history'))
+    if show_history:
+        # Действующие и архивные назначения
+        additional_works = archive.history()
+        teachers = Teacher.objects.in_bulk({work['teacher_id'] for work in additional_works})
+        for work in additional_works:
+            work['teacher'] = teachers.get(work['teacher_id'])
+    else:
+        additional_works = TeacherAdditionalWork.objects.all().select_related('teacher', 'work_type')
     return render(request, 'department/teacher_additional_work_list.html', {
         'additional_works': additional_works,
+        'show_history': show_history,
     })
 
 def teacher_additional_work_update(request, pk):
-    additional_work = get_object_or_404(TeacherAdditionalWork, pk=pk)
+    additional_work = caching.get_object_or_404(TeacherAdditionalWork, pk)
     
     if request.method == 'POST':
         form = TeacherAdditionalWorkForm(request.POST, instance=additional_work)
@@ -403,7 +623,7 @@ def teacher_additional_work_update(request, pk):
     })
 
 def teacher_additional_work_delete(request, pk):
-    additional_work = get_object_or_404(TeacherAdditionalWork, pk=pk)
+    additional_work = caching.get_object_or_404(TeacherAdditionalWork, pk)
     
     if request.method == 'POST':
         additional_work.delete()
@@ -412,4 +632,188 @@ def teacher_additional_work_delete(request, pk):
     
     return render(request, 'department/teacher_additional_work_confirm_delete.html', {
         'additional_work': additional_work,
-    })
\ No newline at end of file
+    })
+
+
+# Расписание занятий
+def timetable_view(request):
+    runs = TimetableRun.objects.all()[:10]
+    params = TimetableFilterForm(request.GET)
+    # В cleaned_data остаются только прошедшие проверку поля
+    params.is_valid()
+    run_id = params.cleaned_data.get('run')
+    if run_id:
+        run = get_object_or_404(TimetableRun, pk=run_id)
+    else:
+        run = TimetableRun.objects.filter(status=TimetableRun.DONE).first()
+    
+    teacher_id = params.cleaned_data.get('teacher')
+    classroom_id = params.cleaned_data.get('classroom')
+    grid = None
+    unscheduled = []
+    if run and (teacher_id or classroom_id):
+        sessions = run.sessions.select_related('teacher', 'discipline', 'classroom')
+        if teacher_id:
+            sessions = sessions.filter(teacher_id=teacher_id)
+        if classroom_id:
+            sessions = sessions.filter(classroom_id=classroom_id)
+        
+        # Сетка: строки - пары, столбцы - дни недели
+        days = len(ScheduledSession.DAY_CHOICES)
+        periods = timetable.option('PERIODS')
+        cells = [[[] for _ in range(days)] for _ in range(periods)]
+        for session in sessions:
+            if session.is_scheduled:
+                cells[session.period - 1][session.day].append(session)
+            else:
+                unscheduled.append(session)
+        grid = [(period + 1, row) for period, row in enumerate(cells)]
+    
+    return render(request, 'department/timetable.html', {
+        'run': run,
+        'runs': runs,
+        'form': TimetableRunForm(initial={'time_budget': timetable.option('TIME_BUDGET')}),
+        'teachers': Teacher.objects.only('pk', 'last_name', 'first_name', 'middle_name'),
+        'classrooms': Classroom.objects.only('pk', 'room_number'),
+        'days': [name for _, name in ScheduledSession.DAY_CHOICES],
+        'grid': grid,
+        'unscheduled': unscheduled,
+    })
+
+@require_POST
+def timetable_generate(request):
+    form = TimetableRunForm(request.POST)
+    if form.is_valid():
+        run = timetable.start_run(form.cleaned_data['term'], form.cleaned_data['time_budget'])
+        messages.success(request, f'Расчет расписания #{run.pk} запущен. Обновите страницу позже.')
+        return redirect(f"{reverse('department:timetable')}?run={run.pk}")
+    messages.error(request, 'Некорректные параметры расчета.')
+    return redirect('department:timetable')
+
+
+# История изменений
+AUDIT_HISTORY_MODELS = {
+    'teacher': Teacher,
+    'classroom': Classroom,
+    'discipline': Discipline,
+    'additionalworktype': AdditionalWorkType,
+    'teacheradditionalwork': TeacherAdditionalWork,
+}
+
+@replica.primary_view
+def object_history(request, model_name, pk):
+    model = AUDIT_HISTORY_MODELS.get(model_name)
+    if model is None:
+        raise Http404
+    entries = list(audit.history(model_name, pk).select_related('user')[:200])
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None and not entries:
+        raise Http404
+    return render(request, 'department/object_history.html', {
+        'entries': entries,
+        'object_repr': str(obj) if obj else entries[0].object_repr,
+        'model_verbose_name': model._meta.verbose_name,
+    })
+
+
+# Матрица назначений преподавателей на дисциплины
+def assignment_matrix(request):
+    if request.method == 'POST':
+        added, removed = assignments.apply_changes(
+            assignments.parse_pairs(request.POST.getlist('add')),
+            assignments.parse_pairs(request.POST.getlist('remove')),
+        )
+        messages.success(request, f'Назначения сохранены: добавлено {added}, удалено {removed}.')
+        return redirect(f"{reverse('department:assignment_matrix')}?{request.POST.get('query', '')}")
+    
+    disciplines = Discipline.objects.only('pk', 'name', 'semester').order_by('semester', 'name')
+    semester = request.GET.get('semester', '')
+    if semester.isdigit() and int(semester) <= 12:
+        disciplines = disciplines.filter(semester=int(semester))
+    teachers = Teacher.objects.only('pk', 'last_name', 'first_name', 'middle_name').order_by('last_name', 'first_name')
+    
+    # Пагинация по обеим осям
+    teacher_page = Paginator(teachers, 20).get_page(request.GET.get('tpage'))
+    discipline_page = Paginator(disciplines, 12).get_page(request.GET.get('dpage'))
+    teacher_ids = [t.pk for t in teacher_page]
+    discipline_ids = [d.pk for d in discipline_page]
+    assigned = set(
+        assignments.Assignment.objects.filter(
+            teacher_id__in=teacher_ids, discipline_id__in=discipline_ids
+        ).values_list('teacher_id', 'discipline_id')
+    )
+    rows = [
+        (teacher, [(discipline.pk, (teacher.pk, discipline.pk) in assigned) for discipline in discipline_page])
+        for teacher in teacher_page
+    ]
+    
+    return render(request, 'department/assignment_matrix.html', {
+        'rows': rows,
+        'disciplines': discipline_page,
+        'teacher_page': teacher_page,
+        'discipline_page': discipline_page,
+        'semesters': range(1, 13),
+    })
+
+
+# Фоновые задачи (состояние пишет обработчик, реплика отстает)
+@replica.primary_view
+def job_detail(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return render(request, 'department/job_detail.html', {'job': job})
+
+@replica.primary_view
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return JsonResponse({
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'message': job.message,
+        'result': job.result,
+        'finished': job.is_finished,
+    })
+
+@require_POST
+def job_cancel(request, pk):
+    if jobs.cancel(pk):
+        messages.success(request, 'Отмена задачи запрошена.')
+    else:
+        messages.error(request, 'Задача уже завершена.')
+    return redirect('department:job_detail', pk=pk)
+
+
+# Отчеты
+def report_list(request):
+    items = [
+        (report, [(fmt, reports.cached_url(report, fmt)) for fmt in reports.FORMATS])
+        for report in reports.REPORTS.values()
+    ]
+    return render(request, 'department/report_list.html', {'reports': items})
+
+@require_POST
+def report_generate(request, name, fmt):
+    report = reports.REPORTS.get(name)
+    if report is None or fmt not in reports.FORMATS:
+        raise Http404
+    # Данные не менялись: отдаем готовый файл
+    url = reports.cached_url(report, fmt)
+    if url:
+        return redirect(url)
+    job = jobs.enqueue(tasks.build_report, report=name, fmt=fmt)
+    return redirect('department:job_detail', pk=job.pk)
+
+
+# Лента изменений для внешних систем
+def changes_feed(request):
+    models = [name for name in request.GET.get('models', '').split(',') if name]
+    limit = request.GET.get('limit', '')
+    try:
+        if limit and not limit.isdigit():
+            raise ValueError('Неверный limit')
+        feed = changes.changes_since(request.GET.get('since', ''), int(limit or 0), models)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400, json_dumps_params={'ensure_ascii': False})
+    return JsonResponse(feed, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,84 @@
+// Живой поиск и пагинация в списках без перезагрузки страницы.
+// Сервер отдает только блок результатов (заголовок X-Fragment): через
+// адрес живого поиска, где готовые фрагменты берутся из кеша.
+(function () {
+    var results = document.getElementById('results');
+    var form = document.querySelector('form[data-live-form]');
+    if (!results || !form || !window.fetch) return;
+
+    var listUrl = window.location.pathname;
+    var liveUrl = results.dataset.liveUrl;
+    var controller = null;
+    var timer = null;
+    var notice = null;
+
+    function showNotice(text) {
+        if (!notice) {
+            notice = document.createElement('div');
+            notice.className = 'alert alert-warning';
+            notice.setAttribute('role', 'alert');
+            results.parentNode.insertBefore(notice, results);
+        }
+        notice.textContent = text;
+        notice.hidden = !text;
+    }
+
+    function query(extra) {
+        var params = new URLSearchParams();
+        new FormData(form).forEach(function (value, name) {
+            if (value) params.append(name, value);
+        });
+        if (extra) {
+            extra.forEach(function (value, name) { params.set(name, value); });
+        }
+        return params.toString();
+    }
+
+    function load(url, params) {
+        // Ответ на устаревший запрос не нужен
+        if (controller) controller.abort();
+        controller = window.AbortController ? new AbortController() : null;
+        var suffix = params ? '?' + params : '';
+        fetch(url + suffix, {
+            headers: {'X-Fragment': 'results'},
+            signal: controller ? controller.signal : undefined
+        })
+            .then(function (response) {
+                if (response.status === 429) {
+                    // Ограничение запросов: текст ответа говорит, когда повторить
+                    return response.text().then(function (text) { throw new Error(text); });
+                }
+                if (!response.ok) throw new Error('Не удалось загрузить результаты (' + response.status + ').');
+                return response.text();
+            })
+            .then(function (html) {
+                showNotice('');
+                results.innerHTML = html;
+                window.history.replaceState(null, '', listUrl + suffix);
+            })
+            .catch(function (error) {
+                if (error.name === 'AbortError') return;
+                showNotice(error.message);
+            });
+    }
+
+    var search = form.querySelector('input[name="search"]');
+    if (search) {
+        search.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { load(liveUrl, query()); }, 300);
+        });
+    }
+
+    form.querySelectorAll('[data-live]').forEach(function (field) {
+        field.addEventListener('change', function () { load(liveUrl, query()); });
+    });
+
+    results.addEventListener('click', function (event) {
+        var link = event.target.closest('a.page-link');
+        if (!link) return;
+        event.preventDefault();
+        var page = new URL(link.href, window.location.href).searchParams;
+        load(liveUrl, query(new URLSearchParams({page: page.get('page')})));
+    });
+})();
@@ -32,13 +32,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "department.metrics.MetricsMiddleware",
+    "department.replica.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "department.staticfiles.StaticAssetsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "department.throttling.ThrottleMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "department.audit.AuditMiddleware",
 ]
 
 ROOT_URLCONF = "university_department.urls"
@@ -68,6 +73,31 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Запись идет из нескольких потоков (журнал, фоновые задачи, расписание):
+        # транзакция сразу берет блокировку записи и ждет ее до timeout секунд,
+        # а не падает с database is locked при переходе от чтения к записи
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+    },
+    # Реплика для чтения: копия db.sqlite3, которую обновляет refresh_replica
+    # (см. department/replica.py). Можно указать любую реплицируемую базу и
+    # REPLICA['LOCAL_COPY'] = False.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db_replica.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["department.replica.ReplicaRouter"]
+
+# Общий кеш процессов. Для нескольких серверов можно указать
+# django.core.cache.backends.redis.RedisCache и адрес Redis в LOCATION.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", str(BASE_DIR / "cache")),
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
@@ -108,11 +138,137 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Хешированные имена и сжатые копии (.gz/.br) создаются при collectstatic
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "department.staticfiles.CompressedManifestStaticFilesStorage",
+    },
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Префикс internal-location nginx для отдачи медиафайлов через X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT = None
+
+# Загрузки пишутся на диск частями с подсчетом хеша (department.storage)
+FILE_UPLOAD_HANDLERS = ['department.storage.HashingUploadHandler']
+PHOTO_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+PHOTO_MAX_PIXELS = 25_000_000
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Расписание занятий (см. department/timetable.py)
+TIMETABLE = {
+    'DAYS': 6,
+    'PERIODS': 6,
+    'GROUP_SIZE': 25,
+    'TIME_BUDGET': 10.0,
+}
+
+# Журнал изменений (см. department/audit.py)
+AUDIT = {
+    'ASYNC': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'QUEUE_SIZE': 10000,
+}
+
+# Двухуровневый кеш объектов (см. department/caching.py)
+OBJECT_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_SIZE': 1000,
+    'LOCAL_TIMEOUT': 60,
+    'VERSION_TIMEOUT': 5,
+}
+
+# Фоновые задачи (см. department/jobs.py), обработчик: manage.py run_jobs
+JOBS = {
+    'WORKERS': 2,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,
+    'STALE_TIMEOUT': 300,
+    'HEARTBEAT_INTERVAL': 30,
+}
+
+# Архив завершенной дополнительной работы (см. department/archive.py)
+ARCHIVE = {
+    'BATCH_SIZE': 500,
+    'KEEP_DAYS': 0,
+}
+
+# Живой поиск в списках (см. department/livesearch.py)
+LIVE_SEARCH = {
+    'TIMEOUT': 10,
+    'WAIT': 5.0,
+}
+
+# Нечеткий поиск по именам (см. department/fuzzy.py)
+FUZZY_SEARCH = {
+    'THRESHOLD': 0.5,
+    'CANDIDATES': 200,
+}
+
+# Отчеты (см. department/reports.py); PDF_FONT — TTF-шрифт с кириллицей
+REPORTS = {
+    'DIRECTORY': 'reports',
+    'PDF_FONT': '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+}
+
+# Лента изменений для синхронизации (см. department/changes.py)
+CHANGE_FEED = {
+    'BATCH_SIZE': 500,
+    'MAX_BATCH_SIZE': 5000,
+}
+
+# Проверка согласованности данных (см. department/integrity.py)
+INTEGRITY = {
+    'BATCH_SIZE': 500,
+    'EXAMPLES': 5,
+}
+
+# Снимки базы SQLite (см. department/snapshots.py); TEST — снимок для тестовой базы
+SNAPSHOTS = {
+    'DIRECTORY': 'snapshots',
+    'TEST': '',
+}
+
+TEST_RUNNER = 'department.test_runner.SnapshotTestRunner'
+
+# Метрики Prometheus на /metrics (см. department/metrics.py).
+# В ALLOWED_IPS нужно добавить адрес сервера Prometheus
+METRICS = {
+    'ENABLED': True,
+    'DIRECTORY': 'metrics',
+    'FLUSH_INTERVAL': 5.0,
+    'LOCK_THRESHOLD': 0.02,
+    'RETENTION': 3600,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+# Ограничение ресурсоемких запросов (см. department/throttling.py)
+THROTTLING = {
+    'ENABLED': True,
+    'CAPACITY': 30,
+    'RATE': 0.5,
+    'COSTS': {'search': 3, 'deep_page': 2, 'export': 10},
+    'DEEP_PAGE': 20,
+}
+
+# Чтение с реплики (см. department/replica.py)
+REPLICA = {
+    'ENABLED': True,
+    'ALIAS': 'replica',
+    'LOCAL_COPY': True,
+    'REFRESH_INTERVAL': 30,
+    'MAX_LAG': 120,
+    'STICKY_SECONDS': 30,
+}